@@ -1,34 +1,339 @@
 # app.py
 
+import atexit
+import functools
+import json
 import logging
+import os
+import threading
 import time
-from flask import Flask, render_template, jsonify, request
+import uuid
+from flask import Flask, Response, render_template, jsonify, request, g, stream_with_context
 from game_logic import Board
 import tower_logic
 from tower_logic import STRUCTURE_BASE
+from sessions import SessionManager
+from simulation import CohortSimulation, SimulationLoop, WaveSimulation
+from pubsub import Hub
+import journal
+from savefile import SaveFormatError
+import metrics
 
 # wyciszamy logi serwera Werkzeug
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
 app = Flask(__name__)
-board = Board()
+
+# TD_COMPACT_GRID=1: siatka uint8 w NumPy zamiast listy list stringów
+COMPACT_GRID = os.environ.get("TD_COMPACT_GRID", "0") == "1"
+# TD_SPARSE_GRID=1: pamięć i layout tylko dla aktywnych kafelków (duże mapy, TD_NUM_TILES)
+SPARSE_GRID = os.environ.get("TD_SPARSE_GRID", "0") == "1"
+NUM_TILES = int(os.environ.get("TD_NUM_TILES", "5"))
+
+# unikalny znacznik uruchomienia — ETagi sprzed restartu nie mogą pasować
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+# symulacja fal po stronie serwera (TD_SERVER_SIM=1) — klient tylko renderuje
+SERVER_SIMULATION = os.environ.get("TD_SERVER_SIM", "0") == "1"
+# TD_COHORT_SIM=1: przeciwnicy liczeni seriami (simulation.CohortSimulation) — późne fale
+COHORT_SIMULATION = os.environ.get("TD_COHORT_SIM", "0") == "1"
+simulation_loop = SimulationLoop(tick_hz=int(os.environ.get("TD_TICK_HZ", "20")))
+if SERVER_SIMULATION:
+    simulation_loop.start()
+
+# TD_METRICS=1: liczniki i histogramy czasu tras oraz gorących ścieżek na /api/metrics
+metrics.enable(os.environ.get("TD_METRICS", "0") == "1")
+HTTP_REQUESTS = metrics.registry.counter(
+    "td_http_requests_total", "Liczba żądań HTTP", ("route", "method", "status"))
+HTTP_LATENCY = metrics.registry.histogram(
+    "td_http_request_duration_seconds", "Czas obsługi żądania HTTP", ("route", "method"))
+STATE_PAYLOAD = metrics.registry.histogram(
+    "td_state_payload_bytes", "Rozmiar odpowiedzi /api/state", ("kind",), buckets=metrics.SIZE_BUCKETS)
+
+# powiadomienia o zmianach stanu gier (temat = id gry, wiadomość = wersja planszy)
+hub = Hub()
+
+# ---- wiele gier w jednym procesie: id gry w ciasteczku, parametrze ?game= lub nagłówku ----
+GAME_COOKIE = "td_game"
+
+
+def _on_game_created(session):
+    # zmiany z symulacji w tle też trafiają do strumieni klientów
+    session.sim.on_change = lambda version: hub.publish(session.game_id, version)
+    if SERVER_SIMULATION:
+        simulation_loop.add(session.sim)
+    if game_journal is not None:
+        game_journal.attach(session.board, session.game_id)
+
+
+def _on_game_evicted(session):
+    simulation_loop.remove(session.sim)
+    if game_journal is not None:
+        # po ostatnim poleceniu w toku — recover nie przywróci usuniętej gry
+        with session.lock:
+            game_journal.drop(session.board)
+
+
+_max_mb = os.environ.get("TD_MAX_MEMORY_MB")
+sessions = SessionManager(
+    board_factory=lambda: Board(num_tiles=NUM_TILES, compact=COMPACT_GRID, sparse=SPARSE_GRID),
+    max_games=int(os.environ.get("TD_MAX_GAMES", "200")),
+    max_bytes=int(_max_mb) * 1024 * 1024 if _max_mb else None,
+    idle_timeout=float(os.environ.get("TD_IDLE_TIMEOUT", "3600")),
+    on_create=_on_game_created,
+    on_evict=_on_game_evicted,
+    sim_factory=CohortSimulation if COHORT_SIMULATION else WaveSimulation,
+    # w serve.py z wieloma workerami id gry wskazuje worker, który ją trzyma
+    id_prefix=f"w{os.environ['TD_WORKER']}." if os.environ.get("TD_WORKER") else "",
+)
+
+# TD_CHECKPOINT=plik: gry wczytywane przy starcie i zapisywane co TD_CHECKPOINT_INTERVAL s
+# (oraz przy wyłączeniu) — restart serwera nie kończy gier graczy
+# TD_JOURNAL=plik: dziennik poleceń gier (journal.py) — po awarii checkpoint + ogon dziennika,
+# a każdą grę można odtworzyć offline (journal.replay)
+CHECKPOINT_PATH = os.environ.get("TD_CHECKPOINT")
+JOURNAL_PATH = os.environ.get("TD_JOURNAL")
+if os.environ.get("TD_WORKER"):
+    # każdy worker serve.py ma własne gry
+    suffix = f".w{os.environ['TD_WORKER']}"
+    CHECKPOINT_PATH = CHECKPOINT_PATH and CHECKPOINT_PATH + suffix
+    JOURNAL_PATH = JOURNAL_PATH and JOURNAL_PATH + suffix
+CHECKPOINT_INTERVAL_S = float(os.environ.get("TD_CHECKPOINT_INTERVAL", "60"))
+# co ile sekund wątek tła usuwa bezczynne gry i wypycha bufor dziennika na dysk
+JOURNAL_FLUSH_S = 1.0
+CHECKPOINT_TIME = metrics.registry.histogram(
+    "td_checkpoint_seconds", "Czas zapisu wszystkich gier do checkpointu")
+log = logging.getLogger(__name__)
+
+
+def _checkpoint():
+    try:
+        saved = {}
+        if CHECKPOINT_PATH:
+            with CHECKPOINT_TIME.time():
+                saved = sessions.checkpoint(CHECKPOINT_PATH)
+        if game_journal is not None:
+            # w dzienniku zostaje tylko to, czego nie ma w checkpoincie
+            game_journal.rotate(saved)
+    except OSError:
+        log.exception("Nie udało się zapisać checkpointu gier")
+
+
+def _maintenance_loop():
+    # co sekundę: gry bezczynne dłużej niż TD_IDLE_TIMEOUT, dziennik, checkpoint
+    last_checkpoint = time.monotonic()
+    while True:
+        time.sleep(JOURNAL_FLUSH_S)
+        sessions.evict_idle()
+        if ((CHECKPOINT_PATH or game_journal is not None)
+                and time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_S):
+            last_checkpoint = time.monotonic()
+            _checkpoint()
+        elif game_journal is not None:
+            game_journal.flush()
+
+
+game_journal = None
+if CHECKPOINT_PATH and os.path.exists(CHECKPOINT_PATH):
+    try:
+        sessions.restore(CHECKPOINT_PATH, compact=COMPACT_GRID, sparse=SPARSE_GRID)
+    except (OSError, SaveFormatError):
+        log.exception("Nie udało się wczytać checkpointu gier")
+if JOURNAL_PATH:
+    if journal.files(JOURNAL_PATH):
+        journal.recover(JOURNAL_PATH, sessions, compact=COMPACT_GRID, sparse=SPARSE_GRID)
+    game_journal = journal.Journal(JOURNAL_PATH)
+    for _session in sessions.sessions():
+        game_journal.attach(_session.board, _session.game_id, new=False)
+threading.Thread(target=_maintenance_loop, name="maintenance", daemon=True).start()
+if CHECKPOINT_PATH or JOURNAL_PATH:
+    atexit.register(_checkpoint)
+
+metrics.registry.gauge("td_games", "Liczba gier w pamięci", lambda: len(sessions))
+metrics.registry.gauge("td_stream_subscribers", "Liczba otwartych strumieni /api/stream",
+                       lambda: hub.subscriber_count())
+
+
+def _game():
+    # gra bieżącego żądania (tworzona, gdy klient nie ma jeszcze swojej)
+    game = g.get("game")
+    if game is None:
+        game_id = (request.args.get("game") or request.headers.get("X-Game-Id")
+                   or request.cookies.get(GAME_COOKIE))
+        game = sessions.get_or_create(game_id)
+        g.game = game
+        g.version_before = game.board.version
+    return game
+
+
+def _board():
+    return _game().board
+
+
+def _mutates(view):
+    """Trasa zmieniająca planszę: pod blokadą gry, po niej publikacja migawki stanu."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with _game().mutation():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@app.before_request
+def _start_timer():
+    if metrics.enabled:
+        g.t0 = time.perf_counter()
+
+
+@app.after_request
+def _record_metrics(response):
+    t0 = g.get("t0")
+    if t0 is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    HTTP_LATENCY.observe(time.perf_counter() - t0, route, request.method)
+    HTTP_REQUESTS.inc(1, route, request.method, str(response.status_code))
+    # 304 bez treści nie jest rozmiarem odpowiedzi ze stanem
+    if (route == "/api/state" and response.status_code == 200
+            and response.content_length is not None):
+        kind = "full" if request.args.get("since") is None else "delta"
+        STATE_PAYLOAD.observe(response.content_length, kind)
+    return response
+
+
+@app.after_request
+def _remember_game(response):
+    # zapamiętanie id gry w ciasteczku
+    game = g.get("game")
+    if game is not None and request.cookies.get(GAME_COOKIE) != game.game_id:
+        response.set_cookie(GAME_COOKIE, game.game_id, httponly=True, samesite="Lax")
+    # powiadomienie strumieni, jeśli żądanie zmieniło stan planszy
+    if game is not None and game.board.version != g.get("version_before"):
+        hub.publish(game.game_id, game.board.version)
+    return response
 
 
 @app.route("/")
 def index():
     # render głównego widoku gry
-    return render_template("index.html", board=board.get_layout())
+    return render_template("index.html", board=_game().snapshot.layout_now())
 
 
 @app.route("/api/state", methods=["GET"])
 def api_state():
-    # aktualny stan planszy
-    return jsonify(board.get_layout())
+    # aktualny stan planszy; z ?since=<wersja>&sid=<state_id> tylko zmiany od tej wersji
+    # z opublikowanej migawki — odczyt nie czeka na zmiany planszy
+    game = _game()
+    snap = game.snapshot
+    since = snap.delta_base(request.args.get("since", type=int), request.args.get("sid"))
+    now = snap.time()
+    etag = f"state-{_BOOT_ID}-{snap.state_id}-{snap.version}-{since}-{now}"
+    if etag in request.if_none_match:
+        resp = app.response_class(status=304)
+    else:
+        body = _state_bytes(game, snap, since, now)
+        resp = app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def _state_bytes(game, snap, since, now):
+    # ta sama migawka, baza różnicy i sekunda gry dają identyczną odpowiedź —
+    # kodowana raz dla wszystkich żądań i strumieni gry
+    return game.state_cache.do((snap.state_id, snap.version, since, now),
+                               lambda: _encode_state(snap, since, now))
+
+
+def _encode_state(snap, since, now):
+    state = snap.delta(since, snap.state_id, now)
+    state["server_sim"] = SERVER_SIMULATION
+    return _dumps_state(state)
+
+
+@metrics.timed("td_state_json_seconds", "Czas serializacji stanu /api/state do JSON")
+def _dumps_state(state):
+    return json.dumps(state, separators=(",", ":")).encode()
+
+
+# co ile sekund strumień wysyła czas gry / pozycje przeciwników w trakcie fali
+STREAM_TICK_S = 0.4
+# co ile sekund bez zmian wysyłany jest komentarz podtrzymujący połączenie
+STREAM_KEEPALIVE_S = 15.0
+
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class StreamCursor:
+    """Pozycja jednego strumienia SSE: ostatnio wysłana wersja i czas wysyłki."""
+
+    def __init__(self, since=None, sid=None):
+        self.since = since
+        self.sid = sid
+        self.last_sent = 0.0
+        self.enemies_sent = False
+
+
+def stream_chunks(game, cursor):
+    """
+    Zdarzenia SSE należne strumieniowi od ostatniego wywołania oraz czas (s),
+    po którym warto zajrzeć ponownie. Wspólne dla /api/stream i asgi.py.
+    """
+    snap = game.snapshot
+    chunks = []
+    now = time.monotonic()
+    if cursor.since != snap.version or cursor.sid != snap.state_id or (
+            snap.wave_active and now - cursor.last_sent >= 1.0):
+        body = _state_bytes(game, snap, snap.delta_base(cursor.since, cursor.sid), snap.time())
+        cursor.since, cursor.sid, cursor.last_sent = snap.version, snap.state_id, now
+        chunks.append(f"id: {cursor.since}\nevent: state\ndata: {body.decode()}\n\n")
+    if SERVER_SIMULATION and (snap.wave_active or cursor.enemies_sent):
+        # w trakcie fali pozycje przeciwników; po fali jeszcze jedna pusta lista
+        cursor.enemies_sent = snap.wave_active
+        chunks.append(_sse("enemies", {"enemies": game.sim.snapshot()}))
+    return chunks, STREAM_TICK_S if snap.wave_active else STREAM_KEEPALIVE_S
+
+
+def stream_start(args, headers):
+    # ?since=<wersja>&sid=...; Last-Event-ID — wznowienie po zerwaniu połączenia
+    since = args.get("since", type=int)
+    last_id = headers.get("Last-Event-ID", type=int)
+    return StreamCursor(last_id if last_id is not None else since, args.get("sid"))
+
+
+@app.route("/api/stream", methods=["GET"])
+def api_stream():
+    # Server-Sent Events: różnice stanu (jak /api/state?since=...) wysyłane przy każdej zmianie
+    game = _game()
+    cursor = stream_start(request.args, request.headers)
+    sub = hub.subscription(game.game_id)
+
+    def events():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                chunks, tick = stream_chunks(game, cursor)
+                yield from chunks
+                if sub.wait(timeout=tick) is None and not game.snapshot.wave_active:
+                    yield ": ping\n\n"
+        finally:
+            sub.close()
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    # wyłączenie buforowania odpowiedzi w proxy (nginx)
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 
 @app.route("/api/expand", methods=["POST"])
+@_mutates
 def expand():
     # ręczne rozszerzanie pola
+    board = _board()
     data = request.get_json()
     tx = data.get("tx")
     ty = data.get("ty")
@@ -37,8 +342,10 @@ def expand():
 
 
 @app.route("/api/build", methods=["POST"])
+@_mutates
 def build_main():
     # budowa struktur (wieża, mur)
+    board = _board()
     data = request.get_json()
     typ = data.get("type")
     x = data.get("x")
@@ -75,66 +382,47 @@ def build_main():
         if cell_type not in ("open_area", "tower_area"):
             return jsonify({"ok": False, "error": "Nie można postawić wieży na tym polu"}), 400
 
-    orig = board.structures.get((r, c), None)
-    try:
-        # wstawienie struktury tymczasowo
-        if typ == "wall":
-            board.structures[(r, c)] = "wall"
-        else:
-            if orig == "wall":
-                del board.structures[(r, c)]
-            board.structures[(r, c)] = typ
-
-        from pathfinding import find_shortest_path
-
-        # sprawdzanie czy nie blokuje drogi
-        if not board.first_tile_placed or board.base_tile is None or board.current_portal is None:
-            if orig is None:
-                board.structures.pop((r, c), None)
-            else:
-                board.structures[(r, c)] = orig
-            ok = board.place_structure(typ, r, c)
-            if ok:
-                return jsonify({"ok": True})
-            else:
-                return jsonify({"ok": False, "error": "Brakuje złota lub niewłaściwe miejsce"}), 400
-
-        portal = board.current_portal
-        blocked = set(board.structures.keys())
-        path = find_shortest_path(board.grid, portal, None, blocked=blocked)
-
-        if not path:
-            # cofnięcie budowy jeśli blokuje drogę
-            if orig is None:
-                board.structures.pop((r, c), None)
-            else:
-                board.structures[(r, c)] = orig
+    # sprawdzanie czy nie blokuje drogi — tylko gdy pole dopiero zostanie zablokowane
+    # (wieża w miejscu muru nie zmienia przechodniości)
+    if (board.first_tile_placed and board.base_tile is not None
+            and board.current_portal is not None and existing is None):
+        if board.get_placement_validator().blocks((r, c)):
             return jsonify({"ok": False, "error": "Budowa zablokuje drogę!"}), 400
 
-        if orig is None:
-            board.structures.pop((r, c), None)
-        else:
-            board.structures[(r, c)] = orig
-
-        # finalne postawienie struktury
-        ok = board.place_structure(typ, r, c)
-        if ok:
-            return jsonify({"ok": True})
-        else:
-            return jsonify({"ok": False, "error": "Brakuje złota lub niewłaściwe miejsce"}), 400
-
-    except Exception:
-        # awaryjne przywrócenie stanu
-        if orig is None:
-            board.structures.pop((r, c), None)
-        else:
-            board.structures[(r, c)] = orig
-        return jsonify({"ok": False, "error": "Błąd serwera podczas budowy"}), 500
+    # finalne postawienie struktury
+    ok = board.place_structure(typ, r, c)
+    if ok:
+        return jsonify({"ok": True})
+    else:
+        return jsonify({"ok": False, "error": "Brakuje złota lub niewłaściwe miejsce"}), 400
+
+
+@app.route("/api/validate_build", methods=["POST"])
+def validate_build():
+    # wsadowe sprawdzenie, które pola zablokowałyby drogę (do cieniowania w UI)
+    game = _game()
+    with game.lock:
+        # tylko odczyt: walidator jest budowany raz na wersję ścieżki i potem się nie zmienia
+        board = game.board
+        ready = board.first_tile_placed and board.base_tile is not None and board.current_portal is not None
+        validator = board.get_placement_validator() if ready else None
+    if validator is None:
+        return jsonify({"blocking": []})
+    data = request.get_json(silent=True) or {}
+    cells = data.get("cells")
+    try:
+        cand = None if cells is None else [(int(p["y"]), int(p["x"])) for p in cells]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({"ok": False, "error": "Niepełne dane"}), 400
+    blocking = validator.blocking_cells(cand)
+    return jsonify({"blocking": [{"x": c, "y": r} for r, c in sorted(blocking)]})
 
 
 @app.route("/api/build_camp", methods=["POST"])
+@_mutates
 def build_camp():
     # budowanie struktur w obozie
+    board = _board()
     data = request.get_json()
     x = data.get("x")
     y = data.get("y")
@@ -144,22 +432,28 @@ def build_camp():
 
 
 @app.route("/api/start_wave", methods=["POST"])
+@_mutates
 def start_wave():
     # rozpoczęcie fali
+    board = _board()
     board.start_wave()
     return jsonify({"ok": True})
 
 
 @app.route("/api/end_wave", methods=["POST"])
+@_mutates
 def end_wave_manual():
     # ręczne zakończenie fali
+    board = _board()
     board.end_wave()
     return jsonify({"ok": True})
 
 
 @app.route("/api/enemy_spawn", methods=["POST"])
+@_mutates
 def api_enemy_spawn():
     # zgłoszenie spawnu przeciwnika
+    board = _board()
     data = request.get_json() or {}
     cnt = data.get("count", 1)
     try:
@@ -172,8 +466,10 @@ def api_enemy_spawn():
 
 
 @app.route("/api/enemy_die", methods=["POST"])
+@_mutates
 def api_enemy_die():
     # zgłoszenie śmierci przeciwnika
+    board = _board()
     data = request.get_json() or {}
     cnt = data.get("count", 1)
     try:
@@ -206,9 +502,41 @@ def api_enemy_die():
     })
 
 
+@app.route("/api/events", methods=["POST"])
+@_mutates
+def api_events():
+    # paczka zdarzeń przeciwników zamiast osobnych /api/enemy_spawn i /api/enemy_die
+    board = _board()
+    data = request.get_json(silent=True) or {}
+    events = data.get("events")
+    if not isinstance(events, list):
+        return jsonify({"ok": False, "error": "Niepełne dane"}), 400
+
+    keys = ("active_enemies", "gold", "hp", "wave", "wave_active", "damage_dealt")
+    before = {k: getattr(board, k, None) for k in keys}
+    applied = board.apply_enemy_events(events)
+    # zwracamy tylko liczniki, które się zmieniły
+    delta = {k: getattr(board, k, None) for k in keys if getattr(board, k, None) != before[k]}
+    return jsonify({"ok": True, "applied": applied, "state": delta})
+
+
+@app.route("/api/enemies", methods=["GET"])
+def api_enemies():
+    # pozycje przeciwników z symulacji serwerowej
+    game = _game()
+    snap = game.snapshot
+    return jsonify({
+        "enemies": game.sim.snapshot() if SERVER_SIMULATION else [],
+        "wave": snap.wave,
+        "wave_active": snap.wave_active,
+    })
+
+
 @app.route("/api/upgrade", methods=["POST"])
+@_mutates
 def api_upgrade():
     # kupno ulepszenia wieży
+    board = _board()
     data = request.get_json()
     tt = data.get("tower_type")
     cat = data.get("category")
@@ -222,26 +550,44 @@ def api_upgrade():
 
 @app.route("/api/path", methods=["GET"])
 def api_path():
-    # podgląd ścieżki od portalu do bazy
-    if not board.first_tile_placed or board.base_tile is None or board.current_portal is None:
-        return jsonify({"path": []})
-    pr, pc = board.current_portal
-    from pathfinding import find_shortest_path
-    blocked = set(board.structures.keys())
-    path = find_shortest_path(board.grid, (pr, pc), None, blocked=blocked)
-    return jsonify({"path": path})
+    # podgląd ścieżki od portalu do bazy (z cache planszy, 304 gdy bez zmian)
+    game = _game()
+    # ścieżka liczona z żywej planszy (i zapisywana w jej cache) — pod blokadą gry
+    with game.lock:
+        etag = f"path-{_BOOT_ID}-{game.game_id}-{game.board.path_version}"
+        path = None if etag in request.if_none_match else game.board.get_path()
+    if path is None:
+        resp = app.response_class(status=304)
+    else:
+        resp = jsonify({"path": path})
+    resp.set_etag(etag)
+    # przeglądarka ma zawsze rewalidować, a nie trzymać starej ścieżki
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 
 @app.route("/api/tower_specs", methods=["GET"])
 def api_tower_specs():
     # zwraca wszystkie specyfikacje wież
-    specs = tower_logic.get_all_tower_specs()
-    return jsonify(specs)
+    # gotowy JSON z cache (przeliczany po zakupie ulepszenia lub zmianie buffów debug)
+    return app.response_class(tower_logic.tower_specs_json(_board().upgrade_levels),
+                              mimetype="application/json")
+
+
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    # metryki w formacie tekstowym Prometheusa (tylko przy TD_METRICS=1)
+    if not metrics.enabled:
+        return jsonify({"ok": False, "error": "Metryki wyłączone (TD_METRICS=1)"}), 404
+    return app.response_class(metrics.registry.render(),
+                              mimetype="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.route("/api/debug_add", methods=["POST"])
+@_mutates
 def api_debug_add():
     # debug: dodawanie surowców lub hp
+    board = _board()
     data = request.get_json() or {}
     res_type = data.get("type")
     try:
@@ -249,14 +595,7 @@ def api_debug_add():
     except Exception:
         amount = 0
 
-    new_val = None
-    if res_type in ("hp", "gold", "food"):
-        setattr(board, res_type, getattr(board, res_type, 0) + amount)
-        new_val = getattr(board, res_type, 0)
-    elif isinstance(getattr(board, "resources", None), dict) and res_type in board.resources:
-        board.resources[res_type] = board.resources.get(res_type, 0) + amount
-        new_val = board.resources[res_type]
-
+    new_val = board.debug_add(res_type, amount)
     return jsonify({"ok": True, "type": res_type, "value": new_val})
 
 
@@ -265,15 +604,8 @@ def api_debug_tower_buffs():
     # debug: sztuczne buffy dla wszystkich wież
     data = request.get_json() or {}
     enabled = bool(data.get("enabled", False))
-    for t in getattr(board, "towers", []):
-        if enabled:
-            t.range += 5
-            t.damage += 10
-            t.speed += 5
-        else:
-            t.range -= 5
-            t.damage -= 10
-            t.speed -= 5
+    # Tower.specs() sam dolicza buffy gdy przełącznik jest włączony
+    tower_logic.set_debug_tower_buffs(enabled)
     return jsonify({"ok": True, "buffs": enabled})
 
 
@@ -0,0 +1,89 @@
+# asgi.py
+"""
+Wariant ASGI aplikacji (python run_app.py --serve --asgi, wymaga uvicorn).
+/api/stream obsługiwany jest asynchronicznie: otwarty strumień czeka na
+powiadomienie z Hub (loop.call_soon_threadsafe) zamiast zajmować wątek.
+Kod synchroniczny gry (sesja, kodowanie stanu, SingleFlight) idzie do puli
+wątków pętli, więc wolna gra nie wstrzymuje pozostałych połączeń.
+Pozostałe trasy trafiają do aplikacji Flask w puli wątków (a2wsgi).
+"""
+import asyncio
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import Headers, MultiDict
+
+from app import GAME_COOKIE, app, hub, sessions, stream_chunks, stream_start
+
+
+def make_application(threads=16):
+    """Aplikacja ASGI: /api/stream natywnie, reszta przez Flask w `threads` wątkach."""
+    flask_app = WSGIMiddleware(app, workers=threads)
+
+    async def application(scope, receive, send):
+        if (scope["type"] == "http" and scope["path"] == "/api/stream"
+                and scope["method"] == "GET"):
+            await _stream(scope, receive, send)
+        else:
+            await flask_app(scope, receive, send)
+
+    return application
+
+
+application = make_application()
+
+
+# ---- /api/stream ----
+async def _stream(scope, receive, send):
+    args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1")))
+    headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+    cookie = SimpleCookie(headers.get("Cookie", ""))
+    game_id = (args.get("game") or headers.get("X-Game-Id")
+               or (cookie[GAME_COOKIE].value if GAME_COOKIE in cookie else None))
+    loop = asyncio.get_running_loop()
+    game = await loop.run_in_executor(None, sessions.get_or_create, game_id)
+    cursor = stream_start(args, headers)
+
+    wake = asyncio.Event()
+    closed = False
+
+    def on_change(_version):
+        # wywoływane w wątku publikującym
+        loop.call_soon_threadsafe(wake.set)
+
+    async def watch_disconnect():
+        nonlocal closed
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        closed = True
+        wake.set()
+
+    response_headers = [(b"content-type", b"text/event-stream; charset=utf-8"),
+                        (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+    if game.game_id != game_id:
+        response_headers.append((b"set-cookie", f"{GAME_COOKIE}={game.game_id}; HttpOnly; "
+                                                f"Path=/; SameSite=Lax".encode()))
+    hub.subscribe(game.game_id, on_change)
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        await _send_text(send, "retry: 2000\n\n")
+        while not closed:
+            chunks, tick = await loop.run_in_executor(None, stream_chunks, game, cursor)
+            if chunks:
+                await _send_text(send, "".join(chunks))
+            try:
+                await asyncio.wait_for(wake.wait(), tick)
+                wake.clear()
+            except asyncio.TimeoutError:
+                # migawka to gotowa referencja (sessions.GameSession.snapshot), bez blokady gry
+                if not game.snapshot.wave_active:
+                    await _send_text(send, ": ping\n\n")
+    finally:
+        hub.unsubscribe(game.game_id, on_change)
+        watcher.cancel()
+
+
+async def _send_text(send, text):
+    await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
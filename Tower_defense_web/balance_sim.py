@@ -0,0 +1,250 @@
+# balance_sim.py
+"""
+Symulator gier bez przeglądarki do strojenia balansu (STRUCTURE_BASE, UPGRADE_DEFS,
+krzywe z enemy_logic). Każda gra to Board + WaveSimulation na wspólnym zegarze krokowym
+(clock.SteppedClock, krok stały `dt`, bez czekania), sterowana skryptową polityką budowania.
+Gry rozdzielane są na procesy (multiprocessing.Pool), a wynik każdej fali
+trafia jako wiersz do pliku CSV (albo kolumnowego .npz, gdy jest NumPy).
+
+Przykład:
+    python balance_sim.py --games 2000 --policy towers,balanced --out wyniki.csv
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import enemy_logic
+import tower_logic
+from clock import SteppedClock
+from game_logic import RESOURCE_KEYS, Board
+from simulation import CohortSimulation, WaveSimulation
+
+COLUMNS = (
+    "game", "seed", "policy", "wave", "enemies", "enemy_hp",
+    "hp_before", "hp_after", "hp_lost", "gold", "towers", "walls",
+    "peasants", "food",
+) + RESOURCE_KEYS + ("wave_seconds",)
+
+
+# -------------------------
+# POLITYKI BUDOWANIA (wywoływane przed każdą falą)
+# -------------------------
+def _expand(board, rng, tiles):
+    """Rozszerza planszę o `tiles` losowych dozwolonych kafelków (pierwszy na środku)."""
+    for _ in range(tiles):
+        allowed = board.get_allowed_expansion_tiles()
+        if not allowed:
+            return
+        if not board.first_tile_placed:
+            mid = board.num_tiles // 2
+            tile = (mid, mid)
+        else:
+            tile = rng.choice(allowed)
+        board.manual_expand_tile(*tile)
+
+
+def _tower_spots(board):
+    """Wolne pola przy ścieżce (sąsiedztwo 8-kierunkowe), które nie zablokują drogi."""
+    path = {tuple(p) for p in board.get_path()}
+    spots = []
+    seen = set()
+    for r, c in path:
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                cell = (r + dr, c + dc)
+                if cell in path or cell in seen:
+                    continue
+                seen.add(cell)
+                rr, cc = cell
+                if not (0 <= rr < board.total_rows and 0 <= cc < board.total_cols):
+                    continue
+                if board.grid[rr][cc] in ("open_area", "tower_area") and cell not in board.structures:
+                    spots.append(cell)
+    return spots
+
+
+def _build_towers(board, rng, types):
+    """Stawia wieże (preferencja wg kolejności `types`) dopóki starcza złota."""
+    spots = _tower_spots(board)
+    rng.shuffle(spots)
+    for cell in spots:
+        affordable = [t for t in types if board.gold >= tower_logic.STRUCTURE_BASE[t].cost]
+        if not affordable:
+            return
+        board.place_structure(affordable[0], *cell)
+
+
+def _build_camp(board, rng, plan):
+    """Buduje w obozie kolejne budynki z `plan` na wolnych polach."""
+    free = [cell for cell, t in board.camp.items()
+            if t == "O" and cell not in board.camp_buildings]
+    rng.shuffle(free)
+    for typ in plan:
+        if not free:
+            return
+        if board.build_in_camp(*free[-1], typ):
+            free.pop()
+
+
+def _buy_upgrades(board, categories):
+    built = {t for t in board.structures.values() if t.startswith("tower")}
+    for typ in sorted(built):
+        for cat in categories:
+            lvl = tower_logic.get_upgrade_level(typ, cat, board.upgrade_levels)
+            tower_logic.do_upgrade(board, typ, cat, lvl + 1)
+
+
+def policy_none(board, rng, wave):
+    """Tylko rozszerzanie planszy — punkt odniesienia bez obrony."""
+    _expand(board, rng, 2 if wave == 1 else 1)
+
+
+def policy_towers(board, rng, wave):
+    """Najtańsze wieże wzdłuż ścieżki za całe złoto."""
+    _expand(board, rng, 2 if wave == 1 else 1)
+    _build_towers(board, rng, ("tower1",))
+
+
+def policy_balanced(board, rng, wave):
+    """Obóz (domy, farmy, surowce), mocniejsze wieże i ulepszenia."""
+    _expand(board, rng, 2 if wave == 1 else (1 if wave % 2 == 0 else 0))
+    _build_camp(board, rng, ("house", "farm", "sawmill", "quarry", "house",
+                             "farm", "iron_mine", "smelter", "diamond_mine"))
+    _buy_upgrades(board, ("damage", "speed", "range", "strategic"))
+    _build_towers(board, rng, ("tower4", "tower2", "tower1"))
+
+
+POLICIES = {
+    "none":     policy_none,
+    "towers":   policy_towers,
+    "balanced": policy_balanced,
+}
+
+
+# -------------------------
+# JEDNA GRA
+# -------------------------
+def play_game(game, seed, policy, max_waves=20, dt=0.05, num_tiles=5, cohorts=False,
+              max_wave_seconds=3600.0):
+    """
+    Rozgrywa jedną grę do utraty HP albo `max_waves` fal.
+    cohorts=True: przeciwnicy liczeni seriami (CohortSimulation) — dla późnych fal.
+    Zwraca listę wierszy (dict wg COLUMNS), po jednym na falę.
+    """
+    rng = random.Random(seed)
+    act = POLICIES[policy]
+    # czas wirtualny — płynie tylko przez sim.step(dt), wspólny dla planszy i symulacji
+    clock = SteppedClock()
+    board = Board(num_tiles=num_tiles, clock=clock, seed=seed)
+    sim = (CohortSimulation if cohorts else WaveSimulation)(board)
+    rows = []
+
+    for _ in range(max_waves):
+        if board.hp <= 0:
+            break
+        act(board, rng, board.wave + 1)
+        hp_before = board.hp
+        start = clock.now()
+        board.start_wave()
+        while board.wave_active and clock.now() - start < max_wave_seconds:
+            sim.step(dt)
+        if board.wave_active:
+            # fala zablokowana (np. brak ścieżki) — kończymy ją ręcznie
+            board.end_wave()
+
+        row = {
+            "game": game, "seed": seed, "policy": policy, "wave": board.wave,
+            "enemies": enemy_logic.count_for_wave(board.wave),
+            "enemy_hp": enemy_logic.hp_for_wave(board.wave),
+            "hp_before": hp_before, "hp_after": board.hp, "hp_lost": hp_before - board.hp,
+            "gold": board.gold,
+            "towers": sum(1 for t in board.structures.values() if t.startswith("tower")),
+            "walls": sum(1 for t in board.structures.values() if t == "wall"),
+            "peasants": board.peasants, "food": board.food,
+            "wave_seconds": round(clock.now() - start, 3),
+        }
+        for k in RESOURCE_KEYS:
+            row[k] = board.resources[k]
+        rows.append(row)
+    return rows
+
+
+def _play(task):
+    return play_game(*task)
+
+
+# -------------------------
+# ZAPIS WYNIKÓW
+# -------------------------
+def write_csv(rows, out):
+    writer = csv.DictWriter(out, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_columnar(rows, path):
+    """Zapis kolumnowy (.npz): jedna tablica na kolumnę."""
+    import numpy as np
+    np.savez_compressed(path, **{col: np.array([r[col] for r in rows]) for col in COLUMNS})
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Symulacja wielu gier bez przeglądarki (balans).")
+    parser.add_argument("--games", type=int, default=100, help="liczba gier na politykę")
+    parser.add_argument("--policy", default="towers",
+                        help="polityki oddzielone przecinkami: " + ", ".join(POLICIES))
+    parser.add_argument("--max-waves", type=int, default=20)
+    parser.add_argument("--dt", type=float, default=0.05, help="krok symulacji w sekundach gry")
+    parser.add_argument("--num-tiles", type=int, default=5)
+    parser.add_argument("--cohorts", action="store_true",
+                        help="przeciwnicy seriami (CohortSimulation) — szybko także dla późnych fal")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno pierwszej gry")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="-", help="plik .csv lub .npz ('-' = stdout)")
+    args = parser.parse_args(argv)
+
+    policies = [p.strip() for p in args.policy.split(",") if p.strip()]
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        parser.error("nieznana polityka: " + ", ".join(unknown))
+
+    tasks = [(i, args.seed + i, policy, args.max_waves, args.dt, args.num_tiles, args.cohorts)
+             for policy in policies
+             for i in range(args.games)]
+
+    t0 = time.perf_counter()
+    rows = []
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            for game_rows in pool.imap_unordered(_play, tasks, chunksize=max(1, len(tasks) // (args.workers * 8))):
+                rows.extend(game_rows)
+    else:
+        for task in tasks:
+            rows.extend(_play(task))
+    elapsed = time.perf_counter() - t0
+    rows.sort(key=lambda r: (r["policy"], r["game"], r["wave"]))
+
+    if args.out.endswith(".npz"):
+        write_columnar(rows, args.out)
+    elif args.out == "-":
+        write_csv(rows, sys.stdout)
+    else:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_csv(rows, f)
+
+    game_seconds = sum(r["wave_seconds"] for r in rows)
+    print(f"{len(tasks)} gier, {len(rows)} fal w {elapsed:.1f} s "
+          f"(czas gry {game_seconds:.0f} s, x{game_seconds / max(elapsed, 1e-9):.0f})",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+# benchmark.py
+"""
+Benchmarki gorących ścieżek gry w funkcji rozmiaru planszy (num_tiles),
+gęstości struktur i liczby przeciwników (wg enemy_logic.count_for_wave).
+Dla każdego przypadku mierzy ops/s oraz opóźnienia p50/p99, zapisuje wynik
+do pliku JSON (baseline) i porównuje z wcześniejszym, zgłaszając regresje.
+
+Przykład:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json      # kod wyjścia 1 przy regresji
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import enemy_logic
+import savefile
+import tower_logic
+from game_logic import Board
+from pathfinding import FlowField, find_shortest_path
+from simulation import SimEnemy
+
+CAMP_TYPES = ("house", "farm", "sawmill", "quarry", "iron_mine", "smelter", "diamond_mine",
+              "mansion")
+
+
+# -------------------------
+# POMIAR
+# -------------------------
+def measure(fn, setup=None, min_time=0.2, min_runs=5, max_runs=100000):
+    """
+    Wywołuje fn() aż minie `min_time` sekund (co najmniej `min_runs` razy).
+    `setup()` (poza pomiarem) wołany jest przed każdym wywołaniem.
+    Zwraca {"n", "ops_per_sec", "p50_ms", "p99_ms"}.
+    """
+    times = []
+    total = 0.0
+    while (total < min_time or len(times) < min_runs) and len(times) < max_runs:
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        total += dt
+    times.sort()
+
+    def pct(p):
+        return times[min(len(times) - 1, int(p * len(times)))] * 1000.0
+
+    return {
+        "n": len(times),
+        "ops_per_sec": round(len(times) / total, 2) if total > 0 else float("inf"),
+        "p50_ms": round(pct(0.50), 4),
+        "p99_ms": round(pct(0.99), 4),
+    }
+
+
+# -------------------------
+# PRZYGOTOWANIE PLANSZ
+# -------------------------
+def make_board(num_tiles, density, seed=0, max_tiles=60):
+    """
+    Plansza `num_tiles` x `num_tiles` kafelków z bazą, łańcuchem rozszerzeń
+    (najwyżej `max_tiles`), murami na ok. `density` wolnych pól (bez blokowania drogi)
+    i budynkami na ok. `density` pól obozu (wszystkie typy po kolei).
+    """
+    rng = random.Random(seed)
+    board = Board(num_tiles=num_tiles)
+    mid = num_tiles // 2
+    board.manual_expand_tile(mid, mid)
+    for _ in range(min(max_tiles, num_tiles * num_tiles) - 1):
+        allowed = board.get_allowed_expansion_tiles()
+        if not allowed:
+            break
+        board.manual_expand_tile(*rng.choice(allowed))
+
+    board.gold = 10 ** 9
+    free = [(r, c) for r in range(board.total_rows) for c in range(board.total_cols)
+            if board.grid[r][c] in ("open_area", "tower_area")]
+    rng.shuffle(free)
+    for cell in free[:int(len(free) * density)]:
+        if not board.get_placement_validator().blocks(cell):
+            board.place_structure("wall", *cell)
+
+    camp = sorted(board.camp)
+    rng.shuffle(camp)
+    board.unemployed = 10 ** 6
+    for i, (r, c) in enumerate(camp[:int(len(camp) * density)]):
+        board.build_in_camp(r, c, CAMP_TYPES[i % len(CAMP_TYPES)])
+    # dość żywności, żeby end_wave liczył produkcję surowców
+    board.food = 10 ** 6
+    return board
+
+
+def economy_state(board):
+    """Stan ekonomii zmieniany przez end_wave (do przywracania między pomiarami)."""
+    return {"food": board.food, "gold": board.gold, "resources": dict(board.resources),
+            "income": dict(board.income), "elapsed_time": board.elapsed_time,
+            "wave_active": board.wave_active, "wave_start_time": board.wave_start_time}
+
+
+def restore_economy(board, state):
+    board.food = state["food"]
+    board.gold = state["gold"]
+    board.resources.update(state["resources"])
+    board.income.update(state["income"])
+    board.elapsed_time = state["elapsed_time"]
+    board.wave_active = state["wave_active"]
+    board.wave_start_time = state["wave_start_time"]
+
+
+def make_towers(board, count, seed=0):
+    """Wieże (różnych typów) na wolnych polach przy ścieżce."""
+    rng = random.Random(seed)
+    path = {tuple(p) for p in board.get_path()}
+    spots = sorted({(r + dr, c + dc) for r, c in path for dr in (-1, 0, 1) for dc in (-1, 0, 1)}
+                   - path)
+    spots = [p for p in spots
+             if 0 <= p[0] < board.total_rows and 0 <= p[1] < board.total_cols
+             and board.grid[p[0]][p[1]] in ("open_area", "tower_area")]
+    rng.shuffle(spots)
+    types = ("tower1", "tower2", "tower3", "tower4", "tower5")
+    return [tower_logic.Tower(types[i % len(types)], r, c, levels=board.upgrade_levels)
+            for i, (r, c) in enumerate(spots[:count])]
+
+
+def make_enemies(field, start, count, seed=0):
+    """Przeciwnicy rozłożeni wzdłuż ścieżki z `start` (pole przepływu `field`)."""
+    rng = random.Random(seed)
+    length = field.distance(start)
+    enemies = []
+    for i in range(count):
+        e = SimEnemy(i, 10 ** 6, start, field)
+        e.advance(rng.uniform(0, max(0, length - 1)), field)
+        enemies.append(e)
+    return enemies
+
+
+# -------------------------
+# PRZYPADKI
+# -------------------------
+def run_cases(sizes, densities, waves, min_time, only=None):
+    results = {}
+
+    def case(name, fn, setup=None):
+        if only and only not in name:
+            return
+        results[name] = measure(fn, setup=setup, min_time=min_time)
+        r = results[name]
+        print(f"{name:60s} {r['ops_per_sec']:>12.1f} ops/s  p50 {r['p50_ms']:.4f} ms  "
+              f"p99 {r['p99_ms']:.4f} ms", file=sys.stderr)
+
+    # --- Tower.specs ---
+    tower = tower_logic.Tower("tower4", 0, 0)
+    case("tower_specs", tower.specs)
+
+    for n in sizes:
+        for density in densities:
+            board = make_board(n, density)
+            tag = f"tiles={n},density={density}"
+
+            case(f"find_shortest_path[{tag}]", lambda: find_shortest_path(
+                board.grid, board.current_portal, board.base_cell, blocked=board.structures.keys()))
+            case(f"flow_field[{tag}]", lambda: FlowField(
+                board.grid, board.base_cell, blocked=board.structures.keys()))
+            case(f"get_layout[{tag}]", board.get_layout)
+            case(f"get_allowed_expansion_tiles[{tag}]", board.get_allowed_expansion_tiles)
+            economy = economy_state(board)
+            case(f"end_wave[{tag}]", board.end_wave, setup=lambda: restore_economy(board, economy))
+            restore_economy(board, economy)
+            _bench_build(case, board, tag)
+
+            path = [tuple(p) for p in board.get_path()]
+            if not path:
+                continue
+            towers = make_towers(board, 24)
+            fake = type("BenchBoard", (), {"towers": towers})()
+
+            def reset():
+                for t in towers:
+                    t._last_shot = None
+
+            for w in waves:
+                enemies = make_enemies(board.get_flow_field(), board.current_portal,
+                                       enemy_logic.count_for_wave(w))
+                case(f"process_towers[{tag},wave={w},enemies={len(enemies)}]",
+                     lambda: tower_logic.process_towers(fake, enemies, now=1.0), setup=reset)
+    return results
+
+
+# zmienne, przy których import app wczytuje i zapisuje prawdziwe gry (checkpoint,
+# dziennik, pliki workera) albo usuwa bezczynne gry w trakcie pomiaru
+_APP_PERSISTENCE_ENV = ("TD_CHECKPOINT", "TD_JOURNAL", "TD_WORKER", "TD_IDLE_TIMEOUT")
+
+
+def _import_app():
+    """Moduł app bez trwałości gier; None, gdy już zaimportowany z checkpointem lub dziennikiem."""
+    if "app" not in sys.modules:
+        saved = {k: os.environ.pop(k) for k in _APP_PERSISTENCE_ENV if k in os.environ}
+        try:
+            import app
+        finally:
+            os.environ.update(saved)
+    app = sys.modules["app"]
+    if app.CHECKPOINT_PATH or app.JOURNAL_PATH:
+        return None
+    return app
+
+
+def _bench_build(case, board, tag):
+    """app.build_main przez klienta testowego Flask (przed każdym pomiarem świeża kopia planszy)."""
+    app_module = _import_app()
+    if app_module is None:
+        print("build_main pominięty: app zaimportowany z TD_CHECKPOINT / TD_JOURNAL", file=sys.stderr)
+        return
+    cells = board.get_placement_validator().blocking_cells()
+    free = [(r, c) for r in range(board.total_rows) for c in range(board.total_cols)
+            if board.grid[r][c] in ("open_area", "tower_area")
+            and (r, c) not in board.structures and (r, c) not in cells]
+    if not free:
+        return
+    # plansza odtwarzana z zapisu zamiast cofania muru — bez grzebania w stanie planszy
+    data = savefile.dumps(board)
+    game_id = f"bench-{tag}"
+    client = app_module.app.test_client()
+    headers = {"X-Game-Id": game_id}
+    state = {"i": 0, "cell": None}
+
+    def fresh():
+        app_module.sessions.remove(game_id)
+        app_module.sessions.create(savefile.loads(data, compact=board.compact, clock=board.clock),
+                                   game_id=game_id)
+        state["cell"] = free[state["i"] % len(free)]
+        state["i"] += 1
+
+    def build():
+        r, c = state["cell"]
+        client.post("/api/build", json={"type": "wall", "x": c, "y": r}, headers=headers)
+
+    case(f"build_main[{tag}]", build, setup=fresh)
+    app_module.sessions.remove(game_id)
+
+
+# -------------------------
+# BASELINE I REGRESJE
+# -------------------------
+def compare(results, baseline, threshold):
+    """Lista regresji: przypadki wolniejsze od baseline o więcej niż `threshold` (np. 0.25)."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        slower = r["p50_ms"] / base["p50_ms"] - 1.0 if base["p50_ms"] > 0 else 0.0
+        if slower > threshold:
+            regressions.append((name, base["p50_ms"], r["p50_ms"], slower))
+    return regressions
+
+
+def _csv_list(kind):
+    return lambda s: [kind(x) for x in s.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarki gorących ścieżek gry.")
+    parser.add_argument("--sizes", type=_csv_list(int), default=[5, 10, 25, 50, 100],
+                        help="rozmiary planszy (num_tiles), np. 5,10,25")
+    parser.add_argument("--densities", type=_csv_list(float), default=[0.0, 0.1, 0.3],
+                        help="udział wolnych pól zajętych przez mury")
+    parser.add_argument("--waves", type=_csv_list(int), default=[5, 11, 17, 21],
+                        help="fale, z których bierzemy liczbę przeciwników")
+    parser.add_argument("--min-time", type=float, default=0.2, help="sekundy na przypadek")
+    parser.add_argument("--only", help="tylko przypadki zawierające ten tekst")
+    parser.add_argument("--save", help="zapisz wyniki jako baseline (JSON)")
+    parser.add_argument("--compare", help="porównaj z baseline (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="dopuszczalne spowolnienie p50 względem baseline")
+    args = parser.parse_args(argv)
+
+    results = run_cases(args.sizes, args.densities, args.waves, args.min_time, args.only)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                         "created": time.strftime("%Y-%m-%d %H:%M:%S")},
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, slower in regressions:
+            print(f"REGRESJA {name}: p50 {old:.4f} -> {new:.4f} ms (+{slower:.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Brak regresji.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
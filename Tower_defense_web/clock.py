@@ -0,0 +1,49 @@
+# clock.py
+"""
+Zegary gry. Board, Tower i symulacja fal pytają zegar o czas zamiast wołać
+time.time(), więc gra może biec w czasie rzeczywistym, przyspieszona (×N)
+albo krokowo (czas płynie tylko przez advance — testy, powtórki, symulacje).
+Każdy zegar ma metodę now() zwracającą sekundy (float).
+"""
+import time
+
+
+class RealClock:
+    """Czas rzeczywisty (time.time)."""
+
+    def now(self):
+        return time.time()
+
+
+class ScaledClock:
+    """Czas płynący `factor` razy szybciej niż źródło (domyślnie time.time)."""
+
+    def __init__(self, factor=1.0, start=None, source=time.time):
+        self.factor = float(factor)
+        self._source = source
+        self._origin_src = source()
+        self._origin = self._origin_src if start is None else float(start)
+
+    def now(self):
+        return self._origin + (self._source() - self._origin_src) * self.factor
+
+
+class SteppedClock:
+    """Czas wirtualny przesuwany ręcznie (advance/set), niezależny od zegara ściennego."""
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+
+    def now(self):
+        return self._now
+
+    def advance(self, dt):
+        self._now += dt
+        return self._now
+
+    def set(self, t):
+        self._now = float(t)
+
+
+# wspólny zegar rzeczywisty (domyślny dla Board i Tower)
+REAL_CLOCK = RealClock()
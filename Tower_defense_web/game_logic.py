@@ -5,19 +5,175 @@ strukturami, falami i zasobami.
 """
 import os
 import random
-import time
-from collections import deque
-from tower_logic import STRUCTURE_BASE
+import uuid
+from collections import Counter, OrderedDict, deque
+import metrics
+from clock import REAL_CLOCK
+from journal import journaled
+from grid_store import CompactGrid, SparseGrid
+from pathfinding import FlowField, PlacementValidator
+from tower_logic import STRUCTURE_BASE, new_upgrade_levels
+
+_VALIDATOR_BUILD = metrics.registry.histogram(
+    "td_placement_validator_build_seconds", "Czas budowy PlacementValidator (pole odległości BFS)")
+_FLOW_FIELD_BUILD = metrics.registry.histogram(
+    "td_flow_field_build_seconds", "Czas budowy pola przepływu (odwrotny BFS od bazy)")
+
+
+RESOURCE_KEYS = ("wood", "stone", "iron_ore", "iron_bar", "diamond")
+
+
+def economy_step(counts, peasants, food, resources, wave):
+    """
+    Ekonomia obozu na koniec fali `wave` (czysta funkcja, wspólna dla end_wave
+    i prognozy). counts: liczba budynków danego typu, resources: stan surowców.
+    Zwraca (income, gold_gain): income = zmiany {wood, stone, iron_ore, iron_bar,
+    diamond, food}, gold_gain = złoto z kopalń diamentów (nie pokazywane w income).
+    """
+    farms = counts.get("farm", 0)
+    # każda farma produkuje 4 żywności, konsumują wszyscy peasants poza tymi na farmach
+    food_inc = 4 * farms - max(0, peasants - farms)
+    income = {"wood": 0, "stone": 0, "iron_ore": 0, "iron_bar": 0, "diamond": 0, "food": food_inc}
+    gold_gain = 0
+
+    # produkcja surowców tylko gdy żywność nie spadnie poniżej zera
+    if food + food_inc < 0:
+        return income, gold_gain
+
+    ore = counts.get("iron_mine", 0)
+    stone = 2 * counts.get("quarry", 0) + ore
+    wood = 2 * counts.get("sawmill", 0)
+    # huta żelaza: każdy piec zamienia jedną rudę i jedno drewno (już po tegorocznym wydobyciu)
+    bars = min(counts.get("smelter", 0), resources["iron_ore"] + ore, resources["wood"] + wood)
+    income["iron_ore"] = ore - bars
+    income["stone"] = stone
+    income["wood"] = wood - bars
+    income["iron_bar"] = bars
+
+    # diamenty i złoto na zmianę co falę
+    mines = counts.get("diamond_mine", 0)
+    if mines:
+        if wave % 2 == 0:
+            income["diamond"] = mines
+        else:
+            gold_gain = 3 * mines
+    return income, gold_gain
+
+
+class _TrackedDict(dict):
+    """Słownik zgłaszający zmienione klucze do dziennika zmian planszy."""
+
+    def __init__(self, board, kind, data=()):
+        super().__init__(data)
+        self._board = board
+        self._kind = kind
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._board._record(self._kind, key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._board._record(self._kind, key)
+
+    def pop(self, key, *default):
+        present = key in self
+        value = super().pop(key, *default)
+        if present:
+            self._board._record(self._kind, key)
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+
+class _Tracked:
+    """Licznik planszy (hp, złoto, ...), którego zmiana trafia do dziennika zmian."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = "_v_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self.slot]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value):
+        d = obj.__dict__
+        if self.slot not in d or d[self.slot] != value:
+            d[self.slot] = value
+            obj._record("counter", self.name)
 
 
 class Board:
-    def __init__(self):
+    # liczniki wysyłane w różnicach stanu (get_delta)
+    hp = _Tracked()
+    gold = _Tracked()
+    wave = _Tracked()
+    wave_active = _Tracked()
+    elapsed_time = _Tracked()
+    active_enemies = _Tracked()
+    peasants = _Tracked()
+    unemployed = _Tracked()
+    food = _Tracked()
+    first_tile_placed = _Tracked()
+    bg_image = _Tracked()
+    damage_dealt = _Tracked()
+
+    # liczniki wpływające na przewidywany przychód
+    _ECONOMY_COUNTERS = frozenset(("wave", "peasants", "food"))
+
+    def __init__(self, num_tiles=5, tile_size=5, compact=False, clock=None, sparse=False,
+                 seed=None):
+        # zegar gry (clock.RealClock / ScaledClock / SteppedClock) — czas fal i upływ gry
+        self.clock = clock if clock is not None else REAL_CLOCK
+        # losowania planszy (tło) z ziarnem: stan RNG to (seed, rng_draws), więc gra
+        # odtworzona z dziennika albo zapisu losuje to samo
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng_draws = 0
+        # dziennik poleceń (journal.Journal.attach) i numer ostatniego zapisanego polecenia
+        self.journal = None
+        self.journal_seq = 0
+        self._journal_depth = 0
+
+        # ---- wersjonowanie stanu: każda zmiana podbija version i trafia do dziennika ----
+        self.state_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._changes = OrderedDict()  # {(rodzaj, klucz): wersja} — od najstarszej zmiany
+        # te same zmiany jako lista tylko do dopisywania [(wersja, rodzaj, klucz)] —
+        # współdzielona przez migawki (BoardSnapshot), przy zagęszczaniu zastępowana nową
+        self._change_seq = []
+        self._change_seq_limit = 1024
+
         # ---- rozmiary i plansza główna ----
-        self.tile_size = 5
-        self.num_tiles = 5
+        self.tile_size = tile_size
+        self.num_tiles = num_tiles
         self.total_rows = self.total_cols = self.num_tiles * self.tile_size
-        self.grid = [["void"] * self.total_cols
-                     for _ in range(self.total_rows)]
+        # compact=True: siatka uint8 w NumPy (grid_store.CompactGrid) z widokiem jak lista list
+        # sparse=True: pamięć tylko dla aktywnych kafelków (grid_store.SparseGrid), dla dużych map
+        self.sparse = bool(sparse)
+        self.compact = bool(compact) and not self.sparse
+        if self.sparse:
+            self.grid = SparseGrid(self.total_rows, self.total_cols, self.tile_size)
+        elif self.compact:
+            self.grid = CompactGrid(self.total_rows, self.total_cols)
+        else:
+            self.grid = [["void"] * self.total_cols
+                         for _ in range(self.total_rows)]
         self.active_tiles = set()
 
         # ---- ekspansja kafelków (baza i portale) ----
@@ -25,6 +181,8 @@ class Board:
         self.first_tile_placed = False
         self.latest_tile = None
         self.current_portal = None
+        # dozwolone kafelki ekspansji: (klucz stanu ekspansji, lista, zbiór, JSON)
+        self._allowed_cache = None
 
         # ---- separator i obóz ----
         self.separator_y = self.total_rows
@@ -33,13 +191,16 @@ class Board:
         self.camp_origin_row = self.separator_y + 1
         self.camp_origin_col = (self.total_cols - self.camp_w_tiles*self.tile_size)//2
         self.camp = {}
-        self.camp_buildings = {}
+        self.camp_buildings = _TrackedDict(self, "camp")
+        # liczba budynków obozu wg typu (aktualizowana w build_in_camp)
+        self.building_counts = Counter()
+        self._income_cache = None  # (klucz, przewidywany income)
         self.init_camp()
 
         # ---- tła losowane z katalogu static/img ----
         img_dir = os.path.join(os.path.dirname(__file__), "static", "img")
-        self._bg_candidates = [f for f in os.listdir(img_dir)
-                               if f.lower().endswith((".png", ".jpg", ".jpeg"))]
+        self._bg_candidates = sorted(f for f in os.listdir(img_dir)
+                                     if f.lower().endswith((".png", ".jpg", ".jpeg")))
         self.bg_image = None
 
         # ---- statystyki gry ----
@@ -55,15 +216,17 @@ class Board:
         self._hp_before_wave = self.hp
         self._expected_enemies = 0
         self._spawned_in_wave = 0
+        # suma obrażeń zadanych przez wieże (zgłaszana w paczkach /api/events)
+        self.damage_dealt = 0
 
         # ---- surowce obozu i siła robocza ----
-        self.resources = {
+        self.resources = _TrackedDict(self, "resources", {
             "wood":     0,
             "stone":    0,
             "iron_ore": 0,
             "iron_bar": 0,
             "diamond":  0
-        }
+        })
         self.peasants = 0
         self.unemployed = 0
         self.food = 6
@@ -72,7 +235,43 @@ class Board:
         self.income = {k: 0 for k in ("wood", "stone", "iron_ore", "iron_bar", "diamond", "food")}
 
         # ---- struktury na głównej planszy ----
-        self.structures = {}  # {(r,c): "wall"/"tower1"/...}
+        self.structures = _TrackedDict(self, "structure")  # {(r,c): "wall"/"tower1"/...}
+
+        # poziomy ulepszeń wież tej gry (patrz tower_logic.do_upgrade)
+        self.upgrade_levels = new_upgrade_levels()
+
+        # ---- cache ścieżki portal -> baza (unieważniany przy zmianie siatki/struktur) ----
+        self.base_cell = None
+        self.path_version = 0
+        self._path_cache = None
+        self._validator = None
+        self._flow_field = None
+
+    # -----------------------
+    # DZIENNIK ZMIAN (wersjonowany stan)
+    # -----------------------
+    def _record(self, kind, key):
+        """Zapisuje zmianę (rodzaj, klucz) pod nową wersją stanu."""
+        self.version += 1
+        k = (kind, key)
+        if k in self._changes:
+            self._changes.move_to_end(k)
+        self._changes[k] = self.version
+        self._change_seq.append((self.version, kind, key))
+        if len(self._change_seq) > self._change_seq_limit:
+            # nowa lista (bez powtórzeń kluczy) — starsze migawki trzymają starą
+            self._change_seq = [(v, kd, ky) for (kd, ky), v in self._changes.items()]
+            self._change_seq_limit = 2 * len(self._change_seq) + 1024
+
+    def _rng(self):
+        """Generator kolejnego losowania (wyznaczony przez ziarno i numer losowania)."""
+        self.rng_draws += 1
+        return random.Random(f"{self.seed}/{self.rng_draws}")
+
+    def _set_cell(self, r, c, t):
+        if self.grid[r][c] != t:
+            self.grid[r][c] = t
+            self._record("cell", (r, c))
 
     # -----------------------
     # KONFIGURACJA OBOZU / POMOCNICZE
@@ -98,14 +297,14 @@ class Board:
     def activate_tile(self, tx, ty):
         """
         Aktywuje kafelek (tx,ty) — ustawia pola 'void' wewnątrz kafelka na 'open_area'
-        oraz dodaje go do zestawu aktywnych kafelków.
+        oraz dodaje go do zestawu aktywnych kafelków (siatka rzadka alokuje go dopiero tu).
         """
         sr, sc = ty*self.tile_size, tx*self.tile_size
         self.active_tiles.add((tx, ty))
         for r in range(sr, sr+self.tile_size):
             for c in range(sc, sc+self.tile_size):
                 if self.grid[r][c] == "void":
-                    self.grid[r][c] = "open_area"
+                    self._set_cell(r, c, "open_area")
 
     def init_base_at(self, tx, ty):
         """
@@ -116,18 +315,20 @@ class Board:
         sr, sc = ty*ts, tx*ts
         for r in range(sr, sr+ts):
             for c in range(sc, sc+ts):
-                self.grid[r][c] = "base_area"
+                self._set_cell(r, c, "base_area")
         for r in range(sr+1, sr+ts-1):
             for c in range(sc+1, sc+ts-1):
-                self.grid[r][c] = "tower_area"
+                self._set_cell(r, c, "tower_area")
         midr, midc = sr+ts//2, sc+ts//2
-        self.grid[midr][midc] = "base"
+        self._set_cell(midr, midc, "base")
+        self.base_cell = (midr, midc)
         for c in range(sc, sc+ts):
-            self.grid[sr][c] = "wall"
-            self.grid[sr+ts-1][c] = "wall"
+            self._set_cell(sr, c, "wall")
+            self._set_cell(sr+ts-1, c, "wall")
         for r in range(sr, sr+ts):
-            self.grid[r][sc] = "wall"
-            self.grid[r][sc+ts-1] = "wall"
+            self._set_cell(r, sc, "wall")
+            self._set_cell(r, sc+ts-1, "wall")
+        self.invalidate_path()
 
     def _open_base_wall(self, dx, dy):
         """
@@ -144,7 +345,7 @@ class Board:
             r, c = sr+ts//2, sc
         else:
             r, c = sr+ts//2, sc+ts-1
-        self.grid[r][c] = "open_area"
+        self._set_cell(r, c, "open_area")
 
     def _place_portal_on(self, tile, direction):
         """
@@ -163,7 +364,7 @@ class Board:
             pr, pc = sr+ts//2, sc
         else:
             pr, pc = sr+ts//2, sc+ts-1
-        self.grid[pr][pc] = "portal"
+        self._set_cell(pr, pc, "portal")
         self.current_portal = (pr, pc)
 
     def clear_previous_portal(self):
@@ -171,13 +372,32 @@ class Board:
         if self.current_portal:
             pr, pc = self.current_portal
             if self.grid[pr][pc] == "portal":
-                self.grid[pr][pc] = "open_area"
+                self._set_cell(pr, pc, "open_area")
             self.current_portal = None
+            self.invalidate_path()
 
     def get_allowed_expansion_tiles(self):
         """
         Zwraca listę kafelków (tx,ty) które można rozszerzyć.
+        Wynik jest zapamiętany do następnej ekspansji (patrz _allowed_tiles);
+        nie należy go modyfikować.
+        """
+        return self._allowed_tiles()[1]
+
+    def _allowed_tiles(self):
+        """(klucz, lista, frozenset, JSON) dozwolonych kafelków; przeliczane po zmianie kafelków."""
+        key = (self.first_tile_placed, self.latest_tile, len(self.active_tiles))
+        cache = self._allowed_cache
+        if cache is None or cache[0] != key:
+            tiles = self._compute_allowed_tiles()
+            cache = self._allowed_cache = (key, tiles, frozenset(tiles),
+                                           [{"tx": tx, "ty": ty} for tx, ty in tiles])
+        return cache
+
+    def _compute_allowed_tiles(self):
+        """
         Mechanizm BFS szuka najbliższych nieaktywnych kafelków od latest_tile.
+        Przed pierwszym umieszczeniem dozwolony jest każdy kafelek.
         """
         if not self.first_tile_placed:
             return [(tx, ty)
@@ -208,22 +428,24 @@ class Board:
                     q.append(((nx, ny), dist+1))
         return candidates
 
+    @journaled("manual_expand_tile")
     def manual_expand_tile(self, tx, ty):
         """
         Rozszerza planszę o kafelek (tx,ty) jeśli dozwolone.
         Przy pierwszym umieszczeniu ustawia bazę i portal.
         """
-        allowed = self.get_allowed_expansion_tiles()
-        if (tx, ty) not in allowed:
+        if (tx, ty) not in self._allowed_tiles()[2]:
             return False
         if not self.first_tile_placed:
             self.base_tile = (tx, ty)
             self.init_base_at(tx, ty)
             self.activate_tile(tx, ty)
             if self._bg_candidates:
-                self.bg_image = random.choice(self._bg_candidates)
+                self.bg_image = self._rng().choice(self._bg_candidates)
             self.first_tile_placed = True
             self.latest_tile = (tx, ty)
+            self.invalidate_path()
+            self._record("tiles", None)
             return True
         prev_tx, prev_ty = self.latest_tile
         self.activate_tile(tx, ty)
@@ -233,11 +455,60 @@ class Board:
         self.clear_previous_portal()
         self._place_portal_on((tx, ty), (dx, dy))
         self.latest_tile = (tx, ty)
+        self.invalidate_path()
+        self._record("tiles", None)
         return True
 
+    # -----------------------
+    # ŚCIEŻKA PORTAL -> BAZA (cache)
+    # -----------------------
+    def invalidate_path(self):
+        """Unieważnia zapamiętaną ścieżkę i podbija jej wersję."""
+        self.path_version += 1
+        self._path_cache = None
+        self._validator = None
+        self._flow_field = None
+
+    def get_flow_field(self):
+        """
+        Zwraca pole przepływu (FlowField) bieżącej planszy: odległość do bazy
+        i następny krok z każdego przechodniego pola. Jeden odwrotny BFS od bazy
+        na wersję ścieżki, wspólny dla ścieżki, walidatora i symulacji fal.
+        """
+        if self._flow_field is None:
+            with _FLOW_FIELD_BUILD.time():
+                self._flow_field = FlowField(self.grid, self.base_cell, blocked=self.structures.keys())
+        return self._flow_field
+
+    def get_path(self):
+        """
+        Zwraca najkrótszą ścieżkę portal -> baza jako listę [[r,c], ...]
+        (odczytaną z pola przepływu). Liczona tylko gdy od ostatniego wywołania
+        zmieniła się siatka lub struktury (patrz invalidate_path). Wyniku nie należy modyfikować.
+        """
+        if self._path_cache is None:
+            if not self.first_tile_placed or self.base_tile is None or self.current_portal is None:
+                self._path_cache = []
+            else:
+                self._path_cache = [[r, c] for r, c in self.get_flow_field().path_from(self.current_portal)]
+        return self._path_cache
+
+    def get_placement_validator(self):
+        """
+        Zwraca PlacementValidator dla bieżącej planszy (budowany raz na wersję ścieżki).
+        Służy do sprawdzania, czy nowa struktura nie zablokuje drogi portal -> baza.
+        """
+        if self._validator is None:
+            field = self.get_flow_field()
+            with _VALIDATOR_BUILD.time():
+                self._validator = PlacementValidator(self.grid, self.base_cell, self.current_portal,
+                                                     field=field)
+        return self._validator
+
     # -----------------------
     # BUDOWANIE W OBOZIE (camp)
     # -----------------------
+    @journaled("build_in_camp")
     def build_in_camp(self, r, c, typ):
         """
         Buduje budynek w obozie. Zwraca True/False.
@@ -274,11 +545,18 @@ class Board:
 
         # rejestrujemy budynek
         self.camp_buildings[(r, c)] = typ
+        self.building_counts[typ] += 1
         return True
 
+    def recount_buildings(self):
+        """Przelicza building_counts od zera (po zmianie camp_buildings z pominięciem build_in_camp)."""
+        self.building_counts = Counter(self.camp_buildings.values())
+        self._income_cache = None
+
     # -----------------------
     # BUDOWANIE STRUKTUR NA MAPIE (mury, wieże)
     # -----------------------
+    @journaled("place_structure")
     def place_structure(self, typ, r, c):
         """
         Stawia mur lub wieżę, pobierając złoto. Zwraca True jeśli udało się postawić.
@@ -301,6 +579,9 @@ class Board:
             # pobierz koszt
             self.gold -= spec.cost
             self.structures[(r, c)] = "wall"
+            if self.compact:
+                self.grid.set_structure(r, c, "wall")
+            self.invalidate_path()
             return True
 
         # Wieża
@@ -308,6 +589,8 @@ class Board:
         # jeżeli na polu jest ściana, usuwamy ją
         if existing == "wall":
             del self.structures[(r, c)]
+            if self.compact:
+                self.grid.set_structure(r, c, None)
         # ponownie sprawdź czy można
         cell = self.grid[r][c]
         if cell not in ("open_area", "tower_area") or (r, c) in self.structures:
@@ -316,6 +599,9 @@ class Board:
         # pobierz koszt i stawiamy wieżę
         self.gold -= spec.cost
         self.structures[(r, c)] = typ
+        if self.compact:
+            self.grid.set_structure(r, c, typ)
+        self.invalidate_path()
         return True
 
     # -----------------------
@@ -328,11 +614,12 @@ class Board:
         stages = (w - 1) // 2
         return 2 ** stages
 
+    @journaled("start_wave")
     def start_wave(self):
         """Rozpoczyna nową falę: inicjalizuje liczniki spawnow i czas fali."""
         self.wave += 1
         self.wave_active = True
-        self.wave_start_time = time.time()
+        self.wave_start_time = self.clock.now()
         self._hp_before_wave = self.hp
 
         # ile przeciwników będzie w tej fali i zresetuj licznik spawnów
@@ -342,6 +629,7 @@ class Board:
         # active_enemies będzie aktualizowane przez endpointy klienta
         self.active_enemies = 0
 
+    @journaled("enemy_spawned")
     def enemy_spawned(self, n=1):
         """
         Zgłoszenie, że n wrogów zostało stworzonych (używane przez endpoint /api/enemy_spawn).
@@ -361,6 +649,7 @@ class Board:
 
         return self.active_enemies
 
+    @journaled("enemy_killed")
     def enemy_killed(self, n=1, reached_base=False, enemy_hp=1):
         """
         Zgłoszenie, że n wrogów zostało zabitych lub dotarło do bazy.
@@ -404,126 +693,179 @@ class Board:
                     self.wave_active = False
                     self.wave_start_time = None
 
+    @journaled("apply_enemy_events")
+    def apply_enemy_events(self, events):
+        """
+        Stosuje uporządkowaną paczkę zdarzeń przeciwników w jednym przejściu:
+        {"type": "spawn"|"die"|"reached_base"|"damage", "count": n, "hp": x, "amount": x}.
+        Kolejne zdarzenia tego samego rodzaju są łączone w jedno wywołanie
+        enemy_spawned / enemy_killed (wynik jest taki sam jak przy osobnych wywołaniach).
+        Cała paczka to jedno polecenie dziennika — razem z sumą obrażeń (damage_dealt).
+        Zwraca liczbę zastosowanych zdarzeń.
+        """
+        applied = 0
+        run_key, run_count = None, 0
+
+        def flush(key, count):
+            if key is None or count <= 0:
+                return
+            if key[0] == "spawn":
+                self.enemy_spawned(count)
+            elif key[0] == "die":
+                self.enemy_killed(count)
+            else:
+                self.enemy_killed(count, reached_base=True, enemy_hp=key[1])
+
+        for ev in events:
+            if not isinstance(ev, dict):
+                continue
+            typ = ev.get("type")
+            try:
+                cnt = max(0, int(ev.get("count", 1)))
+            except (TypeError, ValueError):
+                cnt = 1
+            if typ == "die" and ev.get("reached_base"):
+                typ = "reached_base"
+            if typ == "damage":
+                try:
+                    self.damage_dealt += max(0.0, float(ev.get("amount", 0)))
+                except (TypeError, ValueError):
+                    continue
+                applied += 1
+                continue
+            if typ == "spawn":
+                key = ("spawn",)
+            elif typ == "die":
+                key = ("die",)
+            elif typ == "reached_base":
+                try:
+                    key = ("reached_base", max(1, int(ev.get("hp", 1))))
+                except (TypeError, ValueError):
+                    key = ("reached_base", 1)
+            else:
+                continue
+            if key != run_key:
+                flush(run_key, run_count)
+                run_key, run_count = key, 0
+            run_count += cnt
+            applied += 1
+        flush(run_key, run_count)
+        return applied
+
+    @journaled("end_wave")
+    @metrics.timed("td_board_end_wave_seconds", "Czas Board.end_wave")
     def end_wave(self):
         """
         Zakończenie fali: naliczenie czasu, obliczenie przychodów (food, surowce),
         aktualizacja zasobów i income.
         """
         # 0) czas
-        if self.wave_active and self.wave_start_time:
-            self.elapsed_time += int(time.time() - self.wave_start_time)
+        if self.wave_active and self.wave_start_time is not None:
+            self.elapsed_time += int(self.clock.now() - self.wave_start_time)
         self.wave_active = False
         self.wave_start_time = None
 
-        # 1) reset przychodów
-        for k in self.income:
-            self.income[k] = 0
-
-        cnt = list(self.camp_buildings.values()).count
-
-        # 2) obliczamy zmianę żywności (farmy vs konsumcja)
-        farm_count = cnt("farm")
-        # każda farma produkuje 4 żywności,
-        # konsumują wszyscy peasants poza tymi na farmach
-        food_inc = 4 * farm_count - max(0, self.peasants - farm_count)
-
-        # 3) sprawdzamy, czy po tej zmianie food >= 0
-        can_prod = (self.food + food_inc) >= 0
-
-        # 4) aktualizujemy stan żywności i income
-        self.food += food_inc
-        self.income["food"] += food_inc
-
-        # 5) produkcja surowców tylko gdy can_prod==True
-        if can_prod:
-            # 5a) kopalnia rudy i kamienia
-            ore = cnt("iron_mine")
-            stone = 2 * cnt("quarry") + ore
-            self.resources["iron_ore"] += ore
-            self.resources["stone"] += stone
-            self.income["iron_ore"] += ore
-            self.income["stone"] += stone
-
-            # 5b) tartak → drewno
-            wood = 2 * cnt("sawmill")
-            self.resources["wood"] += wood
-            self.income["wood"] += wood
-
-            # 5c) huta żelaza (priorytet)
-            sm = cnt("smelter")
-            # każdy piece zamienia jedną rudę i jedno drewno
-            bars = min(sm, self.resources["iron_ore"], self.resources["wood"])
-            self.resources["iron_ore"] -= bars
-            self.resources["wood"] -= bars
-            self.resources["iron_bar"] += bars
-            # huta „cofa” te koszty w przychodach
-            self.income["iron_ore"] -= bars
-            self.income["wood"] -= bars
-            self.income["iron_bar"] += bars
-
-            # 5d) diamenty i złoto na zmianę co falę
-            mines = cnt("diamond_mine")
-            if mines:
-                if self.wave % 2 == 0:
-                    # parzyste fale: diamenty
-                    self.resources["diamond"] += mines
-                    self.income["diamond"] += mines
-                else:
-                    # nieparzyste fale: 3 złota z każdej kopalni
-                    gold_gain = 3 * mines
-                    self.gold += gold_gain
-                    # nie zapisywujemy tego w income, bo nie chcemy pokazywać w income
+        # 1) przychody z budynków obozu (żywność, surowce, huta, kopalnie diamentów)
+        income, gold_gain = economy_step(self.building_counts, self.peasants, self.food,
+                                         self.resources, self.wave)
+
+        # 2) aktualizacja stanu
+        self.food += income["food"]
+        for k in RESOURCE_KEYS:
+            if income[k]:
+                self.resources[k] += income[k]
+        self.gold += gold_gain
+        self.income.update(income)
+
+    @journaled("debug_add")
+    def debug_add(self, res_type, amount):
+        """Debug: dodaje `amount` do hp, złota, żywności albo surowca. Zwraca nową wartość."""
+        if res_type in ("hp", "gold", "food"):
+            setattr(self, res_type, getattr(self, res_type, 0) + amount)
+            return getattr(self, res_type)
+        if res_type in self.resources:
+            self.resources[res_type] = self.resources.get(res_type, 0) + amount
+            return self.resources[res_type]
+        return None
+
+    def project_economy(self, waves):
+        """
+        Prognoza ekonomii na `waves` kolejnych końców fal (bez walki i nowych budynków):
+        bieżącej fali, jeśli trwa, inaczej następnych. Nie zmienia planszy.
+        Zwraca listę {"wave", "food", "gold_gain", <surowce>} — stan po każdej fali.
+        """
+        counts = self.building_counts
+        peasants, food = self.peasants, self.food
+        resources = dict(self.resources)
+        wave = self.wave if self.wave_active else self.wave + 1
+        out = []
+        for _ in range(max(0, int(waves))):
+            income, gold_gain = economy_step(counts, peasants, food, resources, wave)
+            food += income["food"]
+            for k in RESOURCE_KEYS:
+                resources[k] += income[k]
+            row = {"wave": wave, "food": food, "gold_gain": gold_gain}
+            row.update(resources)
+            out.append(row)
+            wave += 1
+        return out
 
     # -----------------------
     # EKSPORT STANU / HELPERY DLA FRONTENDU
     # -----------------------
-    def get_layout(self):
+    def _projected_income(self):
+        """Przewidywany income (taki sam, jak obliczyłby end_wave); liczony ponownie tylko po zmianie wejść."""
+        key = (tuple(self.building_counts.items()), self.peasants, self.food,
+               self.resources["iron_ore"], self.resources["wood"], self.wave % 2)
+        cache = self._income_cache
+        if cache is not None and cache[0] == key:
+            return dict(cache[1])
+        income, _ = economy_step(self.building_counts, self.peasants, self.food,
+                                 self.resources, self.wave)
+        self._income_cache = (key, income)
+        return dict(income)
+
+    def _elapsed_now(self):
+        return self.elapsed_time + (int(self.clock.now()-self.wave_start_time) if self.wave_active else 0)
+
+    def _camp_cell(self, r, c):
+        return {"x": c, "y": r,
+                "t": self.camp[(r, c)],
+                "b": (r, c) in self.camp_buildings,
+                "bt": self.camp_buildings.get((r, c))}
+
+    def _grid2d(self):
+        if self.sparse:
+            return None  # plansza rzadka wysyła tylko aktywne kafelki ("chunks")
+        return self.grid.tolist() if self.compact else self.grid
+
+    def _chunks_json(self):
+        return [{"tx": tx, "ty": ty, "cells": cells} for (tx, ty), cells in self.grid.chunks()]
+
+    def _allowed_tiles_json(self):
+        return self._allowed_tiles()[3]
+
+    @metrics.timed("td_board_get_layout_seconds", "Czas budowy layoutu planszy (Board.get_layout)")
+    def get_layout(self, camp=None):
         """
         Zwraca serializowalny layout/planszę do frontendu (stan gry, kafelki, struktury, zasoby).
         Oblicza przewidywane przychody tak, jak zrobiłby to end_wave.
+        `camp` — gotowa lista pól obozu (BoardSnapshot składa ją z poprzedniej migawki).
         """
-        cnt = list(self.camp_buildings.values()).count
-
-        # przewidywany income (taki sam jak end_wave obliczyłby)
-        farm_count = cnt("farm")
-        food_inc = 4*farm_count - max(0, self.peasants - farm_count)
-        can_prod = ((self.food + food_inc) >= 0)
-
-        ore_inc = cnt("iron_mine") if can_prod else 0
-        stone_inc = (2*cnt("quarry") + ore_inc) if can_prod else 0
-        wood_inc = 2*cnt("sawmill") if can_prod else 0
-        bar_inc = min(cnt("smelter"),
-                        self.resources["iron_ore"]+ore_inc,
-                        self.resources["wood"]+wood_inc) if can_prod else 0
-        dia_inc = cnt("diamond_mine") if (can_prod and self.wave % 2 == 0) else 0
-
-        incomes = {
-            "wood":      wood_inc - bar_inc,
-            "stone":     stone_inc,
-            "iron_ore":  ore_inc - bar_inc,
-            "iron_bar":  bar_inc,
-            "diamond":   dia_inc,
-            "food":      food_inc
-        }
-
-        return {
-            "grid2d":        self.grid,
+        layout = {
+            "version":       self.version,
+            "state_id":      self.state_id,
+            "path_version":  self.path_version,
+            "grid2d":        self._grid2d(),
             "separator_y":   self.separator_y,
             "total_rows":    self.total_rows,
             "total_cols":    self.total_cols,
             "tile_size":     self.tile_size,
             "num_tiles":     self.num_tiles,
             "bg_image":      self.bg_image,
-            "camp": [
-                {"x": c, "y": r,
-                 "t": self.camp[(r, c)],
-                 "b": (r, c) in self.camp_buildings,
-                 "bt": self.camp_buildings.get((r, c))}
-                for (r, c) in sorted(self.camp)
-            ],
-            "allowed_tiles":
-                [{"tx": tx, "ty": ty}
-                             for tx, ty in self.get_allowed_expansion_tiles()],
+            "camp":          camp if camp is not None else
+                             [self._camp_cell(r, c) for (r, c) in sorted(self.camp)],
+            "allowed_tiles": self._allowed_tiles_json(),
             "structures":
                 [{"x": c, "y": r, "t": t}
                           for (r, c), t in self.structures.items()],
@@ -533,10 +875,234 @@ class Board:
             "wave":          self.wave,
             "wave_active": self.wave_active,
             "active_enemies": getattr(self, "active_enemies", 0),
-            "time":          self.elapsed_time + (int(time.time()-self.wave_start_time) if self.wave_active else 0),
-            "resources":     self.resources,
+            "time":          self._elapsed_now(),
+            "resources":     dict(self.resources),
             "peasants":      self.peasants,
             "unemployed":    self.unemployed,
             "food":          self.food,
-            "income":        incomes,
+            "income":        self._projected_income(),
+        }
+        if self.sparse:
+            layout["chunks"] = self._chunks_json()
+        return layout
+
+    def snapshot(self, previous=None):
+        """
+        Niezmienna kopia stanu do odczytu bez blokady gry (patrz BoardSnapshot).
+        `previous` — poprzednia migawka tej planszy; jej niezmienione wiersze siatki
+        są współdzielone zamiast kopiowane.
+        """
+        return BoardSnapshot(self, previous)
+
+    def get_delta(self, since=None, state_id=None):
+        """
+        Zmiany stanu od wersji `since`: tylko zmienione pola siatki, struktury,
+        budynki obozu i liczniki (plus czas gry). Bez `since`, przy obcym
+        `state_id` albo nieznanej wersji zwraca pełny layout z full=True.
+        """
+        if since is None or state_id != self.state_id or not (0 <= since <= self.version):
+            layout = self.get_layout()
+            layout["full"] = True
+            return layout
+
+        cells, structures, camp, counters = [], [], [], {}
+        kinds = set()
+        for (kind, key), ver in reversed(self._changes.items()):
+            if ver <= since:
+                break
+            kinds.add(kind)
+            if kind == "cell":
+                r, c = key
+                cells.append([r, c, self.grid[r][c]])
+            elif kind == "structure":
+                r, c = key
+                structures.append({"x": c, "y": r, "t": self.structures.get(key)})
+            elif kind == "camp":
+                camp.append(self._camp_cell(*key))
+            elif kind == "counter":
+                counters[key] = getattr(self, key)
+                if key in self._ECONOMY_COUNTERS:
+                    kinds.add("economy")
+
+        delta = {
+            "full":       False,
+            "version":    self.version,
+            "state_id":   self.state_id,
+            "path_version": self.path_version,
+            "cells":      cells,
+            "structures": structures,
+            "camp":       camp,
+            "counters":   counters,
+            "time":       self._elapsed_now(),
+        }
+        if "resources" in kinds:
+            counters["resources"] = dict(self.resources)
+        if kinds & {"resources", "camp", "economy"}:
+            delta["income"] = self._projected_income()
+        if "tiles" in kinds:
+            delta["allowed_tiles"] = self._allowed_tiles_json()
+        return delta
+
+
+# -------------------------
+# MIGAWKA STANU (odczyt bez blokady gry)
+# -------------------------
+_TRACKED_COUNTERS = tuple(n for n, v in vars(Board).items() if isinstance(v, _Tracked))
+
+
+class BoardSnapshot:
+    """
+    Stan planszy z chwili publikacji (sessions.GameSession.publish) — layout
+    i różnice jak Board.get_layout / Board.get_delta, ale bez dostępu do
+    żywej planszy. Tylko czas gry liczony jest przy odczycie.
+    """
+
+    def __init__(self, board, previous=None):
+        changes = self._changes_since(board, previous)
+        camp = None
+        if changes is not None:
+            # pola obozu bez zmian — te same (niezmieniane) słowniki co w poprzedniej migawce
+            old = previous._camp
+            camp = previous.layout["camp"] if not changes[1] else [
+                board._camp_cell(r, c) if (r, c) in changes[1] else old[(r, c)]
+                for (r, c) in sorted(board.camp)]
+        layout = board.get_layout(camp)
+        self.version = board.version
+        self.state_id = board.state_id
+        self.path_version = board.path_version
+        self.wave = board.wave
+        self.wave_active = board.wave_active
+        self._elapsed = board.elapsed_time
+        self._wave_start = board.wave_start_time
+        self._clock = board.clock
+        self._changes = board._change_seq
+        self._changes_len = len(self._changes)
+        self._counters = {name: getattr(board, name) for name in _TRACKED_COUNTERS}
+        self._structures = dict(board.structures)
+        if camp is not None and camp is previous.layout["camp"]:
+            self._camp = previous._camp
+        else:
+            self._camp = {(cell["y"], cell["x"]): cell for cell in layout["camp"]}
+        self._tile_size = board.tile_size
+        # kopie siatki — żywe wiersze planszy zmieniają się po publikacji; wiersze
+        # (kafelki) bez zmian od poprzedniej migawki są z nią współdzielone
+        changed = changes[0] if changes is not None and not board.compact else None
+        if board.sparse:
+            ts = board.tile_size
+            dirty = None if changed is None else {(c // ts, r // ts) for r, c in changed}
+            old = previous._chunks if dirty is not None else {}
+            self._chunks = {key: old[key] if key in old and key not in dirty
+                            else [list(row) for row in cells]
+                            for key, cells in board.grid.chunks()}
+            layout["chunks"] = [{"tx": tx, "ty": ty, "cells": cells}
+                                for (tx, ty), cells in sorted(self._chunks.items())]
+            self._grid = None
+        else:
+            if not board.compact:
+                if changed is None:
+                    layout["grid2d"] = [list(row) for row in layout["grid2d"]]
+                else:
+                    rows = list(previous._grid)
+                    for r in {r for r, _ in changed}:
+                        rows[r] = list(board.grid[r])
+                    layout["grid2d"] = rows
+            self._grid = layout["grid2d"]
+        self.layout = layout
+
+    @staticmethod
+    def _changes_since(board, previous):
+        """
+        (pola siatki, pola obozu) zmienione od migawki `previous` albo None, gdy
+        trzeba zbudować wszystko od nowa (brak poprzedniej migawki, nowy stan planszy).
+        """
+        if (previous is None or previous.state_id != board.state_id
+                or previous.version > board.version):
+            return None
+        cells, camp = set(), set()
+        changes = board._change_seq
+        for i in range(len(changes) - 1, -1, -1):
+            ver, kind, key = changes[i]
+            if ver <= previous.version:
+                break
+            if kind == "cell":
+                cells.add(key)
+            elif kind == "camp":
+                camp.add(key)
+        return cells, camp
+
+    def time(self):
+        if self.wave_active:
+            return self._elapsed + int(self._clock.now() - self._wave_start)
+        return self._elapsed
+
+    def layout_now(self, now=None):
+        """Pełny layout z bieżącym czasem gry (albo podanym `now` z time())."""
+        layout = dict(self.layout)
+        layout["time"] = self.time() if now is None else now
+        return layout
+
+    def delta_base(self, since, state_id):
+        """Wersja, od której liczona będzie różnica, albo None, gdy potrzebny pełny stan."""
+        if since is None or state_id != self.state_id or not (0 <= since <= self.version):
+            return None
+        return since
+
+    def _cell(self, r, c):
+        if self._grid is not None:
+            return self._grid[r][c]
+        ts = self._tile_size
+        chunk = self._chunks.get((c // ts, r // ts))
+        return chunk[r % ts][c % ts] if chunk is not None else "void"
+
+    def delta(self, since=None, state_id=None, now=None):
+        """Jak Board.get_delta, ale ze stanu migawki (czas gry `now` domyślnie bieżący)."""
+        if now is None:
+            now = self.time()
+        if self.delta_base(since, state_id) is None:
+            layout = self.layout_now(now)
+            layout["full"] = True
+            return layout
+
+        cells, structures, camp, counters = [], [], [], {}
+        kinds = set()
+        seen = set()
+        changes = self._changes
+        for i in range(self._changes_len - 1, -1, -1):
+            ver, kind, key = changes[i]
+            if ver <= since:
+                break
+            if (kind, key) in seen:
+                continue
+            seen.add((kind, key))
+            kinds.add(kind)
+            if kind == "cell":
+                r, c = key
+                cells.append([r, c, self._cell(r, c)])
+            elif kind == "structure":
+                r, c = key
+                structures.append({"x": c, "y": r, "t": self._structures.get(key)})
+            elif kind == "camp":
+                camp.append(self._camp[key])
+            elif kind == "counter":
+                counters[key] = self._counters[key]
+                if key in Board._ECONOMY_COUNTERS:
+                    kinds.add("economy")
+
+        delta = {
+            "full":       False,
+            "version":    self.version,
+            "state_id":   self.state_id,
+            "path_version": self.path_version,
+            "cells":      cells,
+            "structures": structures,
+            "camp":       camp,
+            "counters":   counters,
+            "time":       now,
         }
+        if "resources" in kinds:
+            counters["resources"] = dict(self.layout["resources"])
+        if kinds & {"resources", "camp", "economy"}:
+            delta["income"] = self.layout["income"]
+        if "tiles" in kinds:
+            delta["allowed_tiles"] = self.layout["allowed_tiles"]
+        return delta
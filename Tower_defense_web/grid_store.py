@@ -0,0 +1,222 @@
+# grid_store.py
+"""
+Alternatywne reprezentacje siatki planszy:
+- CompactGrid: typy pól jako uint8 w tablicy NumPy (enum CellType) plus równoległa
+  warstwa struktur,
+- SparseGrid: tylko kafelki, w które coś zapisano (reszta to niejawne "void").
+Widok wierszy jest zgodny z listą list stringów, więc kod używający
+board.grid[r][c] działa bez zmian.
+"""
+from enum import IntEnum
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny — bez niego zostaje siatka list
+    np = None
+
+
+class CellType(IntEnum):
+    VOID = 0
+    OPEN_AREA = 1
+    TOWER_AREA = 2
+    BASE_AREA = 3
+    BASE = 4
+    WALL = 5
+    PORTAL = 6
+
+
+# nazwy pól w kolejności kodów (do zgodnego z JSON widoku grid2d)
+CELL_NAMES = ("void", "open_area", "tower_area", "base_area", "base", "wall", "portal")
+CELL_CODES = {name: code for code, name in enumerate(CELL_NAMES)}
+
+WALKABLE_CODES = (CellType.OPEN_AREA, CellType.TOWER_AREA, CellType.BASE_AREA,
+                  CellType.BASE, CellType.PORTAL)
+
+# warstwa struktur: 0 = brak
+STRUCTURE_NAMES = (None, "wall", "tower1", "tower2", "tower3", "tower4", "tower5")
+STRUCTURE_CODES = {name: code for code, name in enumerate(STRUCTURE_NAMES) if name}
+
+
+def numpy_available():
+    return np is not None
+
+
+class _RowView:
+    """Wiersz siatki zachowujący się jak lista stringów."""
+    __slots__ = ("_cells", "_r")
+
+    def __init__(self, cells, r):
+        self._cells = cells
+        self._r = r
+
+    def __getitem__(self, c):
+        return CELL_NAMES[self._cells[self._r, c]]
+
+    def __setitem__(self, c, name):
+        self._cells[self._r, c] = CELL_CODES[name]
+
+    def __len__(self):
+        return self._cells.shape[1]
+
+    def __iter__(self):
+        return (CELL_NAMES[v] for v in self._cells[self._r].tolist())
+
+
+class CompactGrid:
+    """
+    Siatka rows x cols w uint8. `grid[r][c]` czyta i zapisuje nazwy pól,
+    `tolist()` zwraca widok grid2d (lista list stringów) dla frontendu.
+    """
+
+    def __init__(self, rows, cols):
+        if np is None:
+            raise RuntimeError("CompactGrid wymaga pakietu numpy")
+        self.cells = np.zeros((rows, cols), dtype=np.uint8)
+        self.structures = np.zeros((rows, cols), dtype=np.uint8)
+        self._names = np.array(CELL_NAMES, dtype=object)
+
+    @property
+    def shape(self):
+        return self.cells.shape
+
+    @property
+    def nbytes(self):
+        return self.cells.nbytes + self.structures.nbytes
+
+    def __len__(self):
+        return self.cells.shape[0]
+
+    def __getitem__(self, r):
+        return _RowView(self.cells, r)
+
+    def __iter__(self):
+        return (_RowView(self.cells, r) for r in range(self.cells.shape[0]))
+
+    # ---- warstwa struktur ----
+    def set_structure(self, r, c, typ):
+        self.structures[r, c] = STRUCTURE_CODES.get(typ, 0) if typ else 0
+
+    # ---- widoki ----
+    def walkable_mask(self, blocked=None):
+        """Maska bool pól przechodnich (bez pól ze strukturami i `blocked`)."""
+        mask = np.isin(self.cells, WALKABLE_CODES) & (self.structures == 0)
+        if blocked:
+            cells = [(int(p[0]), int(p[1])) for p in blocked]
+            if cells:
+                rr, cc = zip(*cells)
+                mask[list(rr), list(cc)] = False
+        return mask
+
+    def find(self, name):
+        """Pierwsze pole danego typu jako (r,c) albo None."""
+        hits = np.argwhere(self.cells == CELL_CODES[name])
+        if len(hits) == 0:
+            return None
+        return int(hits[0][0]), int(hits[0][1])
+
+    def tolist(self):
+        return self._names[self.cells].tolist()
+
+
+# -------------------------
+# SIATKA RZADKA (kafelkami)
+# -------------------------
+class _SparseRow:
+    """Wiersz siatki rzadkiej zachowujący się jak lista stringów."""
+    __slots__ = ("_grid", "_r")
+
+    def __init__(self, grid, r):
+        self._grid = grid
+        self._r = r
+
+    def __getitem__(self, c):
+        return self._grid.get(self._r, c)
+
+    def __setitem__(self, c, name):
+        self._grid.set(self._r, c, name)
+
+    def __len__(self):
+        return self._grid.cols
+
+    def __iter__(self):
+        return (self._grid.get(self._r, c) for c in range(self._grid.cols))
+
+
+class SparseGrid:
+    """
+    Siatka rows x cols dzielona na kafelki tile_size x tile_size. Pamięć dostaje
+    dopiero kafelek, w którym zapisano pole inne niż "void" — pusty obszar mapy
+    nic nie kosztuje. `chunks()` zwraca tylko zaalokowane kafelki (layout, zapis).
+    """
+
+    def __init__(self, rows, cols, tile_size):
+        self.rows = rows
+        self.cols = cols
+        self.tile_size = tile_size
+        self._chunks = {}  # {(tx,ty): lista tile_size wierszy po tile_size nazw}
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    @property
+    def nbytes(self):
+        # wskaźnik 8 B na pole + nagłówki list; stringi są współdzielone
+        ts = self.tile_size
+        return len(self._chunks) * (ts * (ts * 8 + 56) + 56 + 100)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, r):
+        return _SparseRow(self, r)
+
+    def __iter__(self):
+        return (_SparseRow(self, r) for r in range(self.rows))
+
+    def get(self, r, c):
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            raise IndexError((r, c))
+        ts = self.tile_size
+        chunk = self._chunks.get((c // ts, r // ts))
+        if chunk is None:
+            return "void"
+        return chunk[r % ts][c % ts]
+
+    def set(self, r, c, name):
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            raise IndexError((r, c))
+        ts = self.tile_size
+        key = (c // ts, r // ts)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            if name == "void":
+                return
+            chunk = self._chunks[key] = [["void"] * ts for _ in range(ts)]
+        chunk[r % ts][c % ts] = name
+
+    # ---- widoki ----
+    def chunks(self):
+        """Zaalokowane kafelki jako [((tx,ty), wiersze), ...] w stałej kolejności."""
+        return sorted(self._chunks.items())
+
+    def load_chunk(self, tx, ty, cells):
+        """Wstawia cały kafelek (np. z layoutu lub zapisu gry)."""
+        self._chunks[(tx, ty)] = [list(row) for row in cells]
+
+    def find(self, name):
+        """Pierwsze pole danego typu jako (r,c) albo None."""
+        ts = self.tile_size
+        best = None
+        for (tx, ty), cells in self._chunks.items():
+            for dr, row in enumerate(cells):
+                if name in row:
+                    cell = (ty * ts + dr, tx * ts + row.index(name))
+                    if best is None or cell < best:
+                        best = cell
+                    break
+        return best
+
+    def tolist(self):
+        """Gęsty widok grid2d (lista list stringów) — rośnie z rozmiarem mapy."""
+        return [list(row) for row in self]
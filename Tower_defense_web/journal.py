@@ -0,0 +1,311 @@
+# journal.py
+"""
+Dziennik poleceń gier: każde wywołanie punktu wejścia zmieniającego planszę
+(manual_expand_tile, place_structure, build_in_camp, start_wave, enemy_spawned,
+enemy_killed, end_wave, debug_add, tower_logic.do_upgrade) trafia jako jedna
+linia JSON do pliku tylko do dopisywania (buforowanego):
+
+  {"g": id gry, "s": numer polecenia w grze, "t": czas zegara planszy,
+   "c": polecenie, "a": argumenty, "k": argumenty nazwane}
+
+Nowa gra zaczyna się wpisem "new" z parametrami planszy i ziarnem RNG, więc
+grę można odtworzyć (replay) do dowolnego momentu na zegarze krokowym —
+bez czekania na czas rzeczywisty. Gra usunięta z pamięci kończy się wpisem
+"drop". Odzyskanie po awarii: checkpoint (savefile, zawiera numer ostatniego
+polecenia) plus ogon dziennika (recover); po każdym checkpoincie rotate()
+usuwa z dziennika to, co już jest w zapisie, więc plik nie rośnie bez końca.
+
+Na dysku dziennik to segmenty: zamknięte "plik.1", "plik.2", ... i bieżący
+"plik", do którego się dopisuje. rotate() pod blokadą tylko zamyka bieżący
+segment; przepisanie starych segmentów idzie już bez blokady, więc zapisy
+gier nie czekają na kopię pliku. Przepisane segmenty trafiają do
+"plik.<n>.tmp", który do czasu podmiany zastępuje przy odczycie segmenty ≤ n.
+"""
+import functools
+import glob
+import json
+import os
+import re
+import threading
+
+from clock import SteppedClock
+
+# rozmiar bufora zapisu (bajty); flush() wypycha go na dysk
+BUFFER_SIZE = 1 << 16
+
+
+def journaled(name):
+    """
+    Dekorator punktu wejścia (metoda Board albo funkcja z planszą jako 1. argumentem):
+    zapisuje wywołanie w dzienniku planszy. Wywołania zagnieżdżone (np. end_wave
+    z enemy_killed) nie są zapisywane osobno — odtworzy je polecenie zewnętrzne.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(board, *args, **kwargs):
+            writer = getattr(board, "journal", None)
+            if writer is None or board._journal_depth:
+                return fn(board, *args, **kwargs)
+            t = board.clock.now()
+            board._journal_depth += 1
+            try:
+                result = fn(board, *args, **kwargs)
+            finally:
+                board._journal_depth -= 1
+            board.journal_seq += 1
+            writer.record(board, name, t, args, kwargs)
+            return result
+        return wrapper
+    return deco
+
+
+class Journal:
+    """Plik dziennika otwarty do dopisywania; record() bezpieczne dla wielu wątków."""
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.path = path
+        self._buffer_size = buffer_size
+        # dokończenie rotacji przerwanej awarią (po zapisaniu .tmp)
+        _finish_compaction(path)
+        self._file = open(path, "a", buffering=buffer_size, encoding="utf-8")
+        self._lock = threading.Lock()
+        self._rotate_lock = threading.Lock()
+
+    def attach(self, board, game_id, new=True):
+        """
+        Podpina planszę pod dziennik; nowa gra dostaje wpis "new". Gry odzyskane
+        (checkpoint, recover) podpina się z new=False — ich początek już jest zapisany.
+        """
+        board.journal = _GameWriter(self, game_id)
+        if new:
+            self._write({"g": game_id, "s": 0, "t": board.clock.now(), "c": "new",
+                         "a": [board.num_tiles, board.tile_size, board.seed]})
+
+    def record(self, game_id, seq, t, name, args, kwargs):
+        entry = {"g": game_id, "s": seq, "t": t, "c": name, "a": list(args)}
+        if kwargs:
+            entry["k"] = kwargs
+        self._write(entry)
+
+    def drop(self, board):
+        """Gra usunięta z pamięci: wpis "drop", dalsze zmiany planszy nie są zapisywane."""
+        writer = board.journal
+        if writer is None:
+            return
+        board.journal = None
+        board.journal_seq += 1
+        self._write({"g": writer.game_id, "s": board.journal_seq, "t": board.clock.now(),
+                     "c": "drop", "a": []})
+
+    def rotate(self, saved):
+        """
+        Przycina dziennik po checkpoincie: `saved` to {id gry: journal_seq} z
+        SessionManager.checkpoint. Zostają polecenia nowsze niż zapis oraz gry
+        spoza zapisu, poza grami zakończonymi wpisem "drop". Pod blokadą
+        dziennika tylko zamknięcie bieżącego segmentu; reszta bez niej.
+        """
+        with self._rotate_lock:
+            with self._lock:
+                self._file.close()
+                sealed = _segments(self.path)
+                last = f"{self.path}.{_segment_number(sealed[-1]) + 1 if sealed else 1}"
+                os.replace(self.path, last)
+                self._file = open(self.path, "a", buffering=self._buffer_size, encoding="utf-8")
+
+            entries = list(_read_files(_segment_files(self.path)))
+            dropped = {e["g"] for e in entries if e["c"] == "drop"} - saved.keys()
+            part = last + ".part"
+            with open(part, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    game_id = entry["g"]
+                    if game_id in saved:
+                        if entry["s"] <= saved[game_id]:
+                            continue
+                    elif game_id in dropped:
+                        continue
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # od tej chwili .tmp (kompletny) zastępuje przy odczycie segmenty ≤ last
+            os.replace(part, last + ".tmp")
+            _finish_compaction(self.path)
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class _GameWriter:
+    """Dziennik widziany przez jedną planszę (board.journal)."""
+    __slots__ = ("_journal", "game_id")
+
+    def __init__(self, journal, game_id):
+        self._journal = journal
+        self.game_id = game_id
+
+    def record(self, board, name, t, args, kwargs):
+        self._journal.record(self.game_id, board.journal_seq, t, name, args, kwargs)
+
+
+# ---- segmenty ----
+def _segment_number(name):
+    return int(name.rsplit(".", 2 if name.endswith(".tmp") else 1)[1])
+
+
+def _segments(path, suffix=""):
+    """Zamknięte segmenty "path.<n><suffix>" w kolejności numerów."""
+    pattern = re.compile(re.escape(path) + r"\.\d+" + re.escape(suffix) + "$")
+    found = [p for p in glob.glob(glob.escape(path) + ".*") if pattern.match(p)]
+    return sorted(found, key=_segment_number)
+
+
+def _segment_files(path):
+    """Zamknięte segmenty do odczytu; przepisany "path.<n>.tmp" zastępuje segmenty ≤ n."""
+    sealed = _segments(path)
+    pending = _segments(path, ".tmp")
+    if not pending:
+        return sealed
+    n = _segment_number(pending[-1])
+    return [pending[-1]] + [p for p in sealed if _segment_number(p) > n]
+
+
+def _finish_compaction(path):
+    """Usuwa segmenty zastąpione przez "path.<n>.tmp" (od najstarszego) i podmienia go."""
+    for part in glob.glob(glob.escape(path) + ".*.part"):
+        os.remove(part)  # przepisanie przerwane przed końcem — stare segmenty są całe
+    for tmp in _segments(path, ".tmp"):
+        n = _segment_number(tmp)
+        for seg in _segments(path):
+            if _segment_number(seg) < n:
+                os.remove(seg)
+        os.replace(tmp, f"{path}.{n}")
+
+
+def files(path):
+    """Pliki dziennika `path` w kolejności odczytu (segmenty, potem bieżący)."""
+    names = _segment_files(path)
+    if os.path.exists(path):
+        names.append(path)
+    return names
+
+
+# ---- odczyt i odtwarzanie ----
+def read(path, game_id=None):
+    """Wpisy dziennika (opcjonalnie jednej gry) ze wszystkich segmentów; ucięte linie są pomijane."""
+    return _read_files(files(path), game_id)
+
+
+def _read_files(names, game_id=None):
+    for name in names:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if game_id is None or entry["g"] == game_id:
+                    yield entry
+
+
+def apply(board, entry):
+    """Wykonuje polecenie z dziennika na planszy (czas zegara jak przy zapisie)."""
+    clock = board.clock
+    board.clock = SteppedClock(entry["t"])
+    try:
+        return _command(entry["c"])(board, *entry["a"], **entry.get("k", {}))
+    finally:
+        board.clock = clock
+
+
+def _command(name):
+    if name == "do_upgrade":
+        import tower_logic
+        return tower_logic.do_upgrade
+    from game_logic import Board
+    return getattr(Board, name)
+
+
+def replay(path, game_id, until=None, last_seq=None, board=None, **board_kwargs):
+    """
+    Odtwarza grę z dziennika na zegarze krokowym: wszystkie polecenia albo tylko
+    te do czasu `until` (zegar gry) lub do numeru polecenia `last_seq`. Zwraca planszę.
+    Po rotacji początek gry jest w checkpoincie — wtedy `board` to plansza z
+    savefile.read_checkpoint, a odtwarzane są polecenia nowsze niż jej journal_seq.
+    """
+    from game_logic import Board
+
+    if board is not None:
+        board.clock = SteppedClock(board.clock.now())
+        _restore_wave_start(board)
+    for entry in read(path, game_id):
+        if (until is not None and entry["t"] > until) or (
+                last_seq is not None and entry["s"] > last_seq) or entry["c"] == "drop":
+            break
+        if board is not None and entry["s"] <= board.journal_seq:
+            continue
+        if entry["c"] == "new":
+            num_tiles, tile_size, seed = entry["a"]
+            board = Board(num_tiles=num_tiles, tile_size=tile_size, seed=seed,
+                          clock=SteppedClock(entry["t"]), **board_kwargs)
+            continue
+        if board is None:
+            raise ValueError(f"Brak początku gry {game_id} w dzienniku")
+        board.clock.set(entry["t"])
+        _command(entry["c"])(board, *entry["a"], **entry.get("k", {}))
+        board.journal_seq = entry["s"]
+    return board
+
+
+def _restore_wave_start(board):
+    """
+    Plansza z checkpointu liczy trwającą falę od chwili wczytania; polecenia
+    z dziennika mają czasy zegara sprzed restartu, więc start fali wraca do tamtego czasu.
+    """
+    start = getattr(board, "saved_wave_start", None)
+    if start is not None and board.wave_active:
+        board.wave_start_time = start
+    board.saved_wave_start = None
+
+
+def recover(path, sessions, **board_kwargs):
+    """
+    Dogrywa ogon dziennika do gier w `sessions` (np. po SessionManager.restore):
+    polecenia o numerze większym niż board.journal_seq, a gry założone po
+    checkpoincie odtwarza od początku. Gry zakończone wpisem "drop" są pomijane
+    (i usuwane, jeśli wróciły z checkpointu). Zwraca liczbę wykonanych poleceń.
+    """
+    from game_logic import Board
+
+    entries = list(read(path))
+    dropped = {e["g"] for e in entries if e["c"] == "drop"}
+    for game_id in dropped:
+        sessions.remove(game_id)
+    for session in sessions.sessions():
+        _restore_wave_start(session.board)
+    applied = 0
+    for entry in entries:
+        if entry["g"] in dropped:
+            continue
+        session = sessions.get(entry["g"])
+        if entry["c"] == "new":
+            if session is None:
+                num_tiles, tile_size, seed = entry["a"]
+                board = Board(num_tiles=num_tiles, tile_size=tile_size, seed=seed, **board_kwargs)
+                sessions.create(board, game_id=entry["g"])
+            continue
+        if session is None or entry["s"] <= session.board.journal_seq:
+            continue
+        with session.mutation() as board:
+            apply(board, entry)
+            board.journal_seq = entry["s"]
+        applied += 1
+    return applied
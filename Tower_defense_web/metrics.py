@@ -0,0 +1,188 @@
+# metrics.py
+"""
+Lekka instrumentacja (opcjonalna, TD_METRICS=1): liczniki, histogramy czasu
+i wskaźniki, eksportowane w formacie tekstowym Prometheusa przez /api/metrics.
+Gdy pomiary są wyłączone, dekoratory i timery kosztują jedno sprawdzenie flagi.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import nullcontext
+
+# globalny przełącznik — ustawiany przez enable() (app.py przy TD_METRICS=1)
+enabled = False
+
+# domyślne progi histogramów czasu (sekundy)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# progi rozmiarów odpowiedzi (bajty)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_NULL = nullcontext()
+
+
+def enable(on=True):
+    global enabled
+    enabled = bool(on)
+
+
+def _labels_text(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for lv, v in items:
+            lines.append(f"{self.name}{_labels_text(self.labels, lv)} {_fmt(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # {wartości etykiet: [liczniki kubełków..., suma, liczba]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, *label_values):
+        s = self._series.get(label_values)
+        return s[-1] if s else 0
+
+    def time(self, *label_values):
+        """Kontekst mierzący czas bloku (no-op przy wyłączonych pomiarach)."""
+        if not enabled:
+            return _NULL
+        return _Timer(self, label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((lv, list(s)) for lv, s in self._series.items())
+        for lv, s in items:
+            acc = 0
+            for le, n in zip(self.buckets + (float("inf"),), s):
+                acc += n
+                le_text = 'le="%s"' % _fmt(le)
+                lines.append(f"{self.name}_bucket{_labels_text(self.labels, lv, le_text)} {acc}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labels, lv)} {_fmt(s[-2])}")
+            lines.append(f"{self.name}_count{_labels_text(self.labels, lv)} {s[-1]}")
+        return lines
+
+
+class Gauge:
+    """Wskaźnik liczony przy odczycie przez funkcję `fn()`."""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_fmt(self.fn())}"]
+
+
+class _Timer:
+    __slots__ = ("_hist", "_labels", "_t0")
+
+    def __init__(self, hist, labels):
+        self._hist = hist
+        self._labels = labels
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0, *self._labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, fn):
+        return self._add(Gauge(name, help_text, fn))
+
+    def render(self):
+        """Wszystkie metryki w formacie tekstowym Prometheusa."""
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def timed(name, help_text):
+    """Dekorator: czas wywołań funkcji w histogramie `name` (gdy pomiary włączone)."""
+    hist = registry.histogram(name, help_text)
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0)
+        return wrapper
+    return deco
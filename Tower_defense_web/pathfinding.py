@@ -2,7 +2,10 @@
 
 from collections import deque
 
+import metrics
 
+
+@metrics.timed("td_find_shortest_path_seconds", "Czas BFS find_shortest_path")
 def find_shortest_path(grid, start, end=None, blocked=None):
     """
     BFS zwraca najkrótszą ścieżkę jako listę [ [r,c], ... ].
@@ -37,6 +40,12 @@ def find_shortest_path(grid, start, end=None, blocked=None):
     # ustal cel: end jeśli poprawny, inaczej szukamy "base" w grid
     if end is not None and isinstance(end, (list, tuple)) and 0 <= end[0] < rows and 0 <= end[1] < cols:
         er, ec = int(end[0]), int(end[1])
+    elif hasattr(grid, "find"):
+        # siatka kompaktowa (grid_store.CompactGrid) — wyszukiwanie wektorowe
+        found = grid.find("base")
+        if found is None:
+            return []
+        er, ec = found
     else:
         er = ec = None
         for r in range(rows):
@@ -49,9 +58,14 @@ def find_shortest_path(grid, start, end=None, blocked=None):
         if er is None:
             return []
 
+    # siatka kompaktowa daje gotową maskę przechodniości (jedna operacja wektorowa)
+    mask = grid.walkable_mask(blocked).tolist() if hasattr(grid, "walkable_mask") else None
+
     def walkable(r, c):
         if not (0 <= r < rows and 0 <= c < cols):
             return False
+        if mask is not None:
+            return mask[r][c]
         # "void" i "wall" są nieprzechodnie
         if grid[r][c] == "void" or grid[r][c] == "wall":
             return False
@@ -87,3 +101,231 @@ def find_shortest_path(grid, start, end=None, blocked=None):
         cur = prev[cur]
     path.reverse()
     return path
+
+
+# typy pól, po których mogą chodzić przeciwnicy
+WALKABLE = ("open_area", "tower_area", "base_area", "base", "portal")
+_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class FlowField:
+    """
+    Pole przepływu: jeden odwrotny BFS od bazy po polach przechodnich (bez `blocked`).
+    Dla każdego osiągalnego pola trzyma odległość do bazy i następny krok w jej
+    stronę, więc trasa przeciwnika z dowolnego pola (i z dowolnego portalu) to O(1)
+    na krok. Instancja opisuje stan z chwili budowy — po zmianie planszy trzeba utworzyć nową.
+    """
+
+    def __init__(self, grid, base, blocked=None):
+        self.grid = grid
+        self.rows = len(grid)
+        self.cols = len(grid[0]) if self.rows else 0
+        self.base = tuple(base) if base is not None else None
+        self.blocked = set(blocked) if blocked is not None else set()
+        # siatka kompaktowa: maska przechodniości zamiast porównań stringów
+        self._mask = grid.walkable_mask(self.blocked).tolist() if hasattr(grid, "walkable_mask") else None
+
+        self.dist = {}      # {(r,c): odległość do bazy}
+        self.parent = {}    # {(r,c): następne pole w stronę bazy}
+        self.children = {}  # {(r,c): [pola, dla których to pole jest parent]}
+        self._build()
+
+    def _walkable(self, r, c):
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            return False
+        if self._mask is not None:
+            return self._mask[r][c]
+        if (r, c) in self.blocked:
+            return False
+        return self.grid[r][c] in WALKABLE
+
+    def _build(self):
+        if self.base is None or not self._walkable(*self.base):
+            return
+        self.dist[self.base] = 0
+        self.parent[self.base] = None
+        q = deque([self.base])
+        while q:
+            r, c = q.popleft()
+            d = self.dist[(r, c)] + 1
+            for dr, dc in _DIRS:
+                n = (r + dr, c + dc)
+                if n not in self.dist and self._walkable(*n):
+                    self.dist[n] = d
+                    self.parent[n] = (r, c)
+                    self.children.setdefault((r, c), []).append(n)
+                    q.append(n)
+
+    def reachable(self, cell):
+        return cell is not None and (int(cell[0]), int(cell[1])) in self.dist
+
+    def distance(self, cell):
+        """Liczba kroków do bazy albo None, gdy pole nie ma drogi."""
+        return self.dist.get((int(cell[0]), int(cell[1])))
+
+    def next_step(self, cell):
+        """Następne pole w stronę bazy; None dla bazy i pól bez drogi."""
+        return self.parent.get((int(cell[0]), int(cell[1])))
+
+    def path_from(self, cell):
+        """Ścieżka [(r,c), ...] z `cell` do bazy włącznie; [] gdy brak drogi."""
+        cur = (int(cell[0]), int(cell[1]))
+        if cur not in self.dist:
+            return []
+        path = []
+        while cur is not None:
+            path.append(cur)
+            cur = self.parent[cur]
+        return path
+
+    def nearest(self, cell):
+        """Najbliższe (w metryce Manhattan) pole z drogą do bazy albo None."""
+        r, c = cell
+        best, best_d = None, None
+        for (rr, cc) in self.dist:
+            d = abs(rr - r) + abs(cc - c)
+            if best_d is None or d < best_d:
+                best, best_d = (rr, cc), d
+        return best
+
+
+class PlacementValidator:
+    """
+    Sprawdza, czy zablokowanie pola (r,c) odetnie portal od bazy, bez pełnego BFS.
+
+    Korzysta z pola przepływu (FlowField): odległości BFS od bazy i drzewa
+    najkrótszych ścieżek (parent = następne pole w stronę bazy). Pole spoza
+    ścieżki portalu nie może jej przerwać — odpowiedź O(1). Dla pola na ścieżce
+    naprawiane jest tylko poddrzewo, które przez nie przechodziło.
+    Instancja opisuje stan z chwili budowy — po zmianie planszy trzeba utworzyć nową.
+    """
+
+    def __init__(self, grid, base, portal, blocked=None, field=None):
+        if field is None:
+            field = FlowField(grid, base, blocked)
+        self.field = field
+        self.grid = field.grid
+        self.rows, self.cols = field.rows, field.cols
+        self.base = field.base
+        self.portal = tuple(portal) if portal is not None else None
+        self.blocked = field.blocked
+        self.dist = field.dist
+        self.parent = field.parent
+        self.children = field.children
+
+        # ścieżka portal -> baza wyznaczona przez drzewo
+        self.path = field.path_from(self.portal) if self.portal is not None else []
+        self.path_index = {cell: i for i, cell in enumerate(self.path)}
+
+    def connected(self):
+        """Czy portal ma obecnie drogę do bazy."""
+        return self.portal is not None and self.portal in self.dist
+
+    def blocks(self, cell):
+        """True gdy postawienie struktury na `cell` odetnie portal od bazy."""
+        if not self.connected():
+            return True
+        cell = (int(cell[0]), int(cell[1]))
+        if cell == self.portal or cell == self.base:
+            return True
+        if cell not in self.path_index:
+            return False
+        return not self._repair_reaches_portal(cell)
+
+    def _repair_reaches_portal(self, cut):
+        """
+        Lokalna naprawa: poddrzewo `cut` traci drogę przez `cut`. Szukamy, czy
+        z pól poza poddrzewem da się do niego wejść i dojść do portalu.
+        """
+        affected = set()
+        stack = [cut]
+        while stack:
+            v = stack.pop()
+            affected.add(v)
+            stack.extend(self.children.get(v, ()))
+
+        q = deque()
+        seen = set()
+        for v in affected:
+            if v == cut:
+                continue
+            r, c = v
+            for dr, dc in _DIRS:
+                n = (r + dr, c + dc)
+                if n in self.dist and n not in affected:
+                    seen.add(v)
+                    q.append(v)
+                    break
+        while q:
+            v = q.popleft()
+            if v == self.portal:
+                return True
+            r, c = v
+            for dr, dc in _DIRS:
+                n = (r + dr, c + dc)
+                if n in affected and n != cut and n not in seen:
+                    seen.add(n)
+                    q.append(n)
+        return False
+
+    def blocking_cells(self, cells=None):
+        """
+        Tryb wsadowy: zwraca zbiór pól (spośród `cells`, domyślnie wszystkich),
+        których zablokowanie odetnie portal od bazy — w jednym przejściu O(pól).
+
+        Pole p_k ze ścieżki p_0..p_K jest krytyczne, jeśli żaden „objazd” go nie
+        omija: objazdem jest spójny fragment pól spoza ścieżki (albo bezpośrednie
+        sąsiedztwo) łączący pola ścieżki o indeksach i < k < j.
+        """
+        if not self.connected():
+            return set(cells) if cells is not None else set(self.dist)
+
+        idx = self.path_index
+        k_max = len(self.path) - 1
+        # cover[k] > 0 -> istnieje objazd pola k
+        diff = [0] * (k_max + 2)
+
+        def add_bypass(i, j):
+            if j - i > 1:
+                diff[i + 1] += 1
+                diff[j] -= 1
+
+        # bezpośrednie sąsiedztwo pól ścieżki
+        for cell, i in idx.items():
+            r, c = cell
+            for dr, dc in _DIRS:
+                j = idx.get((r + dr, c + dc))
+                if j is not None and j > i:
+                    add_bypass(i, j)
+
+        # spójne składowe pól spoza ścieżki (osiągalnych z bazy)
+        seen = set()
+        for start in self.dist:
+            if start in idx or start in seen:
+                continue
+            lo, hi = k_max + 1, -1
+            seen.add(start)
+            q = deque([start])
+            while q:
+                r, c = q.popleft()
+                for dr, dc in _DIRS:
+                    n = (r + dr, c + dc)
+                    j = idx.get(n)
+                    if j is not None:
+                        lo, hi = min(lo, j), max(hi, j)
+                    elif n in self.dist and n not in seen:
+                        seen.add(n)
+                        q.append(n)
+            if hi >= 0:
+                add_bypass(lo, hi)
+
+        critical = set()
+        cover = 0
+        for k in range(k_max + 1):
+            cover += diff[k]
+            if cover <= 0:
+                critical.add(self.path[k])
+
+        if cells is None:
+            return critical
+        return {(int(r), int(c)) for r, c in cells if (int(r), int(c)) in critical}
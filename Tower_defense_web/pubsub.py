@@ -0,0 +1,80 @@
+# pubsub.py
+"""
+Prosty pub/sub w obrębie procesu. Tematem jest id gry, wiadomością numer
+wersji stanu planszy — odbiorca sam pobiera różnicę (migawka gry, BoardSnapshot.delta).
+Callbacki wywoływane są w wątku publikującym, więc muszą być szybkie
+(np. włożenie do kolejki albo loop.call_soon_threadsafe dla asyncio).
+"""
+import queue
+import threading
+
+
+class Hub:
+    def __init__(self):
+        self._subs = {}  # {temat: [callback, ...]}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._subs.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, topic, callback):
+        with self._lock:
+            subs = self._subs.get(topic)
+            if not subs:
+                return
+            try:
+                subs.remove(callback)
+            except ValueError:
+                pass
+            if not subs:
+                del self._subs[topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        for callback in subs:
+            callback(message)
+
+    def subscriber_count(self, topic=None):
+        with self._lock:
+            if topic is not None:
+                return len(self._subs.get(topic, ()))
+            return sum(len(s) for s in self._subs.values())
+
+    def subscription(self, topic):
+        return Subscription(self, topic)
+
+
+class Subscription:
+    """Kolejka wiadomości jednego tematu dla odbiorcy synchronicznego (np. strumienia SSE)."""
+
+    def __init__(self, hub, topic):
+        self._hub = hub
+        self._topic = topic
+        self._queue = queue.SimpleQueue()
+        hub.subscribe(topic, self._queue.put)
+
+    def wait(self, timeout=None):
+        """
+        Czeka na wiadomość; zaległe wiadomości są łączone (zwracana jest ostatnia).
+        Zwraca None po upływie `timeout`.
+        """
+        try:
+            msg = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        while True:
+            try:
+                msg = self._queue.get_nowait()
+            except queue.Empty:
+                return msg
+
+    def close(self):
+        self._hub.unsubscribe(self._topic, self._queue.put)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,23 +1,28 @@
 # run_app.py
 
+import argparse
+import multiprocessing
 import sys
 import os
 import threading
 import webbrowser
-from app import app
 
+import serve
 
-if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
-    base = sys._MEIPASS
-    tpl = os.path.join(base, "templates")
-    static = os.path.join(base, "static")
-    try:
-        app.template_folder = tpl
-        app.static_folder = static
-        from jinja2 import FileSystemLoader
-        app.jinja_loader = FileSystemLoader(tpl)
-    except Exception:
-        pass
+
+def _frozen_paths(app):
+    # w wersji .exe (PyInstaller) szablony i pliki statyczne leżą w _MEIPASS
+    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
+        base = sys._MEIPASS
+        tpl = os.path.join(base, "templates")
+        static = os.path.join(base, "static")
+        try:
+            app.template_folder = tpl
+            app.static_folder = static
+            from jinja2 import FileSystemLoader
+            app.jinja_loader = FileSystemLoader(tpl)
+        except Exception:
+            pass
 
 
 def _open_browser():
@@ -27,6 +32,34 @@ def _open_browser():
         pass
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Tower Defense + Camp")
+    parser.add_argument("--serve", action="store_true",
+                        help="serwer produkcyjny (serve.py) zamiast serwera deweloperskiego")
+    parser.add_argument("--bind", default=os.environ.get("TD_BIND", "127.0.0.1:5000"),
+                        help="adres HOST:PORT (z --serve)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TD_WORKERS", "1")),
+                        help="liczba procesów roboczych (z --serve)")
+    parser.add_argument("--threads", type=int, default=serve.DEFAULT_THREADS,
+                        help="wątki na proces (z --serve, waitress)")
+    parser.add_argument("--asgi", action="store_true",
+                        help="wariant ASGI przez uvicorn (z --serve)")
+    parser.add_argument("--nginx-conf", action="store_true",
+                        help="wypisz konfigurację nginx dla --workers N i --bind")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    threading.Timer(0.6, _open_browser).start()
-    app.run(host="127.0.0.1", port=5000, debug=False)
+    multiprocessing.freeze_support()
+    args = _parse_args()
+    if args.nginx_conf:
+        print(serve.nginx_config(args.bind, args.workers), end="")
+    elif args.serve:
+        # aplikacja importowana dopiero w procesach roboczych (serve.py) —
+        # _frozen_paths wołane tam na niej przed startem serwera
+        serve.serve(args.bind, args.workers, args.threads, args.asgi, setup=_frozen_paths)
+    else:
+        from app import app
+        _frozen_paths(app)
+        threading.Timer(0.6, _open_browser).start()
+        app.run(host="127.0.0.1", port=5000, debug=False)
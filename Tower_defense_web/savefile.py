@@ -0,0 +1,324 @@
+# savefile.py
+"""
+Binarny zapis gry (wersjonowany format, struct, little-endian):
+
+  nagłówek   "TDSV", wersja formatu, flagi (1 = siatka kafelkami)
+  liczniki   stała struktura _FIXED (hp, złoto, fala, kafelki bazy/portalu, ...)
+  surowce    RESOURCE_KEYS i przychody jako int64
+  napisy     tablica napisów (typy struktur i budynków, ulepszenia, tło)
+  kafelki    aktywne kafelki (tx, ty)
+  siatka     kody pól (grid_store.CELL_CODES) bajt na pole — cała plansza
+             albo tylko zaalokowane kafelki planszy rzadkiej
+  rekordy    struktury i budynki obozu (r, c, napis), poziomy ulepszeń
+  dziennik   (od wersji 2) numer ostatniego polecenia w dzienniku, ziarno i licznik losowań;
+             (od wersji 3) czas zegara gry w chwili zapisu
+
+Checkpoint wielu gier to plik "TDCK" ze spisem (id gry, offset, długość)
+i kolejnymi zapisami; odczyt przez mmap sięga tylko po potrzebne fragmenty.
+"""
+import math
+import mmap
+import os
+import struct
+
+from game_logic import RESOURCE_KEYS, Board
+from grid_store import CELL_CODES, CELL_NAMES
+from tower_logic import new_upgrade_levels
+
+MAGIC = b"TDSV"
+FORMAT_VERSION = 3
+# wersje, które umie wczytać loads (1: bez numeru polecenia i stanu RNG, 2: bez czasu zapisu)
+READABLE_VERSIONS = (1, 2, 3)
+CHECKPOINT_MAGIC = b"TDCK"
+
+FLAG_SPARSE = 1
+
+_HEADER = struct.Struct("<4sHH")
+# num_tiles, tile_size | hp, gold, wave, wave_active, elapsed_time, active_enemies,
+# peasants, unemployed, food, first_tile_placed, damage_dealt | hp przed falą,
+# oczekiwani i zespawnowani w fali, sekundy od startu fali (NaN = brak), fala posiadłości |
+# base_tile, latest_tile, current_portal, base_cell (-1 = brak) | indeks napisu tła
+_FIXED = struct.Struct("<HH qqqBqqqqqBd qqqdq iiiiiiii i")
+_INCOME_KEYS = RESOURCE_KEYS + ("food",)
+_AMOUNTS = struct.Struct(f"<{len(RESOURCE_KEYS) + len(_INCOME_KEYS)}q")
+_COUNT = struct.Struct("<I")
+_TILE = struct.Struct("<HH")
+_RECORD = struct.Struct("<HHH")  # (r, c, indeks napisu) albo (typ, kategoria, poziom)
+# numer ostatniego polecenia dziennika, ziarno RNG planszy, liczba losowań
+_JOURNAL = struct.Struct("<QQQ")
+_SAVED_AT = struct.Struct("<d")
+_CK_HEADER = struct.Struct("<4sHI")
+_CK_ENTRY = struct.Struct("<QI")
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+# ---- zapis ----
+def _pair(p):
+    return (-1, -1) if p is None else (int(p[0]), int(p[1]))
+
+
+def dumps(board):
+    """Plansza jako bajty zapisu (wołać pod blokadą gry)."""
+    strings = {}
+
+    def sid(s):
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    # do mikrosekund — po loads (start = teraz - offset) kolejny zapis daje te same bajty
+    now = board.clock.now()
+    offset = round(now - board.wave_start_time, 6) if board.wave_active else math.nan
+    mansion = getattr(board, "_mansion_placed_wave", None)
+    fixed = _FIXED.pack(
+        board.num_tiles, board.tile_size,
+        int(board.hp), int(board.gold), int(board.wave), bool(board.wave_active),
+        int(board.elapsed_time), int(board.active_enemies), int(board.peasants),
+        int(board.unemployed), int(board.food), bool(board.first_tile_placed),
+        float(board.damage_dealt),
+        int(board._hp_before_wave), int(board._expected_enemies), int(board._spawned_in_wave),
+        offset, -1 if mansion is None else int(mansion),
+        *_pair(board.base_tile), *_pair(board.latest_tile),
+        *_pair(board.current_portal), *_pair(board.base_cell),
+        -1 if board.bg_image is None else sid(board.bg_image))
+    amounts = _AMOUNTS.pack(*(int(board.resources.get(k, 0)) for k in RESOURCE_KEYS),
+                            *(int(board.income.get(k, 0)) for k in _INCOME_KEYS))
+
+    tiles = sorted(board.active_tiles)
+    parts = [_COUNT.pack(len(tiles))]
+    parts.extend(_TILE.pack(tx, ty) for tx, ty in tiles)
+
+    if board.sparse:
+        chunks = board.grid.chunks()
+        parts.append(_COUNT.pack(len(chunks)))
+        for (tx, ty), cells in chunks:
+            parts.append(_TILE.pack(tx, ty))
+            parts.append(bytes(CELL_CODES[name] for row in cells for name in row))
+    elif board.compact:
+        parts.append(board.grid.cells.tobytes())
+    else:
+        parts.append(bytes(CELL_CODES[name] for row in board.grid for name in row))
+
+    # kolejność wstawienia zachowana (kolejność struktur w layoucie)
+    for items in (list(board.structures.items()), list(board.camp_buildings.items())):
+        parts.append(_COUNT.pack(len(items)))
+        parts.extend(_RECORD.pack(r, c, sid(typ)) for (r, c), typ in items)
+
+    levels = [(typ, cat, lvl) for typ, cats in board.upgrade_levels.items()
+              for cat, lvl in cats.items() if lvl]
+    parts.append(_COUNT.pack(len(levels)))
+    parts.extend(_RECORD.pack(sid(typ), sid(cat), lvl) for typ, cat, lvl in levels)
+    parts.append(_JOURNAL.pack(board.journal_seq, board.seed, board.rng_draws))
+    parts.append(_SAVED_AT.pack(now))
+
+    table = [_COUNT.pack(len(strings))]
+    for s in strings:  # słownik zachowuje kolejność nadawania indeksów
+        raw = s.encode()
+        table.append(struct.pack("<B", len(raw)) + raw)
+
+    flags = FLAG_SPARSE if board.sparse else 0
+    return b"".join([_HEADER.pack(MAGIC, FORMAT_VERSION, flags), fixed, amounts, *table, *parts])
+
+
+# ---- odczyt ----
+class _Reader:
+    def __init__(self, buf, pos=0):
+        self.buf = buf
+        self.pos = pos
+
+    def unpack(self, st):
+        values = st.unpack_from(self.buf, self.pos)
+        self.pos += st.size
+        return values
+
+    def count(self):
+        return self.unpack(_COUNT)[0]
+
+    def records(self, st, n):
+        values = [st.unpack_from(self.buf, self.pos + i * st.size) for i in range(n)]
+        self.pos += n * st.size
+        return values
+
+    def take(self, n):
+        raw = bytes(self.buf[self.pos:self.pos + n])
+        if len(raw) != n:
+            raise SaveFormatError("Ucięty zapis gry")
+        self.pos += n
+        return raw
+
+
+def _opt(a, b):
+    return None if a < 0 else (a, b)
+
+
+def loads(buf, offset=0, **board_kwargs):
+    """
+    Odtwarza planszę z zapisu (bytes, memoryview albo mmap od `offset`).
+    board_kwargs (compact, sparse, clock) nadpisują ustawienia Board;
+    domyślnie rodzaj siatki jak w zapisie.
+    """
+    rd = _Reader(buf, offset)
+    try:
+        magic, version, flags = rd.unpack(_HEADER)
+    except struct.error as e:
+        raise SaveFormatError("Ucięty zapis gry") from e
+    if magic != MAGIC:
+        raise SaveFormatError("To nie jest zapis gry")
+    if version not in READABLE_VERSIONS:
+        raise SaveFormatError(f"Nieobsługiwana wersja zapisu: {version}")
+    try:
+        return _read_board(rd, version, flags, board_kwargs)
+    except struct.error as e:
+        raise SaveFormatError("Ucięty zapis gry") from e
+
+
+def _read_board(rd, version, flags, board_kwargs):
+    (num_tiles, tile_size, hp, gold, wave, wave_active, elapsed, active, peasants,
+     unemployed, food, first_placed, damage, hp_before, expected, spawned, offset, mansion,
+     btx, bty, ltx, lty, pr, pc, br, bc, bg) = rd.unpack(_FIXED)
+    amounts = rd.unpack(_AMOUNTS)
+    strings = []
+    for _ in range(rd.count()):
+        n = rd.take(1)[0]
+        strings.append(rd.take(n).decode())
+
+    board_kwargs.setdefault("sparse", bool(flags & FLAG_SPARSE))
+    board = Board(num_tiles=num_tiles, tile_size=tile_size, **board_kwargs)
+    board.active_tiles = {tuple(t) for t in rd.records(_TILE, rd.count())}
+
+    # siatka zapisywana bezpośrednio — nowe state_id i tak wymusza u klientów pełny stan
+    ts = tile_size
+    if flags & FLAG_SPARSE:
+        chunks = []
+        for _ in range(rd.count()):
+            tx, ty = rd.unpack(_TILE)
+            raw = rd.take(ts * ts)
+            chunks.append((tx, ty, [[CELL_NAMES[v] for v in raw[i:i + ts]]
+                                    for i in range(0, ts * ts, ts)]))
+        _load_chunks(board, chunks)
+    else:
+        rows, cols = board.total_rows, board.total_cols
+        raw = rd.take(rows * cols)
+        _load_dense(board, raw, rows, cols)
+
+    board.structures.update({(r, c): strings[i] for r, c, i in rd.records(_RECORD, rd.count())})
+    if board.compact:
+        for (r, c), typ in board.structures.items():
+            board.grid.set_structure(r, c, typ)
+    board.camp_buildings.update({(r, c): strings[i] for r, c, i in rd.records(_RECORD, rd.count())})
+    board.upgrade_levels = levels = new_upgrade_levels()
+    for t, k, lvl in rd.records(_RECORD, rd.count()):
+        levels.setdefault(strings[t], {})[strings[k]] = lvl
+    levels.version = 1
+    if version >= 2:
+        board.journal_seq, board.seed, board.rng_draws = rd.unpack(_JOURNAL)
+    saved_at = rd.unpack(_SAVED_AT)[0] if version >= 3 else None
+
+    board.hp, board.gold, board.wave = hp, gold, wave
+    board.elapsed_time, board.active_enemies = elapsed, active
+    board.peasants, board.unemployed, board.food = peasants, unemployed, food
+    board.damage_dealt = damage
+    board._hp_before_wave, board._expected_enemies, board._spawned_in_wave = hp_before, expected, spawned
+    if mansion >= 0:
+        board._mansion_placed_wave = mansion
+    n = len(RESOURCE_KEYS)
+    for k, v in zip(RESOURCE_KEYS, amounts[:n]):
+        board.resources[k] = v
+    board.income = dict(zip(_INCOME_KEYS, amounts[n:]))
+    board.base_tile, board.latest_tile = _opt(btx, bty), _opt(ltx, lty)
+    board.current_portal, board.base_cell = _opt(pr, pc), _opt(br, bc)
+    board.bg_image = strings[bg] if bg >= 0 else None
+    board.first_tile_placed = bool(first_placed)
+    board.wave_active = bool(wave_active)
+    # czas fali liczony od nowa względem zegara tego procesu
+    board.wave_start_time = board.clock.now() - offset if wave_active else None
+    # start fali w czasie zegara, który zapisał grę — dziennik (journal.recover)
+    # dogrywa ogon poleceń w tym czasie, nie w czasie nowego procesu
+    if wave_active and saved_at is not None:
+        board.saved_wave_start = saved_at - offset
+
+    board.recount_buildings()
+    board.invalidate_path()
+    board._allowed_cache = None
+    return board
+
+
+def _load_dense(board, raw, rows, cols):
+    if board.sparse:
+        ts = board.tile_size
+        chunks = []
+        for tx, ty in sorted(board.active_tiles):
+            cells = [[CELL_NAMES[raw[r * cols + c]] for c in range(tx * ts, tx * ts + ts)]
+                     for r in range(ty * ts, ty * ts + ts)]
+            chunks.append((tx, ty, cells))
+        _load_chunks(board, chunks)
+    elif board.compact:
+        import numpy as np
+        board.grid.cells[:, :] = np.frombuffer(raw, dtype=np.uint8).reshape(rows, cols)
+    else:
+        board.grid = [[CELL_NAMES[v] for v in raw[r * cols:(r + 1) * cols]] for r in range(rows)]
+
+
+def _load_chunks(board, chunks):
+    if board.sparse:
+        for tx, ty, cells in chunks:
+            board.grid.load_chunk(tx, ty, cells)
+        return
+    ts = board.tile_size
+    for tx, ty, cells in chunks:
+        for dr, row in enumerate(cells):
+            for dc, name in enumerate(row):
+                board.grid[ty * ts + dr][tx * ts + dc] = name
+
+
+def save(board, path):
+    _write_atomic(path, dumps(board))
+
+
+def load(path, **board_kwargs):
+    """Plansza z pliku zapisu (czytanego przez mmap)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return loads(mm, **board_kwargs)
+
+
+# ---- checkpoint wielu gier ----
+def write_checkpoint(path, games):
+    """Zapisuje [(id gry, bajty zapisu), ...] jednym plikiem (podmiana atomowa)."""
+    games = list(games)
+    index, blobs = [], []
+    pos = _CK_HEADER.size + sum(1 + len(gid.encode()) + _CK_ENTRY.size for gid, _ in games)
+    for gid, blob in games:
+        raw = gid.encode()
+        index.append(struct.pack("<B", len(raw)) + raw + _CK_ENTRY.pack(pos, len(blob)))
+        blobs.append(blob)
+        pos += len(blob)
+    _write_atomic(path, b"".join([_CK_HEADER.pack(CHECKPOINT_MAGIC, FORMAT_VERSION, len(games)),
+                                  *index, *blobs]))
+
+
+def read_checkpoint(path, **board_kwargs):
+    """Lista [(id gry, Board)] z checkpointu (plik mapowany w pamięci)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        rd = _Reader(mm)
+        magic, version, count = rd.unpack(_CK_HEADER)
+        if magic != CHECKPOINT_MAGIC:
+            raise SaveFormatError("To nie jest checkpoint gier")
+        if version not in READABLE_VERSIONS:
+            raise SaveFormatError(f"Nieobsługiwana wersja checkpointu: {version}")
+        entries = []
+        for _ in range(count):
+            gid = rd.take(rd.take(1)[0]).decode()
+            entries.append((gid, rd.unpack(_CK_ENTRY)[0]))
+        return [(gid, loads(mm, offset, **board_kwargs)) for gid, offset in entries]
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
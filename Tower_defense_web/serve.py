@@ -0,0 +1,229 @@
+# serve.py
+"""
+Uruchomienie produkcyjne (python run_app.py --serve [--workers N] [--bind HOST:PORT] [--asgi]).
+
+- 1 worker: `app` obsługiwany bezpośrednio przez waitress (jeśli zainstalowany)
+  albo przez wielowątkowy serwer Werkzeug z keep-alive (HTTP/1.1),
+- N workerów: procesy uruchamiane z góry (pre-fork), każdy z własnymi grami
+  w pamięci na kolejnym porcie 127.0.0.1 (PORT+1 … PORT+N). Przed nimi stoi
+  nginx (nginx_config, python run_app.py --nginx-conf): żądanie trafia do
+  workera wskazanego przedrostkiem id gry ("w<n>."), więc gra zawsze jest
+  obsługiwana przez proces, który trzyma jej Board. Treść żądań i odpowiedzi
+  nie przechodzi przez żaden proces Pythona poza workerem,
+- --asgi: workery jako uvicorn z asgi.py — otwarte strumienie SSE nie
+  zajmują wątków.
+
+Gry workera, który padł, wracają po restarcie z TD_CHECKPOINT / TD_JOURNAL,
+dlatego tryb wielu workerów wymaga jednej z tych zmiennych.
+
+Serwery są opcjonalne: python -m pip install -r requirements-serve.txt
+(waitress, uvicorn i a2wsgi dla --asgi).
+"""
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+
+# po ilu sekundach bezczynne połączenie keep-alive jest zamykane
+KEEPALIVE_S = 30
+# wątki obsługujące żądania w jednym procesie (waitress)
+DEFAULT_THREADS = 16
+
+GAME_COOKIE = "td_game"
+# czas życia strumienia /api/stream za nginx (proxy_read_timeout)
+STREAM_TIMEOUT = "1h"
+
+
+def parse_bind(bind):
+    """"HOST:PORT" albo ":PORT" -> (host, port)."""
+    host, _, port = bind.rpartition(":")
+    return host.strip("[]") or "127.0.0.1", int(port)
+
+
+# ---- serwery ----
+def _listen(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    return sock
+
+
+def make_server(wsgi_app, host, port, threads=DEFAULT_THREADS):
+    """Serwer WSGI z keep-alive. Zwraca (serve_forever, faktyczny port)."""
+    try:
+        from waitress import create_server
+    except ImportError:
+        create_server = None
+    if create_server is not None:
+        server = create_server(wsgi_app, host=host, port=port, threads=threads,
+                               channel_timeout=KEEPALIVE_S)
+        return server.run, server.effective_port
+
+    from werkzeug.serving import WSGIRequestHandler, make_server as werkzeug_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        # HTTP/1.1: wiele żądań na jednym połączeniu (osobny wątek na połączenie)
+        protocol_version = "HTTP/1.1"
+        timeout = KEEPALIVE_S
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = werkzeug_server(host, port, wsgi_app, threaded=True, request_handler=KeepAliveHandler)
+    return server.serve_forever, server.server_port
+
+
+def make_asgi_server(host, port, threads=DEFAULT_THREADS):
+    """Serwer uvicorn dla asgi.make_application. Zwraca (serve_forever, faktyczny port)."""
+    import uvicorn
+    from asgi import make_application
+
+    sock = _listen(host, port)
+    server = uvicorn.Server(uvicorn.Config(make_application(threads), log_level="warning",
+                                           timeout_keep_alive=KEEPALIVE_S))
+    return (lambda: server.run(sockets=[sock])), sock.getsockname()[1]
+
+
+def _app_server(host, port, threads, asgi, setup=None):
+    # import aplikacji dopiero tutaj — w workerze, po ustawieniu TD_WORKER
+    from app import app
+    if setup is not None:
+        setup(app)
+    if asgi:
+        return make_asgi_server(host, port, threads)
+    return make_server(app, host, port, threads)
+
+
+# ---- workery ----
+def worker_ports(bind, workers):
+    """Porty workerów przy --bind HOST:PORT: PORT+1 … PORT+N (PORT zostaje dla nginx)."""
+    _, port = parse_bind(bind)
+    return [port + 1 + i for i in range(workers)]
+
+
+def _worker_main(index, port, threads, asgi, ready, setup=None):
+    os.environ["TD_WORKER"] = str(index)
+    serve_forever, _ = _app_server("127.0.0.1", port, threads, asgi, setup)
+    ready.put(index)
+    serve_forever()
+
+
+class Supervisor:
+    """
+    Uruchamia workery na stałych portach i wznawia te, które padły.
+    `setup(app)` wołane w każdym workerze po imporcie aplikacji (np. ścieżki wersji .exe).
+    """
+
+    def __init__(self, ports, threads=DEFAULT_THREADS, asgi=False, setup=None):
+        self.ports = list(ports)
+        self.threads = threads
+        self.asgi = asgi
+        self.setup = setup
+        self._ctx = multiprocessing.get_context()
+        self._ready = self._ctx.Queue()
+        self.procs = [None] * len(self.ports)
+        self._stopped = threading.Event()
+
+    def _spawn(self, index):
+        proc = self._ctx.Process(target=_worker_main, name=f"td-worker-{index}",
+                                 args=(index, self.ports[index], self.threads, self.asgi,
+                                       self._ready, self.setup), daemon=True)
+        proc.start()
+        self.procs[index] = proc
+
+    def _collect(self, count, timeout=30.0):
+        for _ in range(count):
+            self._ready.get(timeout=timeout)
+
+    def start(self):
+        for i in range(len(self.procs)):
+            self._spawn(i)
+        self._collect(len(self.procs))
+        threading.Thread(target=self._watch, name="td-supervisor", daemon=True).start()
+
+    def _watch(self):
+        # nowy proces dostaje ten sam numer i port, więc nginx nic nie zmienia
+        while not self._stopped.wait(1.0):
+            dead = [i for i, p in enumerate(self.procs) if not p.is_alive()]
+            for i in dead:
+                print(f"!!! worker {i} padł (kod {self.procs[i].exitcode}) — uruchamiam ponownie, "
+                      f"gry wracają z TD_CHECKPOINT / TD_JOURNAL", file=sys.stderr, flush=True)
+                self._spawn(i)
+            if dead:
+                self._collect(len(dead))
+
+    def wait(self):
+        self._stopped.wait()
+
+    def stop(self):
+        self._stopped.set()
+        for proc in self.procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+        for proc in self.procs:
+            if proc is not None:
+                proc.join(timeout=5)
+
+
+# ---- nginx przed workerami ----
+def nginx_config(bind="127.0.0.1:5000", workers=2):
+    """
+    Konfiguracja nginx (blok http) dla --serve --workers N: żądanie z id gry
+    (?game=, X-Game-Id, ciasteczko td_game) z przedrostkiem "w<n>." trafia do
+    workera n, pozostałe po kolei do wszystkich. /api/stream bez buforowania.
+    """
+    host, port = parse_bind(bind)
+    ports = worker_ports(bind, workers)
+    listen = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+    lines = [f"# Tower Defense: nginx przed {workers} workerami "
+             f"(python run_app.py --serve --workers {workers} --bind {bind})",
+             'map "$arg_game|$http_x_game_id|$cookie_' + GAME_COOKIE + '" $td_upstream {',
+             "    default td_any;"]
+    # pierwszy niepusty z trzech źródeł id gry; [.] i [|] zamiast ucieczek
+    lines += [f"    ~^[|]*w{i}[.] td_w{i};" for i in range(workers)]
+    lines.append("}")
+    for i, p in enumerate(ports):
+        lines.append(f"upstream td_w{i} {{ server 127.0.0.1:{p}; keepalive 16; }}")
+    lines.append("upstream td_any {")
+    lines += [f"    server 127.0.0.1:{p};" for p in ports]
+    lines += ["    keepalive 16;", "}"]
+    proxy = ["        proxy_pass http://$td_upstream;",
+             "        proxy_http_version 1.1;",
+             '        proxy_set_header Connection "";',
+             "        proxy_set_header Host $host;",
+             "        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;"]
+    lines += ["server {", f"    listen {listen};",
+              "    location / {", *proxy, "    }",
+              "    location = /api/stream {", *proxy,
+              "        proxy_buffering off;",
+              f"        proxy_read_timeout {STREAM_TIMEOUT};",
+              "    }", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def serve(bind="127.0.0.1:5000", workers=1, threads=DEFAULT_THREADS, asgi=False, setup=None):
+    """`setup(app)` — przygotowanie aplikacji w procesie, który ją obsługuje."""
+    host, port = parse_bind(bind)
+    if workers <= 1:
+        serve_forever, port = _app_server(host, port, threads, asgi, setup)
+        print(f"Tower Defense: http://{host}:{port} (1 worker)")
+        serve_forever()
+        return
+    if not (os.environ.get("TD_CHECKPOINT") or os.environ.get("TD_JOURNAL")):
+        # bez zapisu gry workera, który padnie, przepadają bez śladu
+        raise SystemExit("--workers N wymaga TD_CHECKPOINT albo TD_JOURNAL "
+                         "(gry wracają z nich po restarcie workera)")
+    ports = worker_ports(bind, workers)
+    supervisor = Supervisor(ports, threads, asgi, setup)
+    supervisor.start()
+    print(f"Tower Defense: {workers} workery na 127.0.0.1:{ports[0]}-{ports[-1]}; "
+          f"http://{host}:{port} wystawia nginx "
+          f"(python run_app.py --nginx-conf --workers {workers} --bind {bind})")
+    try:
+        supervisor.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
@@ -0,0 +1,219 @@
+# sessions.py
+"""
+Wiele gier w jednym procesie: SessionManager mapuje identyfikator gry na jej
+własny Board (razem z poziomami ulepszeń) i usuwa najdłużej nieużywane gry
+(LRU) po przekroczeniu limitu liczby gier, pamięci albo czasu bezczynności.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import savefile
+from game_logic import Board
+from singleflight import SingleFlight
+from simulation import WaveSimulation
+
+
+def estimate_board_bytes(board):
+    """Przybliżony rozmiar planszy w pamięci (do limitu pamięci menedżera)."""
+    grid = board.grid
+    if hasattr(grid, "nbytes"):
+        size = grid.nbytes
+    else:
+        # wskaźnik 8 B na pole + nagłówek listy wiersza; stringi są współdzielone
+        size = board.total_rows * (board.total_cols * 8 + 56)
+    # wpisy słowników (klucz-krotka + wartość) ~ 150 B
+    size += 150 * (len(board.structures) + len(board.camp) + len(board.camp_buildings))
+    return size + 4096
+
+
+class GameSession:
+    """
+    Jedna gra: plansza, jej symulacja fal i czas ostatniego użycia.
+    Zmiany planszy (trasy i krok symulacji) idą pod blokadą gry `lock`;
+    odczyty korzystają z migawki stanu i nigdy nie biorą blokady. Migawkę
+    buduje piszący (publish, pod blokadą) i podmienia referencję — odczyt
+    widzi starą albo nową, niezmienną migawkę.
+    """
+
+    def __init__(self, game_id, board, sim_factory=WaveSimulation):
+        self.game_id = game_id
+        self.board = board
+        self.lock = threading.RLock()
+        self.sim = sim_factory(board)
+        # krok symulacji pod blokadą gry, po zmianie publikuje nową migawkę
+        self.sim.lock = self.lock
+        self.sim.on_commit = self.publish
+        self._snapshot = board.snapshot()
+        # zakodowane odpowiedzi /api/state wg (state_id, wersja, since, czas gry)
+        self.state_cache = SingleFlight()
+        self.last_seen = time.time()
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    @property
+    def snapshot(self):
+        """Ostatnia opublikowana migawka planszy (game_logic.BoardSnapshot), bez blokady."""
+        return self._snapshot
+
+    def publish(self):
+        """
+        Po zmianie planszy buduje nową migawkę i podmienia referencję (pod self.lock).
+        Niezmienione wiersze siatki są współdzielone z poprzednią migawką.
+        """
+        snap = self._snapshot
+        if snap.version != self.board.version or snap.state_id != self.board.state_id:
+            self._snapshot = self.board.snapshot(snap)
+
+    @contextmanager
+    def mutation(self):
+        """Blok zmieniający planszę: wyłączny dostęp, na końcu publikacja migawki."""
+        with self.lock:
+            try:
+                yield self.board
+            finally:
+                self.publish()
+
+
+class SessionManager:
+    """
+    Gry indeksowane identyfikatorem, w kolejności ostatniego użycia.
+    - max_games: maksymalna liczba gier w pamięci
+    - max_bytes: limit łącznego (szacowanego) rozmiaru plansz, None = bez limitu
+    - idle_timeout: po ilu sekundach bezczynności gra jest usuwana, None = nigdy
+    - on_create / on_evict: opcjonalne callbacki(session) przy utworzeniu i usunięciu gry
+    - sim_factory: klasa symulacji fal (WaveSimulation albo CohortSimulation)
+    - id_prefix: przedrostek identyfikatorów gier (np. "w2." — numer workera w serve.py)
+    """
+
+    def __init__(self, board_factory=Board, max_games=200, max_bytes=None,
+                 idle_timeout=None, on_create=None, on_evict=None, sim_factory=WaveSimulation,
+                 id_prefix=""):
+        self.board_factory = board_factory
+        self.id_prefix = id_prefix
+        self.sim_factory = sim_factory
+        self.max_games = max_games
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.on_create = on_create
+        self.on_evict = on_evict
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, game_id):
+        return game_id in self._games
+
+    def sessions(self):
+        with self._lock:
+            return list(self._games.values())
+
+    def get(self, game_id):
+        """Zwraca grę o danym id (i oznacza ją jako używaną) albo None."""
+        with self._lock:
+            session = self._games.get(game_id)
+            if session is not None:
+                self._games.move_to_end(game_id)
+                session.touch()
+            return session
+
+    def create(self, board=None, game_id=None):
+        """
+        Tworzy nową grę z losowym identyfikatorem (z podaną planszą albo z board_factory);
+        game_id podaje się przy odtwarzaniu gry z zapisu.
+        """
+        if game_id is None:
+            game_id = self.id_prefix + secrets.token_urlsafe(12)
+        session = GameSession(game_id, board if board is not None else self.board_factory(),
+                              self.sim_factory)
+        with self._lock:
+            self._games[game_id] = session
+            evicted = self._enforce_limits(keep=game_id)
+        self._evicted(evicted)
+        if self.on_create is not None:
+            self.on_create(session)
+        return session
+
+    def get_or_create(self, game_id):
+        session = self.get(game_id) if game_id else None
+        return session if session is not None else self.create()
+
+    def checkpoint(self, path):
+        """
+        Zapisuje wszystkie gry jednym plikiem (savefile). Zwraca {id gry: journal_seq}
+        zapisanych gier — numer ostatniego polecenia z dziennika zawartego w zapisie.
+        """
+        games = []
+        saved = {}
+        for session in self.sessions():
+            with session.lock:
+                games.append((session.game_id, savefile.dumps(session.board)))
+                saved[session.game_id] = session.board.journal_seq
+        savefile.write_checkpoint(path, games)
+        return saved
+
+    def restore(self, path, **board_kwargs):
+        """Wczytuje gry z checkpointu (poza tymi, które już są). Zwraca liczbę wczytanych."""
+        restored = 0
+        for game_id, board in savefile.read_checkpoint(path, **board_kwargs):
+            if game_id not in self:
+                self.create(board, game_id=game_id)
+                restored += 1
+        return restored
+
+    def remove(self, game_id):
+        with self._lock:
+            session = self._games.pop(game_id, None)
+        if session is not None:
+            self._evicted([session])
+        return session is not None
+
+    def evict_idle(self, now=None):
+        """Usuwa gry bezczynne dłużej niż idle_timeout. Zwraca liczbę usuniętych."""
+        with self._lock:
+            evicted = self._pop_idle(now if now is not None else time.time())
+        self._evicted(evicted)
+        return len(evicted)
+
+    # ---- wewnętrzne (wywoływane pod self._lock) ----
+    def _pop_idle(self, now):
+        evicted = []
+        if self.idle_timeout is None:
+            return evicted
+        # OrderedDict jest w kolejności użycia — najstarsze na początku
+        while self._games:
+            game_id, session = next(iter(self._games.items()))
+            if now - session.last_seen <= self.idle_timeout:
+                break
+            del self._games[game_id]
+            evicted.append(session)
+        return evicted
+
+    def _enforce_limits(self, keep):
+        evicted = self._pop_idle(time.time())
+        while len(self._games) > max(1, self.max_games):
+            evicted.append(self._pop_oldest(keep))
+        if self.max_bytes is not None:
+            total = sum(estimate_board_bytes(s.board) for s in self._games.values())
+            while total > self.max_bytes and len(self._games) > 1:
+                session = self._pop_oldest(keep)
+                total -= estimate_board_bytes(session.board)
+                evicted.append(session)
+        return evicted
+
+    def _pop_oldest(self, keep):
+        for game_id in self._games:
+            if game_id != keep:
+                return self._games.pop(game_id)
+        raise RuntimeError("Brak gry do usunięcia")
+
+    def _evicted(self, sessions):
+        if self.on_evict is None:
+            return
+        for session in sessions:
+            self.on_evict(session)
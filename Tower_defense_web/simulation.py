@@ -0,0 +1,728 @@
+# simulation.py
+"""
+Symulacja fal po stronie serwera: przeciwnicy poruszają się po polu przepływu
+(odwrotny BFS od bazy), a wieże strzelają w stałym kroku czasowym (fixed timestep)
+w wątku w tle.
+Klient nie musi już zgłaszać każdego spawnu i zgonu osobnym zapytaniem.
+CohortSimulation liczy tę samą falę na seriach przeciwników (EnemyRun) — dla późnych fal.
+"""
+import bisect
+import heapq
+import logging
+import math
+import threading
+import time
+
+import enemy_logic
+import tower_logic
+from clock import SteppedClock
+from spatial import EnemyIndex
+
+log = logging.getLogger(__name__)
+
+
+# -------------------------
+# PRZECIWNIK
+# -------------------------
+class SimEnemy:
+    """
+    Pojedynczy przeciwnik idący po polu przepływu (FlowField): z pola `cell`
+    do następnego kroku `target`, pozycja interpolowana ułamkiem `frac`.
+    """
+    __slots__ = ("eid", "hp", "max_hp", "cell", "target", "frac", "row", "col", "done")
+
+    def __init__(self, eid, hp, start, field):
+        self.eid = eid
+        self.hp = hp
+        self.max_hp = hp
+        self.cell = (int(start[0]), int(start[1]))
+        self.target = field.next_step(self.cell)
+        self.frac = 0.0  # przebyta część odcinka cell -> target
+        self.row, self.col = self.cell
+        self.done = False  # dotarł do bazy
+
+    def take_damage(self, dmg):
+        self.hp -= dmg
+
+    def reached_end(self):
+        return self.done
+
+    def advance(self, tiles, field):
+        """Przesuwa przeciwnika o `tiles` pól. Zwraca True gdy dotarł do bazy."""
+        if self.done:
+            return True
+        self.frac += tiles
+        while self.frac >= 1.0 and self.target is not None:
+            self.frac -= 1.0
+            self.cell = self.target
+            self.target = field.next_step(self.cell)
+        if self.target is None:
+            # baza albo pole bez drogi (stoi w miejscu)
+            self.frac = 0.0
+            self.row, self.col = self.cell
+            self.done = self.cell == field.base
+            return self.done
+        r0, c0 = self.cell
+        r1, c1 = self.target
+        self.row = r0 + (r1 - r0) * self.frac
+        self.col = c0 + (c1 - c0) * self.frac
+        return False
+
+    def reroute(self, field):
+        """Przepina przeciwnika na nowe pole przepływu (najbliższe pole z drogą, jak w enemies.js)."""
+        near, far = self.cell, self.target
+        if far is not None and self.frac >= 0.5:
+            near, far = far, near
+        if field.reachable(near):
+            cell = near
+        elif far is not None and field.reachable(far):
+            cell = far
+        else:
+            cell = field.nearest(near) or near
+        self.cell = cell
+        self.target = field.next_step(cell)
+        self.frac = 0.0
+        self.row, self.col = cell
+
+
+# -------------------------
+# SYMULACJA FALI JEDNEJ PLANSZY
+# -------------------------
+class WaveSimulation:
+    """
+    Symulacja fali dla jednej planszy. Stan fali (numer, aktywność) czyta z Board,
+    spawny i zgony raportuje przez Board.enemy_spawned / Board.enemy_killed.
+    """
+
+    def __init__(self, board, clock=None):
+        self.board = board
+        # zegar krokowy symulacji; plansza z zegarem krokowym (gra bez przeglądarki)
+        # dzieli go z symulacją, inaczej zegar startuje od czasu planszy przy 1. kroku
+        if clock is None and isinstance(getattr(board, "clock", None), SteppedClock):
+            clock = board.clock
+        self.clock = clock
+        self.enemies = []
+        self.index = EnemyIndex()  # przeciwnicy idący (bez tych w bazie) w kubełkach po polach
+        self._towers = {}  # {(r,c): Tower} — zachowuje cooldown między tickami
+        self._wave = None
+        self._wave_hp = 1
+        self._to_spawn = 0
+        self._next_spawn = 0.0
+        self._field = None
+        self._path_key = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+        # blokada zmian planszy — sessions.GameSession podmienia ją na blokadę gry
+        self.lock = threading.RLock()
+        # opcjonalne callbacki po kroku, który zmienił stan planszy:
+        # on_commit() jeszcze pod self.lock, on_change(version) już po jej zwolnieniu
+        self.on_commit = None
+        self.on_change = None
+
+    @property
+    def now(self):
+        return self.clock.now() if self.clock is not None else None
+
+    # ---- ścieżka i wieże ----
+    def _refresh_path(self):
+        b = self.board
+        if b.path_version == self._path_key:
+            return
+        self._path_key = b.path_version
+        old = self._field
+        self._field = b.get_flow_field()
+        if old is not None:
+            for e in self.enemies:
+                e.reroute(self._field)
+                self.index.move(e)
+
+    def _spawn_cell(self):
+        """Portal, z którego wychodzą przeciwnicy (None gdy nie ma drogi do bazy)."""
+        portal = self.board.current_portal
+        if portal is None or not self._field.reachable(portal):
+            return None
+        return portal
+
+    def _sync_towers(self):
+        b = self.board
+        towers = {}
+        for pos, typ in b.structures.items():
+            if not typ.startswith("tower"):
+                continue
+            t = self._towers.get(pos)
+            if t is None or t.typ != typ:
+                t = tower_logic.Tower(typ, pos[0], pos[1], levels=b.upgrade_levels, clock=self.clock)
+            towers[pos] = t
+        self._towers = towers
+        b.towers = list(towers.values())
+
+    # ---- fala ----
+    def _begin_wave(self, wave):
+        self._wave = wave
+        self._wave_hp = enemy_logic.hp_for_wave(wave)
+        self._to_spawn = enemy_logic.count_for_wave(wave)
+        self._next_spawn = self.now
+
+    def _spawn_due(self):
+        interval = enemy_logic.spawn_interval_ms() / 1000.0
+        spawned = 0
+        start = self._spawn_cell()
+        while self._to_spawn > 0 and start is not None and self.now >= self._next_spawn:
+            e = SimEnemy(self._next_id, self._wave_hp, start, self._field)
+            self._next_id += 1
+            self.enemies.append(e)
+            self.index.add(e)
+            self._to_spawn -= 1
+            self._next_spawn += interval
+            spawned += 1
+        if spawned:
+            self.board.enemy_spawned(spawned)
+
+    # ---- krok symulacji ----
+    def step(self, dt):
+        """Jeden krok symulacji o stałej długości `dt` sekund."""
+        b = self.board
+        with self.lock:
+            if self.clock is None:
+                self.clock = SteppedClock(b.clock.now())
+            self.clock.advance(dt)
+            version = b.version
+            try:
+                self._step(dt)
+            finally:
+                changed = b.version != version
+                if changed and self.on_commit is not None:
+                    self.on_commit()
+        if changed and self.on_change is not None:
+            self.on_change(b.version)
+
+    def _step(self, dt):
+        b = self.board
+        with self._lock:
+            if not b.wave_active:
+                # fala zakończona (także ręcznie) — sprzątamy pozostałych
+                self.enemies = []
+                self.index.clear()
+                self._wave = None
+                self._to_spawn = 0
+                return
+            if b.wave != self._wave:
+                self.enemies = []
+                self.index.clear()
+                self._begin_wave(b.wave)
+
+            self._refresh_path()
+            self._spawn_due()
+
+            tiles = dt * 1000.0 / enemy_logic.time_per_tile_ms()
+            reached = []
+            for e in self.enemies:
+                if e.advance(tiles, self._field):
+                    reached.append(e)
+                    self.index.remove(e)
+                else:
+                    self.index.move(e)
+
+            self._sync_towers()
+            walking = [e for e in self.enemies if not e.reached_end()]
+            tower_logic.process_towers(b, walking, now=self.now, index=self.index)
+
+            killed = 0
+            survivors = []
+            for e in self.enemies:
+                if e.hp <= 0:
+                    killed += 1
+                    self.index.remove(e)
+                elif not e.reached_end():
+                    survivors.append(e)
+            self.enemies = survivors
+
+        # raportowanie do planszy (zgony przed dotarciem do bazy, jak w kliencie)
+        if killed:
+            b.enemy_killed(killed)
+        for e in reached:
+            b.enemy_killed(1, reached_base=True, enemy_hp=max(1, math.ceil(e.hp)))
+
+    def snapshot(self):
+        """Pozycje przeciwników do wyrenderowania przez klienta."""
+        with self._lock:
+            return [{"id": e.eid, "row": e.row, "col": e.col, "hp": e.hp}
+                    for e in self.enemies]
+
+
+# -------------------------
+# FALE GRUPAMI (bez obiektu na przeciwnika)
+# -------------------------
+class EnemyRun:
+    """
+    Seria `count` przeciwników o tym samym HP idących jedną ścieżką, wychodzących
+    co `gap` sekund od chwili `t0`. Postęp j-tego członka (0 = czoło serii)
+    w chwili t to (t - t0 - j * gap) / tpt, gdzie tpt to czas przejścia pola;
+    ujemny postęp oznacza, że członek czeka jeszcze w portalu.
+    Identyfikatory członków to first_id, first_id + 1, ...
+    """
+    __slots__ = ("path_id", "t0", "count", "gap", "hp", "first_id")
+
+    def __init__(self, path_id, t0, count, gap, hp, first_id):
+        self.path_id = path_id
+        self.t0 = t0
+        self.count = count
+        self.gap = gap
+        self.hp = hp
+        self.first_id = first_id
+
+    def progress(self, j, t, tpt):
+        return (t - self.t0 - j * self.gap) / tpt
+
+    def members_before(self, limit, t, tpt):
+        """Liczba członków (od czoła) z postępem >= limit."""
+        ahead = t - self.t0 - limit * tpt
+        if ahead < 0:
+            return 0
+        if self.gap <= 0:
+            return self.count
+        return min(self.count, int(math.floor(ahead / self.gap + 1e-9)) + 1)
+
+    def piece(self, start, count, hp=None):
+        """Podseria członków start..start+count-1 (opcjonalnie z innym HP)."""
+        return EnemyRun(self.path_id, self.t0 + start * self.gap, count, self.gap,
+                        self.hp if hp is None else hp, self.first_id + start)
+
+
+def _range_windows(path, row, col, radius):
+    """
+    Przedziały postępu [lo, hi] na ścieżce `path`, w których punkt jest w odległości
+    <= radius od (row, col). Odcinki ścieżki mają długość 1 i są równoległe do osi.
+    """
+    windows = []
+    for i in range(len(path) - 1):
+        (r0, c0), (r1, c1) = path[i], path[i + 1]
+        dr, dc = r1 - r0, c1 - c0
+        ar, ac = r0 - row, c0 - col
+        b = ar * dr + ac * dc
+        disc = b * b - (ar * ar + ac * ac - radius * radius)
+        if disc < 0:
+            continue
+        sq = math.sqrt(disc)
+        lo, hi = max(0.0, -b - sq), min(1.0, -b + sq)
+        if lo > hi:
+            continue
+        if windows and windows[-1][1] >= i + lo - 1e-9:
+            windows[-1][1] = i + hi
+        else:
+            windows.append([i + lo, i + hi])
+    return windows
+
+
+class CohortSimulation(WaveSimulation):
+    """
+    Symulacja fali na seriach (EnemyRun) zamiast obiektów przeciwników: pozycja
+    wynika z czasu i time_per_tile_ms, a seria dzieli się tylko wtedy, gdy wieża
+    trafi część jej członków (i scala z powrotem, gdy HP i odstępy się zgadzają).
+    Pamięć i koszt kroku rosną z liczbą różnych stanów, nie z liczbą przeciwników,
+    więc da się symulować późne fale (tysiące przeciwników). Interfejs jak WaveSimulation;
+    przebieg fali jest ten sam co w WaveSimulation, z dokładnością do zaokrąglenia
+    spawnu do kroku, gdy sumowany czas kroków nie trafia dokładnie w chwilę spawnu.
+    """
+
+    # tolerancja porównania czasów przy scalaniu serii (s)
+    _EPS = 1e-6
+
+    def __init__(self, board, clock=None):
+        super().__init__(board, clock)
+        self.runs = []          # serie w kolejności spawnu (first_id)
+        self._paths = {}        # {path_id: krotka pól (r,c) ... baza}
+        self._main_path = None  # path_id ścieżki z portalu dla bieżącego pola przepływu
+        self._side_paths = {}   # {pole startowe: path_id} ścieżek po przepięciu
+        self._next_path_id = 0
+        self._windows = {}      # {(path_id, r, c, zasięg): przedziały postępu w zasięgu}
+        self._spawned = 0       # członkowie już zgłoszeni jako spawn
+        self._removed = 0       # członkowie usunięci (zabici / w bazie)
+        self._dt = 0.0          # długość ostatniego kroku
+        self._wave_t = 0.0      # czas od startu fali (suma dt) — czasy serii są względem niego
+        self._spawn_at = 0.0    # czas wyjścia pierwszego przeciwnika (względem startu fali)
+
+    def _edge(self):
+        """
+        Próg postępu członka, który wyszedł z portalu. Jak w WaveSimulation
+        przeciwnik w kroku spawnu od razu przechodzi dt, więc próg to dt / tpt.
+        """
+        return self._dt / self._tpt - 1e-9
+
+    @property
+    def _wave_time(self):
+        """
+        Czas od startu fali liczony sumą kroków dt, a nie różnicą odczytów zegara —
+        przy zegarze startującym od czasu ściennego (~1e9 s) różnica traci precyzję.
+        """
+        return self._wave_t
+
+    @property
+    def enemy_count(self):
+        """Liczba przeciwników na planszy (bez czekających w portalu)."""
+        return self._spawned - self._removed
+
+    # ---- ścieżki ----
+    def _add_path(self, cells):
+        pid = self._next_path_id
+        self._next_path_id += 1
+        self._paths[pid] = tuple(cells)
+        return pid
+
+    def _refresh_path(self):
+        b = self.board
+        if b.path_version == self._path_key:
+            return
+        self._path_key = b.path_version
+        self._field = b.get_flow_field()
+        self._windows = {}
+        old_paths, self._side_paths = self._paths, {}
+        self._paths = {}
+        portal = self._spawn_cell()
+        main = self._field.path_from(portal) if portal is not None else []
+        self._main_path = self._add_path(main) if main else None
+        if self.runs:
+            self._remap(old_paths)
+
+    def _side_path(self, cell):
+        pid = self._side_paths.get(cell)
+        if pid is None:
+            pid = self._side_paths[cell] = self._add_path(self._field.path_from(cell))
+        return pid
+
+    def _remap(self, old_paths):
+        """
+        Przepina serie na nowe pole przepływu (najbliższe pole z drogą, jak SimEnemy.reroute).
+        Jak w WaveSimulation liczą się pozycje z końca poprzedniego kroku, a w bieżącym
+        kroku przepięci przeciwnicy przechodzą jeszcze dt.
+        """
+        tpt = self._tpt
+        now = self._wave_time - self._dt
+        field = self._field
+        main = self._paths.get(self._main_path, ())
+        main_index = {cell: i for i, cell in enumerate(main)}
+        runs = []
+        for run in self.runs:
+            walking = run.members_before(self._edge(), now, tpt)
+            if walking < run.count:
+                # czekający w portalu wyjdą nową ścieżką główną
+                rest = run.piece(walking, run.count - walking)
+                rest.path_id = self._main_path
+                runs.append(rest)
+            path = old_paths[run.path_id]
+            groups = []  # [(path_id, postęp, od, ile)]
+            for j in range(walking):
+                p = min(run.progress(j, now, tpt), len(path) - 1)
+                i = int(p)
+                near, far = path[i], (path[i + 1] if i + 1 < len(path) else None)
+                if far is not None and p - i >= 0.5:
+                    near, far = far, near
+                if field.reachable(near):
+                    cell = near
+                elif far is not None and field.reachable(far):
+                    cell = far
+                else:
+                    cell = field.nearest(near) or near
+                if cell in main_index:
+                    key = (self._main_path, main_index[cell])
+                else:
+                    key = (self._side_path(cell), 0)
+                if groups and groups[-1][:2] == key:
+                    groups[-1][3] += 1
+                else:
+                    groups.append([key[0], key[1], j, 1])
+            for pid, prog, start, n in groups:
+                runs.append(EnemyRun(pid, now - prog * tpt, n, 0.0, run.hp, run.first_id + start))
+        runs.sort(key=lambda r: r.first_id)
+        self.runs = self._merge(runs)
+
+    # ---- fala ----
+    def _begin_wave(self, wave):
+        super()._begin_wave(wave)
+        self._wave_t = 0.0
+        self._spawn_at = 0.0
+        self.runs = []
+        self._total = self._to_spawn
+        self._spawned = self._removed = 0
+        self._started = False
+
+    def _spawn_due(self):
+        # serie powstają od razu dla całej fali — czekający mają ujemny postęp
+        if not self._started and self._main_path is not None:
+            interval = enemy_logic.spawn_interval_ms() / 1000.0
+            self.runs = [EnemyRun(self._main_path, self._spawn_at - self._dt, self._to_spawn,
+                                  interval, self._wave_hp, self._next_id)]
+            self._next_id += self._to_spawn
+            self._to_spawn = 0
+            self._started = True
+        elif self._main_path is None:
+            # brak drogi z portalu — kolejka czeka (przesuwamy czas wyjścia czekających)
+            self._hold_waiting()
+        # czekający są zawsze na końcu (najwyższe id) — liczymy od ostatniej serii
+        edge, now, tpt = self._edge(), self._wave_time, self._tpt
+        waiting = self._to_spawn
+        for run in reversed(self.runs):
+            n = run.count - run.members_before(edge, now, tpt)
+            if n == 0:
+                break
+            waiting += n
+        spawned = self._total - waiting
+        if spawned > self._spawned:
+            self.board.enemy_spawned(spawned - self._spawned)
+            self._spawned = spawned
+
+    def _hold_waiting(self):
+        if not self._started:
+            self._spawn_at = self._wave_t
+            return
+        runs = []
+        for run in self.runs:
+            walking = run.members_before(self._edge(), self._wave_time - self._dt, self._tpt)
+            if walking < run.count:
+                if walking:
+                    runs.append(run.piece(0, walking))
+                rest = run.piece(walking, run.count - walking)
+                rest.t0 += self._dt
+                runs.append(rest)
+            else:
+                runs.append(run)
+        self.runs = runs
+
+    # ---- krok symulacji ----
+    @property
+    def _tpt(self):
+        return enemy_logic.time_per_tile_ms() / 1000.0
+
+    def _step(self, dt):
+        b = self.board
+        self._dt = dt
+        with self._lock:
+            if not b.wave_active:
+                self.runs = []
+                self._wave = None
+                self._to_spawn = 0
+                return
+            if b.wave != self._wave:
+                self._begin_wave(b.wave)
+            else:
+                self._wave_t += dt
+
+            self._refresh_path()
+            self._spawn_due()
+            t, tpt = self._wave_time, self._tpt
+
+            # dotarli do bazy: czoła serii z postępem >= długość ścieżki
+            reached = []
+            runs = []
+            for run in self.runs:
+                n = run.members_before(len(self._paths[run.path_id]) - 1, t, tpt)
+                if n:
+                    reached.append((n, run.hp))
+                if n < run.count:
+                    runs.append(run if n == 0 else run.piece(n, run.count - n))
+            self.runs = runs
+
+            self._sync_towers()
+            damage = self._fire(self.now, t, tpt)
+
+            killed = 0
+            if damage:
+                runs = []
+                for i, run in enumerate(self.runs):
+                    hits = damage.get(i)
+                    if not hits:
+                        runs.append(run)
+                        continue
+                    start = 0
+                    for j in sorted(hits):
+                        if j > start:
+                            runs.append(run.piece(start, j - start))
+                        hp = run.hp - hits[j]
+                        if hp <= 0:
+                            killed += 1
+                        else:
+                            runs.append(run.piece(j, 1, hp))
+                        start = j + 1
+                    if start < run.count:
+                        runs.append(run.piece(start, run.count - start))
+                self.runs = self._merge(runs)
+            self._removed += killed + sum(n for n, _ in reached)
+
+        if killed:
+            b.enemy_killed(killed)
+        for n, hp in reached:
+            b.enemy_killed(n, reached_base=True, enemy_hp=max(1, math.ceil(hp)))
+
+    def _fire(self, now, t, tpt):
+        """
+        Strzały wież: 1–2 najbliższe cele w zasięgu (remis: kolejność spawnu), jak
+        Tower.attack. Trafieni martwi w tym kroku nadal są celami — jak w WaveSimulation.
+        `now` to czas zegara (cooldown wież), `t` — czas od startu fali (pozycje).
+        Zwraca {indeks serii: {członek: suma obrażeń}}.
+        """
+        damage = {}
+        edge = self._edge()
+        # serie z członkami na planszy, per ścieżka, posortowane wg początku zakresu postępu
+        by_path = {}
+        for i, run in enumerate(self.runs):
+            path = self._paths[run.path_id]
+            h = run.progress(0, t, tpt)
+            step = run.gap / tpt  # odstęp członków w polach
+            p_lo = max(edge, h - (run.count - 1) * step)
+            p_hi = min(h, len(path) - 1)
+            if p_lo <= p_hi:
+                by_path.setdefault(run.path_id, []).append((p_lo, p_hi, i, run, h, step))
+        if not by_path:
+            return damage
+        spans = {}
+        for pid, items in by_path.items():
+            items.sort(key=lambda it: it[0])
+            spans[pid] = ([it[0] for it in items], max(it[1] - it[0] for it in items), items)
+
+        for tower in self._towers.values():
+            if not tower.can_attack(now):
+                continue
+            spec = tower.specs()
+            radius = spec["range"]
+            cands = []
+            for pid, (starts, longest, items) in spans.items():
+                path = self._paths[pid]
+                key = (pid, tower.row, tower.col, radius)
+                windows = self._windows.get(key)
+                if windows is None:
+                    windows = self._windows[key] = _range_windows(path, tower.row, tower.col, radius)
+                last = len(path) - 1
+                for lo, hi in windows:
+                    # serie, których zakres [p_lo, p_hi] przecina okno [lo, hi]
+                    k0 = bisect.bisect_left(starts, lo - longest - 1e-9)
+                    k1 = bisect.bisect_right(starts, hi + 1e-9)
+                    for p_lo, p_hi, i, run, h, step in items[k0:k1]:
+                        if p_hi < lo - 1e-9:
+                            continue
+                        if step <= 0:
+                            # stos członków w jednym punkcie — liczą się tylko dwaj pierwsi
+                            js = range(min(2, run.count))
+                        else:
+                            j0 = max(0, math.ceil((h - hi) / step - 1e-9))
+                            j1 = min(run.count - 1, math.floor((h - lo) / step + 1e-9))
+                            js = range(j0, j1 + 1)
+                        for j in js:
+                            p = h - j * step
+                            if p < edge or p >= last:
+                                continue
+                            r, c = _point_on(path, p)
+                            d = math.hypot(c - tower.col, r - tower.row)
+                            if d <= radius:
+                                cands.append((d, run.first_id + j, i, j))
+            if not cands:
+                continue
+            count = 2 if spec.get("strategic", False) else 1
+            for _, _, i, j in heapq.nsmallest(count, cands):
+                hits = damage.setdefault(i, {})
+                hits[j] = hits.get(j, 0) + spec["damage"]
+            tower._last_shot = now
+        return damage
+
+    def _merge(self, runs):
+        """Scala sąsiednie serie o tej samej ścieżce, HP i ciągłym rozstawie."""
+        merged = []
+        for run in runs:
+            if merged:
+                prev = merged[-1]
+                if (prev.path_id == run.path_id and prev.hp == run.hp
+                        and prev.gap == run.gap
+                        and prev.first_id + prev.count == run.first_id
+                        and abs(prev.t0 + prev.count * prev.gap - run.t0) < self._EPS):
+                    prev.count += run.count
+                    continue
+            merged.append(run)
+        return merged
+
+    def snapshot(self):
+        """Pozycje przeciwników na planszy (członkowie serii rozwinięci do listy)."""
+        with self._lock:
+            if self.clock is None:
+                return []
+            now, tpt = self._wave_time, self._tpt
+            out = []
+            for run in self.runs:
+                path = self._paths.get(run.path_id)
+                if not path:
+                    continue
+                for j in range(run.members_before(self._edge(), now, tpt)):
+                    p = min(run.progress(j, now, tpt), len(path) - 1)
+                    r, c = _point_on(path, p)
+                    out.append({"id": run.first_id + j, "row": r, "col": c, "hp": run.hp})
+            return out
+
+
+def _point_on(path, p):
+    """Pozycja (row, col) w punkcie o postępie p na ścieżce."""
+    i = int(p)
+    if i >= len(path) - 1:
+        return path[-1]
+    frac = p - i
+    (r0, c0), (r1, c1) = path[i], path[i + 1]
+    return r0 + (r1 - r0) * frac, c0 + (c1 - c0) * frac
+
+
+# -------------------------
+# PĘTLA W TLE
+# -------------------------
+class SimulationLoop:
+    """Wątek w tle wywołujący step() wszystkich symulacji ze stałą częstotliwością."""
+
+    # maksymalna liczba zaległych ticków nadrabianych w jednym obiegu
+    MAX_CATCH_UP = 5
+
+    def __init__(self, tick_hz=20):
+        self.dt = 1.0 / tick_hz
+        self._sims = []
+        self._sims_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, sim):
+        with self._sims_lock:
+            if sim not in self._sims:
+                self._sims.append(sim)
+
+    def remove(self, sim):
+        with self._sims_lock:
+            if sim in self._sims:
+                self._sims.remove(sim)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wave-simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _tick(self):
+        with self._sims_lock:
+            sims = list(self._sims)
+        for sim in sims:
+            try:
+                sim.step(self.dt)
+            except Exception:
+                log.exception("Błąd w kroku symulacji")
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            # nadrabiamy zaległe ticki, ale nie w nieskończoność
+            behind = 0
+            while time.monotonic() >= next_tick and behind < self.MAX_CATCH_UP:
+                self._tick()
+                next_tick += self.dt
+                behind += 1
+            if behind == self.MAX_CATCH_UP:
+                next_tick = time.monotonic() + self.dt
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
@@ -0,0 +1,65 @@
+# singleflight.py
+"""
+Wspólne obliczenia: równoczesne wywołania z tym samym kluczem czekają na
+jeden wynik zamiast liczyć go każde osobno (np. kodowanie /api/state dla
+kilku skryptów strony naraz). Ostatnie wyniki zostają zapamiętane.
+"""
+import threading
+from collections import OrderedDict
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Pamięć ostatnich `max_entries` wyników fn() wg klucza, z jednym obliczeniem w locie."""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._calls = OrderedDict()  # {klucz: _Call} — od najstarszego
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+                while len(self._calls) > self.max_entries:
+                    self._calls.popitem(last=False)
+            else:
+                self._calls.move_to_end(key)
+                self.hits += 1
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                # błąd nie zostaje w pamięci — następne wywołanie liczy od nowa
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call.done.set()
+        return call.value
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,85 @@
+# spatial.py
+"""
+Indeks przestrzenny przeciwników: kubełki po polach siatki (floor(row), floor(col)).
+Wieża pyta tylko o pola w kwadracie swojego zasięgu, więc koszt zapytania zależy
+od liczby przeciwników w pobliżu, a nie od liczby wszystkich przeciwników na fali.
+"""
+from math import floor, hypot
+
+
+def _cell_of(e):
+    return floor(e.row), floor(e.col)
+
+
+class EnemyIndex:
+    """
+    Przeciwnicy (obiekty z atrybutami row/col) w kubełkach po polach.
+    Po każdym ruchu przeciwnika trzeba wywołać move(e).
+    """
+
+    def __init__(self, enemies=()):
+        self._cells = {}   # {(r,c): {przeciwnik: None}} — dict jako zbiór z kolejnością
+        self._where = {}   # {przeciwnik: ((r,c), numer dodania)}
+        self._seq = 0
+        for e in enemies:
+            self.add(e)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, e):
+        return e in self._where
+
+    def add(self, e):
+        if e in self._where:
+            return
+        cell = _cell_of(e)
+        self._cells.setdefault(cell, {})[e] = None
+        self._where[e] = (cell, self._seq)
+        self._seq += 1
+
+    def remove(self, e):
+        entry = self._where.pop(e, None)
+        if entry is None:
+            return
+        bucket = self._cells[entry[0]]
+        del bucket[e]
+        if not bucket:
+            del self._cells[entry[0]]
+
+    def move(self, e):
+        """Aktualizuje kubełek przeciwnika po zmianie pozycji."""
+        entry = self._where.get(e)
+        if entry is None:
+            return
+        cell = _cell_of(e)
+        if cell == entry[0]:
+            return
+        bucket = self._cells[entry[0]]
+        del bucket[e]
+        if not bucket:
+            del self._cells[entry[0]]
+        self._cells.setdefault(cell, {})[e] = None
+        self._where[e] = (cell, entry[1])
+
+    def clear(self):
+        self._cells.clear()
+        self._where.clear()
+
+    def query(self, row, col, radius):
+        """
+        Przeciwnicy w odległości <= radius od (row, col), posortowani od najbliższego.
+        Przy równej odległości decyduje kolejność dodania (jak stabilne sortowanie listy).
+        """
+        hits = []
+        for r in range(floor(row - radius), floor(row + radius) + 1):
+            for c in range(floor(col - radius), floor(col + radius) + 1):
+                bucket = self._cells.get((r, c))
+                if not bucket:
+                    continue
+                for e in bucket:
+                    d = hypot(e.col - col, e.row - row)
+                    if d <= radius:
+                        hits.append((d, self._where[e][1], e))
+        hits.sort(key=lambda h: (h[0], h[1]))
+        return [e for _, _, e in hits]
@@ -7,6 +7,7 @@
     // ---- stałe / konfiguracja ----
     const CELL = 25;
     const POLL_STATE_MS = 400;
+    const EVENTS_FLUSH_MS = 250;
     const TIME_PER_TILE_MS = 2000;
     const SPAWN_INTERVAL_MS = 800;
     const DOT_SIZE = 10;
@@ -30,9 +31,11 @@
     let enemies = [];
     let enemyIdCounter = 1;
     let currentPath = [];
+    let knownPathVersion = null;  // path_version ostatnio pobranej ścieżki
     let pollTimer = null;
     let rafHandle = null;
     let lastRAF = null;
+    let serverSim = false;   // fale symulowane przez serwer (TD_SERVER_SIM=1)
 
     const gameArea = document.getElementById("game-area");
     if (!gameArea) return;
@@ -77,6 +80,41 @@
       el.style.top  = `${Math.round(y - DOT_SIZE/2)}px`;
     }
 
+    // ---- zdarzenia wysyłane paczkami do /api/events (zamiast zapytania na każdego wroga) ----
+    let pendingEvents = [];
+    let flushing = null;
+
+    function queueEvent(ev) {
+      pendingEvents.push(ev);
+    }
+
+    // serwer odsyła tylko liczniki, które się zmieniły
+    function applyStatsDelta(st) {
+      if (!st) return;
+      const elEnemies = document.getElementById("stat-enemies");
+      if (elEnemies && st.active_enemies !== undefined) elEnemies.textContent = st.active_enemies;
+      const elHp = document.getElementById("stat-health");
+      if (elHp && st.hp !== undefined) elHp.textContent = st.hp;
+      const elGold = document.getElementById("stat-gold");
+      if (elGold && st.gold !== undefined) elGold.textContent = st.gold;
+    }
+
+    function flushEvents() {
+      if (flushing) return flushing;
+      if (pendingEvents.length === 0) return Promise.resolve();
+      const batch = pendingEvents;
+      pendingEvents = [];
+      flushing = fetch("/api/events", {
+        method: "POST",
+        headers: {"Content-Type":"application/json"},
+        body: JSON.stringify({ events: batch })
+      }).then(r => r.json().catch(()=>({})))
+        .then(j => applyStatsDelta(j && j.state))
+        .catch(()=>{})
+        .finally(() => { flushing = null; });
+      return flushing;
+    }
+
     // ---- usuwanie / zgłaszanie śmierci wroga ----
     // usuń wroga i zgłoś serwerowi; killer może zawierać info o tym która wieża zabiła
     function removeEnemyObj(enemy, reachedBase=false, killer=null, overkill=0) {
@@ -88,43 +126,26 @@
       if (enemy.el && enemy.el.parentNode) enemy.el.parentNode.removeChild(enemy.el);
       enemies = enemies.filter(e => e.id !== enemy.id);
 
-      const body = { count: 1 };
-      if (reachedBase) {
-        body.reached_base = true;
-        body.hp = Math.max(1, Math.ceil(enemy.hp || 1));
-      }
+      const ev = { type: reachedBase ? "reached_base" : "die", count: 1 };
+      if (reachedBase) ev.hp = Math.max(1, Math.ceil(enemy.hp || 1));
       if (killer && typeof killer === "object") {
-        if (killer.killer_type) body.killer_type = killer.killer_type;
-        if (typeof killer.killer_row !== "undefined") body.killer_row = killer.killer_row;
-        if (typeof killer.killer_col !== "undefined") body.killer_col = killer.killer_col;
-        if (killer.killer_id) body.killer_id = killer.killer_id;
+        if (killer.killer_type) ev.killer_type = killer.killer_type;
+        if (typeof killer.killer_row !== "undefined") ev.killer_row = killer.killer_row;
+        if (typeof killer.killer_col !== "undefined") ev.killer_col = killer.killer_col;
+        if (killer.killer_id) ev.killer_id = killer.killer_id;
       }
-      if (overkill) body.overkill = overkill;
-
-      fetch("/api/enemy_die", {
-        method: "POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify(body)
-      }).then(r => r.json().catch(()=>({})))
-        .then(j => {
-          // po zgłoszeniu odśwież statystyki z serwera
-          fetch("/api/state").then(s => s.ok ? s.json() : Promise.reject())
-            .then(st => {
-              const elEnemies = document.getElementById("stat-enemies");
-              if (elEnemies) elEnemies.textContent = (st.active_enemies !== undefined) ? st.active_enemies : 0;
-              const elHp = document.getElementById("stat-health");
-              if (elHp && st.hp !== undefined) elHp.textContent = st.hp;
-              const elGold = document.getElementById("stat-gold");
-              if (elGold && st.gold !== undefined) elGold.textContent = st.gold;
-            }).catch(()=>{});
-        }).catch(()=>{});
+      if (overkill) ev.overkill = overkill;
+      queueEvent(ev);
     }
 
     // zadawanie obrażeń (wywoływane z tower.js)
     function damageEnemyById(id, dmg, killer) {
+      // w trybie serwerowym obrażenia liczy serwer — pocisk jest tylko efektem
+      if (serverSim) return;
       const en = enemies.find(e => e.id === id);
       if (!en) return;
       en.hp = (en.hp || 1) - Number(dmg || 0);
+      queueEvent({ type: "damage", amount: Number(dmg || 0) });
       if (en.el) en.el.textContent = Math.max(0, Math.ceil(en.hp));
       if (en.hp <= 0) {
         const overkill = Math.max(0, Math.ceil(-en.hp));
@@ -212,8 +233,8 @@
 
       // jeśli ścieżka jest bardzo krótka — traktujemy jako natychmiastowy reach
       if (enemy.pathCells.length <= 1) {
-        fetch("/api/enemy_spawn", { method: "POST", headers: {"Content-Type":"application/json"}, body: JSON.stringify({count:1}) }).catch(()=>{});
-        fetch("/api/enemy_die",   { method: "POST", headers: {"Content-Type":"application/json"}, body: JSON.stringify({count:1, reached_base:true, hp:enemy.hp}) }).catch(()=>{});
+        queueEvent({ type: "spawn", count: 1 });
+        queueEvent({ type: "reached_base", count: 1, hp: enemy.hp });
         return null;
       }
 
@@ -221,11 +242,7 @@
       placeDivCenterAtPx(el, enemy.x, enemy.y);
       enemies.push(enemy);
 
-      fetch("/api/enemy_spawn", {
-        method: "POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({ count: 1 })
-      }).catch(()=>{});
+      queueEvent({ type: "spawn", count: 1 });
 
       return enemy;
     }
@@ -253,36 +270,98 @@
       spawning = false;
     }
 
+    // ---- tryb serwerowy: tylko renderowanie pozycji z /api/enemies ----
+    async function syncServerEnemies() {
+      try {
+        const res = await fetch("/api/enemies");
+        if (!res.ok) return;
+        renderServerEnemies(await res.json());
+      } catch (e) {}
+    }
+
+    function renderServerEnemies(data) {
+      const seen = new Set();
+      const byId = new Map(enemies.map(e => [e.id, e]));
+      for (const se of (data.enemies || [])) {
+        seen.add(se.id);
+        let en = byId.get(se.id);
+        if (!en) {
+          const el = createEnemyDiv(se.id, se.hp);
+          // płynne przejście między kolejnymi odczytami
+          el.style.transition = `left ${POLL_STATE_MS}ms linear, top ${POLL_STATE_MS}ms linear`;
+          gameArea.appendChild(el);
+          en = { id: se.id, el: el, removing: false, server: true };
+          enemies.push(en);
+        }
+        en.hp = se.hp;
+        en.grid_x = Math.round(se.col);
+        en.grid_y = Math.round(se.row);
+        [en.x, en.y] = cellCenterPxFromRC(se.row, se.col);
+        en.el.textContent = Math.max(0, Math.ceil(se.hp));
+        placeDivCenterAtPx(en.el, en.x, en.y);
+      }
+      enemies = enemies.filter(en => {
+        if (seen.has(en.id)) return true;
+        if (en.el && en.el.parentNode) en.el.parentNode.removeChild(en.el);
+        return false;
+      });
+    }
+
     // ---- polling stanu serwera, synchronizacja ścieżki i uruchamianie fal ----
     async function pollStateOnce() {
       try {
-        const res = await fetch("/api/state");
-        if (!res.ok) return;
-        const st = await res.json();
+        // najpierw wysyłamy zaległe zdarzenia, żeby stan serwera był aktualny
+        await flushEvents();
+        // stan z game.js (różnice od ostatniej wersji), w razie braku pełny snapshot
+        let st;
+        const live = !!(window.__td_state && window.__td_state.live() && window.__td_state.current());
+        if (live) {
+          // strumień SSE dostarcza stan na bieżąco — bez zapytania
+          st = window.__td_state.current();
+        } else if (window.__td_state) {
+          st = await window.__td_state.refresh();
+        } else {
+          const res = await fetch("/api/state");
+          if (!res.ok) return;
+          st = await res.json();
+        }
         const wave = st.wave;
         const waveActive = st.wave_active;
 
         // pobierz aktualną ścieżkę z serwera i, jeśli zmieniła się, dopasuj istniejących wrogów
-        try {
-          const p = await fetch("/api/path");
-          if (p.ok) {
-            const j = await p.json();
-            if (Array.isArray(j.path)) {
-              const newPath = j.path;
-              if (JSON.stringify(newPath) !== JSON.stringify(currentPath)) {
-                currentPath = newPath;
-                enemies.forEach(en => {
-                  const idx = findClosestIndexForPx(en.x, en.y, currentPath);
-                  en.pathCells = currentPath.slice();
-                  en.target_index = Math.max(0, idx);
-                });
+        // (ze strumieniem tylko po zmianie path_version)
+        if (!live || st.path_version !== knownPathVersion) {
+          knownPathVersion = st.path_version;
+          try {
+            const p = await fetch("/api/path");
+            if (p.ok) {
+              const j = await p.json();
+              if (Array.isArray(j.path)) {
+                const newPath = j.path;
+                if (JSON.stringify(newPath) !== JSON.stringify(currentPath)) {
+                  currentPath = newPath;
+                  enemies.forEach(en => {
+                    if (en.server) return;
+                    const idx = findClosestIndexForPx(en.x, en.y, currentPath);
+                    en.pathCells = currentPath.slice();
+                    en.target_index = Math.max(0, idx);
+                  });
+                }
               }
             }
-          }
-        } catch (e) {}
+          } catch (e) {}
+        }
+
+        // serwer sam spawnuje i rozlicza przeciwników
+        serverSim = !!st.server_sim;
+        if (serverSim) {
+          // ze strumieniem pozycje przychodzą zdarzeniem td:enemies
+          if (!live) await syncServerEnemies();
+          return;
+        }
 
         // jeśli fala aktywna i trzeba wystartować spawn (nowa fala albo brak żywych)
-        if (waveActive && (lastWave !== wave || (lastWave === wave && enemies.length === 0 && !spawning))) {
+        if (waveActive && (lastWave !== wave || (lastWave === wave && enemies.length === 0 && !spawning && pendingEvents.length === 0))) {
           lastWave = wave;
           spawnWave(wave).catch(()=>{});
         }
@@ -298,7 +377,13 @@
       damageEnemy: (id, dmg, killer) => damageEnemyById(id, dmg, killer)
     });
 
+    // pozycje przeciwników wypychane przez /api/stream
+    document.addEventListener("td:enemies", e => {
+      if (serverSim) renderServerEnemies(e.detail);
+    });
+
     // ---- uruchomienie pollingu i pętli renderującej ----
+    setInterval(flushEvents, EVENTS_FLUSH_MS);
     pollTimer = setInterval(pollStateOnce, POLL_STATE_MS);
     pollStateOnce();
     rafHandle = requestAnimationFrame(moveAndRender);
@@ -1,9 +1,92 @@
 // static/js/game.js
 
+// plansza rzadka (TD_SPARSE_GRID): layout ma "chunks" zamiast "grid2d" — odtwarzamy
+// gęstą siatkę lokalnie, żeby reszta skryptów mogła czytać grid2d[r][c]
+function gridFromChunks(state) {
+  const rows = state.total_rows || 0, cols = state.total_cols || 0, ts = state.tile_size || 1;
+  const grid = Array.from({ length: rows }, () => new Array(cols).fill("void"));
+  (state.chunks || []).forEach(ch => {
+    ch.cells.forEach((row, dr) => {
+      row.forEach((t, dc) => { grid[ch.ty * ts + dr][ch.tx * ts + dc] = t; });
+    });
+  });
+  return grid;
+}
+window.__td_grid = { fromChunks: gridFromChunks };
+
 document.addEventListener("DOMContentLoaded", () => {
   const bc = document.getElementById("board-container");
   let down = false, sx = 0, sy = 0, ox = 0, oy = 0;
 
+  // --- STAN GRY: pełny snapshot przy pierwszym pobraniu, potem tylko zmiany ---
+  let stan = null;
+  let stanPending = null;
+
+  // scala różnicę z /api/state?since=... z lokalną kopią stanu
+  function mergeDelta(d) {
+    if (!stan || d.full) {
+      if (!d.grid2d && d.chunks) d.grid2d = gridFromChunks(d);
+      stan = d;
+      return stan;
+    }
+    stan.version = d.version;
+    Object.assign(stan, d.counters || {});
+    (d.cells || []).forEach(([r, c, t]) => {
+      if (stan.grid2d && stan.grid2d[r]) stan.grid2d[r][c] = t;
+    });
+    (d.structures || []).forEach(s => {
+      stan.structures = (stan.structures || []).filter(x => x.x !== s.x || x.y !== s.y);
+      if (s.t) stan.structures.push(s);
+    });
+    (d.camp || []).forEach(cc => {
+      const i = (stan.camp || []).findIndex(x => x.x === cc.x && x.y === cc.y);
+      if (i >= 0) stan.camp[i] = cc;
+    });
+    ["path_version", "income", "allowed_tiles", "time", "server_sim"].forEach(k => {
+      if (d[k] !== undefined) stan[k] = d[k];
+    });
+    return stan;
+  }
+
+  // jedno wspólne zapytanie dla modułów odpytujących stan w tym samym momencie
+  function refreshState() {
+    if (stanPending) return stanPending;
+    const url = stan
+      ? `/api/state?since=${stan.version}&sid=${encodeURIComponent(stan.state_id)}`
+      : "/api/state";
+    stanPending = fetch(url)
+      .then(r => {
+        if (!r.ok) throw new Error("Nie udało się pobrać stanu gry");
+        return r.json();
+      })
+      .then(mergeDelta)
+      .finally(() => { stanPending = null; });
+    return stanPending;
+  }
+
+  // --- PUSH: strumień SSE z /api/stream; bez niego (lub po zerwaniu) działa odpytywanie ---
+  let streamLive = false;
+  function startStream() {
+    if (!window.EventSource) return;
+    const url = stan
+      ? `/api/stream?since=${stan.version}&sid=${encodeURIComponent(stan.state_id)}`
+      : "/api/stream";
+    const es = new EventSource(url);
+    es.addEventListener("state", ev => {
+      streamLive = true;
+      const d = JSON.parse(ev.data);
+      mergeDelta(d);
+      renderStats(stan);
+      document.dispatchEvent(new CustomEvent("td:state", { detail: { state: stan, delta: d } }));
+    });
+    es.addEventListener("enemies", ev => {
+      document.dispatchEvent(new CustomEvent("td:enemies", { detail: JSON.parse(ev.data) }));
+    });
+    // EventSource sam wznawia połączenie; do tego czasu wracamy do odpytywania
+    es.onerror = () => { streamLive = false; };
+  }
+  window.__td_state = { refresh: refreshState, current: () => stan, live: () => streamLive };
+
   // --- PRZESUWANIE PLANSZY (PAN) ---
   bc.style.cursor = "grab";
   bc.addEventListener("mousedown", e => {
@@ -174,108 +257,108 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // --- DYNAMICZNE ODŚWIEŻANIE STATYSTYK ---
   function updateStats() {
-    fetch("/api/state")
-      .then(r => {
-        if (!r.ok) throw new Error("Nie udało się pobrać stanu gry");
-        return r.json();
-      })
-      .then(data => {
-        // --- zasoby obozu ---
-        const klucze = ["wood","stone","iron_ore","iron_bar","diamond"];
-        klucze.forEach((k, i) => {
-          const wiersz = document.querySelectorAll("#stats-camp tr")[i];
-          if (!wiersz) return;
-          const kom = wiersz.querySelector("td:nth-child(2)");
-          if (!kom) return;
-          kom.textContent = data.resources[k];
-          // usuń stare znaczniki income
-          kom.querySelectorAll("span.income").forEach(el => el.remove());
-          const inc = data.income[k] || 0;
-          if (inc !== 0) {
-            const span = document.createElement("span");
-            span.classList.add("income", inc > 0 ? "positive" : "negative");
-            span.textContent = (inc > 0 ? "+" : "") + inc;
-            kom.appendChild(document.createTextNode(" ("));
-            kom.appendChild(span);
-            kom.appendChild(document.createTextNode(")"));
-          }
-        });
+    refreshState()
+      .then(renderStats)
+      .catch(err => {
+        console.error("updateStats error:", err);
+      });
+  }
 
-        // --- żywność ---
-        const komFood = document.getElementById("stat-food");
-        if (komFood) {
-          komFood.textContent = data.food;
-          komFood.querySelectorAll("span.income").forEach(el => el.remove());
-          const incF = data.income.food || 0;
-          if (incF !== 0) {
-            const s = document.createElement("span");
-            s.classList.add("income", incF > 0 ? "positive" : "negative");
-            s.textContent = (incF > 0 ? "+" : "") + incF;
-            komFood.appendChild(document.createTextNode(" ("));
-            komFood.appendChild(s);
-            komFood.appendChild(document.createTextNode(")"));
-          }
-        }
+  function renderStats(data) {
+    // --- zasoby obozu ---
+    const klucze = ["wood","stone","iron_ore","iron_bar","diamond"];
+    klucze.forEach((k, i) => {
+      const wiersz = document.querySelectorAll("#stats-camp tr")[i];
+      if (!wiersz) return;
+      const kom = wiersz.querySelector("td:nth-child(2)");
+      if (!kom) return;
+      kom.textContent = data.resources[k];
+      // usuń stare znaczniki income
+      kom.querySelectorAll("span.income").forEach(el => el.remove());
+      const inc = data.income[k] || 0;
+      if (inc !== 0) {
+        const span = document.createElement("span");
+        span.classList.add("income", inc > 0 ? "positive" : "negative");
+        span.textContent = (inc > 0 ? "+" : "") + inc;
+        kom.appendChild(document.createTextNode(" ("));
+        kom.appendChild(span);
+        kom.appendChild(document.createTextNode(")"));
+      }
+    });
 
-        // --- inne statystyki ---
-        const elPeas = document.getElementById("stat-peasants");
-        if (elPeas) elPeas.textContent = data.peasants;
-        const elUnemp = document.getElementById("stat-unemployed");
-        if (elUnemp) elUnemp.textContent = data.unemployed;
-        const elHp = document.getElementById("stat-health");
-        if (elHp) elHp.textContent = data.hp;
-        const elGold = document.getElementById("stat-gold");
-        if (elGold) elGold.textContent = data.gold;
-        const elWave = document.getElementById("stat-wave");
-        if (elWave) elWave.textContent = data.wave;
-        const elTime = document.getElementById("stat-time");
-        if (elTime) elTime.textContent = (data.time !== undefined ? data.time + " s" : "");
+    // --- żywność ---
+    const komFood = document.getElementById("stat-food");
+    if (komFood) {
+      komFood.textContent = data.food;
+      komFood.querySelectorAll("span.income").forEach(el => el.remove());
+      const incF = data.income.food || 0;
+      if (incF !== 0) {
+        const s = document.createElement("span");
+        s.classList.add("income", incF > 0 ? "positive" : "negative");
+        s.textContent = (incF > 0 ? "+" : "") + incF;
+        komFood.appendChild(document.createTextNode(" ("));
+        komFood.appendChild(s);
+        komFood.appendChild(document.createTextNode(")"));
+      }
+    }
 
-        // liczba żywych przeciwników
-        const elEnemies = document.getElementById("stat-enemies");
-        const activeEnemies = (data.active_enemies !== undefined) ? data.active_enemies : 0;
-        if (elEnemies) elEnemies.textContent = activeEnemies;
+    // --- inne statystyki ---
+    const elPeas = document.getElementById("stat-peasants");
+    if (elPeas) elPeas.textContent = data.peasants;
+    const elUnemp = document.getElementById("stat-unemployed");
+    if (elUnemp) elUnemp.textContent = data.unemployed;
+    const elHp = document.getElementById("stat-health");
+    if (elHp) elHp.textContent = data.hp;
+    const elGold = document.getElementById("stat-gold");
+    if (elGold) elGold.textContent = data.gold;
+    const elWave = document.getElementById("stat-wave");
+    if (elWave) elWave.textContent = data.wave;
+    const elTime = document.getElementById("stat-time");
+    if (elTime) elTime.textContent = (data.time !== undefined ? data.time + " s" : "");
 
-        // --- BLOKOWANIE UI gdy są żywi przeciwnicy ---
-        const buttons = document.querySelectorAll("#menu button, #camp-menu button, #upgrade-menu button");
-        buttons.forEach(btn => {
-          if (activeEnemies > 0) {
-            btn.disabled = true;
-            btn.classList.add("disabled-by-enemies");
-          } else {
-            btn.disabled = false;
-            btn.classList.remove("disabled-by-enemies");
-          }
-        });
+    // liczba żywych przeciwników
+    const elEnemies = document.getElementById("stat-enemies");
+    const activeEnemies = (data.active_enemies !== undefined) ? data.active_enemies : 0;
+    if (elEnemies) elEnemies.textContent = activeEnemies;
 
-        const btnStart = document.getElementById("btn-start-wave");
-        if (btnStart) {
-          if (activeEnemies > 0) {
-            btnStart.disabled = true;
-            btnStart.title = "Nie można rozpocząć nowej fali, są żywi przeciwnicy";
-          } else {
-            btnStart.disabled = false;
-            btnStart.title = "Start fali";
-          }
-        }
+    // --- BLOKOWANIE UI gdy są żywi przeciwnicy ---
+    const buttons = document.querySelectorAll("#menu button, #camp-menu button, #upgrade-menu button");
+    buttons.forEach(btn => {
+      if (activeEnemies > 0) {
+        btn.disabled = true;
+        btn.classList.add("disabled-by-enemies");
+      } else {
+        btn.disabled = false;
+        btn.classList.remove("disabled-by-enemies");
+      }
+    });
 
-        // blokada expand-tile gdy są przeciwnicy
-        document.querySelectorAll(".expand-tile").forEach(div => {
-          if (activeEnemies > 0) {
-            div.style.pointerEvents = "none";
-            div.style.opacity = "0.5";
-          } else {
-            div.style.pointerEvents = "";
-            div.style.opacity = "1";
-          }
-        });
-      })
-      .catch(err => {
-        console.error("updateStats error:", err);
-      });
+    const btnStart = document.getElementById("btn-start-wave");
+    if (btnStart) {
+      if (activeEnemies > 0) {
+        btnStart.disabled = true;
+        btnStart.title = "Nie można rozpocząć nowej fali, są żywi przeciwnicy";
+      } else {
+        btnStart.disabled = false;
+        btnStart.title = "Start fali";
+      }
+    }
+
+    // blokada expand-tile gdy są przeciwnicy
+    document.querySelectorAll(".expand-tile").forEach(div => {
+      if (activeEnemies > 0) {
+        div.style.pointerEvents = "none";
+        div.style.opacity = "0.5";
+      } else {
+        div.style.pointerEvents = "";
+        div.style.opacity = "1";
+      }
+    });
   }
-  setInterval(updateStats, 1000);
+  // odpytywanie tylko, gdy strumień nie działa
+  setInterval(() => { if (!streamLive) updateStats(); }, 1000);
   updateStats();
+  startStream();
 
   // --- INICJALIZACJA ---
   bindExpand();
@@ -57,7 +57,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
   // lokalna symulacja BFS – sprawdza czy po budowie nadal istnieje ścieżka
   function clientPathExists(state, simR, simC, simType) {
-    const grid = state.grid2d;
+    const grid = state.grid2d || (state.chunks && window.__td_grid ? window.__td_grid.fromChunks(state) : []);
     const rows = grid.length;
     if (!rows) return true;
     const cols = grid[0].length;
@@ -155,8 +155,18 @@ document.addEventListener("DOMContentLoaded", () => {
     return originalFetch(input, init);
   };
 
-  // pierwsze rysowanie i cykliczne odświeżanie ścieżki
+  // pierwsze rysowanie i cykliczne odświeżanie ścieżki (gdy nie działa strumień SSE)
   drawPath();
-  setInterval(drawPath, 500);
+  const streamLive = () => !!(window.__td_state && window.__td_state.live());
+  setInterval(() => { if (!streamLive()) drawPath(); }, 500);
+
+  // ze strumieniem ścieżka jest pobierana tylko po zmianie jej wersji
+  let drawnPathVersion = null;
+  document.addEventListener("td:state", e => {
+    const v = e.detail.state.path_version;
+    if (v === drawnPathVersion) return;
+    drawnPathVersion = v;
+    drawPath();
+  });
   window.drawPath = drawPath;
 });
@@ -0,0 +1,88 @@
+# tests/conftest.py
+import json
+import random
+
+import pytest
+
+import tower_logic
+from clock import SteppedClock
+from game_logic import Board
+
+
+def _play(board, rnd, steps):
+    """Losowa rozgrywka przez publiczne metody planszy (wszystkie trafiają do dziennika)."""
+    for _ in range(steps):
+        board.clock.advance(rnd.random() * 3)
+        op = rnd.random()
+        if op < 0.15:
+            allowed = board.get_allowed_expansion_tiles()
+            if allowed or not board.first_tile_placed:
+                board.manual_expand_tile(*(rnd.choice(allowed) if allowed else (2, 2)))
+        elif op < 0.35:
+            board.debug_add("gold", 30)
+            board.place_structure(rnd.choice(["wall", "tower1", "tower2"]),
+                                  rnd.randrange(board.total_rows), rnd.randrange(board.total_cols))
+        elif op < 0.45 and board.camp:
+            board.debug_add("wood", 20)
+            r, c = rnd.choice(sorted(board.camp))
+            board.build_in_camp(r, c, rnd.choice(["house", "farm", "sawmill"]))
+        elif op < 0.55:
+            board.debug_add("wood", 50)
+            board.debug_add("stone", 50)
+            tower_logic.do_upgrade(board, "tower1", "range",
+                                   board.upgrade_levels["tower1"]["range"] + 1)
+        elif op < 0.65:
+            if not board.wave_active:
+                board.start_wave()
+        elif op < 0.75 and board.wave_active:
+            board.enemy_spawned(rnd.randint(1, 3))
+            board.enemy_killed(rnd.randint(1, 3), reached_base=rnd.random() < 0.2, enemy_hp=2)
+        elif op < 0.85 and board.wave_active:
+            # paczka jak z /api/events, z obrażeniami wież
+            board.apply_enemy_events([
+                {"type": "spawn", "count": rnd.randint(1, 3)},
+                {"type": "damage", "amount": round(rnd.random() * 40, 3)},
+                {"type": "die", "count": 1, "reached_base": rnd.random() < 0.2, "hp": 2},
+                {"type": "damage", "amount": round(rnd.random() * 40, 3)}])
+        elif board.wave_active and rnd.random() < 0.3:
+            board.end_wave()
+
+
+def _board_state(board):
+    """Stan planszy do porównań (bez wersji i identyfikatora stanu)."""
+    layout = board.get_layout()
+    for key in ("version", "state_id", "path_version", "time"):
+        layout.pop(key)
+    return (json.dumps(layout, sort_keys=True), dict(board.upgrade_levels),
+            board.elapsed_time, board.damage_dealt, board.journal_seq)
+
+
+def _new_board(seed=0, **board_kwargs):
+    """Plansza z zegarem krokowym — czas gry zależy tylko od ziarna."""
+    board_kwargs.setdefault("clock", SteppedClock(1000.0 + seed))
+    return Board(**board_kwargs)
+
+
+@pytest.fixture
+def play():
+    return _play
+
+
+@pytest.fixture
+def board_state():
+    return _board_state
+
+
+@pytest.fixture
+def new_board():
+    return _new_board
+
+
+@pytest.fixture
+def played_board():
+    """Plansza po losowej rozgrywce: played_board(seed, steps=300, **board_kwargs)."""
+    def make(seed, steps=300, **board_kwargs):
+        board = _new_board(seed, **board_kwargs)
+        _play(board, random.Random(seed), steps)
+        return board
+    return make
@@ -0,0 +1,201 @@
+# tests/test_journal.py
+import os
+import random
+
+import pytest
+
+import journal
+import savefile
+from clock import SteppedClock
+from sessions import SessionManager
+
+
+RESTART_TIME = 100000.0
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "games.log")
+
+
+@pytest.fixture
+def manager(new_board):
+    return SessionManager(board_factory=lambda: new_board(7))
+
+
+def start(game_journal, sessions):
+    session = sessions.create()
+    game_journal.attach(session.board, session.game_id)
+    return session
+
+
+def checkpoint_boards(path):
+    return savefile.read_checkpoint(path, clock=SteppedClock(RESTART_TIME))
+
+
+def restart(log_path, checkpoint=None):
+    """Jak app.py po awarii: checkpoint, ogon dziennika, podpięcie bez wpisu "new"."""
+    clock = SteppedClock(RESTART_TIME)
+    sessions = SessionManager()
+    if checkpoint is not None:
+        sessions.restore(checkpoint, clock=clock)
+    journal.recover(log_path, sessions, clock=clock)
+    game_journal = journal.Journal(log_path)
+    for session in sessions.sessions():
+        game_journal.attach(session.board, session.game_id, new=False)
+    return sessions, game_journal
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_replay_matches_live_game(log_path, new_board, play, board_state, seed):
+    game_journal = journal.Journal(log_path)
+    board = new_board(seed)
+    game_journal.attach(board, "g")
+    play(board, random.Random(seed), 300)
+    game_journal.flush()
+    assert board_state(journal.replay(log_path, "g")) == board_state(board)
+
+
+def test_replay_stops_at_last_seq(log_path, new_board, play, board_state):
+    game_journal = journal.Journal(log_path)
+    board = new_board(1)
+    game_journal.attach(board, "g")
+    play(board, random.Random(1), 120)
+    middle = board_state(board)
+    last_seq = board.journal_seq
+    play(board, random.Random(2), 120)
+    game_journal.flush()
+    assert board_state(journal.replay(log_path, "g", last_seq=last_seq)) == middle
+
+
+def test_recover_from_checkpoint_and_tail(tmp_path, log_path, manager, play, board_state):
+    checkpoint = str(tmp_path / "games.ck")
+    game_journal = journal.Journal(log_path)
+    games = [(start(game_journal, manager), random.Random(100 + i)) for i in range(3)]
+    for session, rnd in games:
+        play(session.board, rnd, 150)
+    manager.checkpoint(checkpoint)
+    for session, rnd in games:
+        play(session.board, rnd, 150)
+    late = start(game_journal, manager)
+    play(late.board, random.Random(7), 100)
+    game_journal.flush()
+
+    sessions, _ = restart(log_path, checkpoint)
+    assert len(sessions) == 4
+    for session in manager.sessions():
+        assert board_state(sessions.get(session.game_id).board) == board_state(session.board)
+
+
+def test_rotation_keeps_only_the_tail(tmp_path, log_path, manager, play, board_state):
+    checkpoint = str(tmp_path / "games.ck")
+    game_journal = journal.Journal(log_path)
+    games = [(start(game_journal, manager), random.Random(i)) for i in range(3)]
+    for session, rnd in games:
+        play(session.board, rnd, 200)
+    game_journal.rotate(manager.checkpoint(checkpoint))
+    assert list(journal.read(log_path)) == []
+    for session, rnd in games:
+        play(session.board, rnd, 50)
+    game_journal.flush()
+
+    saved = {g: b.journal_seq for g, b in checkpoint_boards(checkpoint)}
+    assert all(e["s"] > saved[e["g"]] for e in journal.read(log_path))
+    sessions, _ = restart(log_path, checkpoint)
+    for session in manager.sessions():
+        assert board_state(sessions.get(session.game_id).board) == board_state(session.board)
+    # gra odtwarzana offline: plansza z checkpointu + ogon dziennika
+    game_id, board = checkpoint_boards(checkpoint)[0]
+    assert (board_state(journal.replay(log_path, game_id, board=board))
+            == board_state(manager.get(game_id).board))
+
+
+def test_dropped_games_are_not_recovered(tmp_path, log_path, manager, play):
+    checkpoint = str(tmp_path / "games.ck")
+    game_journal = journal.Journal(log_path)
+    kept, before, after = (start(game_journal, manager) for _ in range(3))
+    for session in (kept, before, after):
+        play(session.board, random.Random(3), 60)
+    manager.remove(before.game_id)
+    game_journal.drop(before.board)
+    game_journal.rotate(manager.checkpoint(checkpoint))
+    # usunięta po checkpoincie — jest w zapisie, ale dziennik ma wpis "drop"
+    manager.remove(after.game_id)
+    game_journal.drop(after.board)
+    play(after.board, random.Random(4), 20)
+    game_journal.flush()
+
+    assert {e["g"] for e in journal.read(log_path)} == {after.game_id}
+    sessions, _ = restart(log_path, checkpoint)
+    assert kept.game_id in sessions
+    assert before.game_id not in sessions
+    assert after.game_id not in sessions
+
+
+def test_restart_does_not_repeat_new_entries(log_path, manager, play):
+    game_journal = journal.Journal(log_path)
+    session = start(game_journal, manager)
+    play(session.board, random.Random(5), 40)
+    game_journal.close()
+
+    sessions, game_journal = restart(log_path)
+    play(sessions.get(session.game_id).board, random.Random(6), 40)
+    game_journal.close()
+    sessions, _ = restart(log_path)
+
+    entries = list(journal.read(log_path))
+    assert [e["c"] for e in entries].count("new") == 1
+    seqs = [e["s"] for e in entries]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    assert sessions.get(session.game_id).board.journal_seq == seqs[-1]
+
+
+def test_rotation_compacts_outside_the_journal_lock(tmp_path, log_path, manager, play, monkeypatch):
+    game_journal = journal.Journal(log_path)
+    session = start(game_journal, manager)
+    play(session.board, random.Random(8), 100)
+    read_files = journal._read_files
+    free = []
+
+    def reading(names, game_id=None):
+        # przepisywanie segmentów — zapisy gier muszą móc wziąć blokadę dziennika
+        free.append(game_journal._lock.acquire(timeout=1))
+        game_journal._lock.release()
+        return read_files(names, game_id)
+
+    monkeypatch.setattr(journal, "_read_files", reading)
+    game_journal.rotate(manager.checkpoint(str(tmp_path / "games.ck")))
+    assert free == [True]
+
+
+def test_interrupted_rotation_reads_the_same_entries(tmp_path, log_path, manager, play, monkeypatch):
+    checkpoint = str(tmp_path / "games.ck")
+    game_journal = journal.Journal(log_path)
+    games = [(start(game_journal, manager), random.Random(20 + i)) for i in range(3)]
+    for session, rnd in games:
+        play(session.board, rnd, 80)
+    game_journal.rotate({})  # bez checkpointu: wszystko zostaje w segmencie
+    for session, rnd in games:
+        play(session.board, rnd, 80)
+    saved = manager.checkpoint(checkpoint)
+    for session, rnd in games:
+        play(session.board, rnd, 40)
+    # awaria po zapisaniu .tmp, przed usunięciem starych segmentów i podmianą
+    monkeypatch.setattr(journal, "_finish_compaction", lambda path: None)
+    game_journal.rotate(saved)
+    game_journal.flush()
+    monkeypatch.undo()
+    expected = [e for e in journal.read(log_path)]
+    assert all(e["s"] > saved[e["g"]] for e in expected)
+    # ...także w trakcie usuwania starych segmentów (od najstarszego)
+    os.remove(journal._segments(log_path)[0])
+    (tmp_path / "games.log.9.part").write_text('{"g": "x"')
+    assert list(journal.read(log_path)) == expected
+
+    game_journal.close()
+    journal.Journal(log_path).close()  # dokończenie rotacji przy starcie
+    assert journal.files(log_path) == [journal._segments(log_path)[0], log_path]
+    assert list(journal.read(log_path)) == expected
+    sessions, _ = restart(log_path, checkpoint)
+    for session, _ in games:
+        assert sessions.get(session.game_id).board.journal_seq == session.board.journal_seq
@@ -0,0 +1,37 @@
+# tests/test_pathfinding.py
+import random
+
+import pytest
+
+from pathfinding import PlacementValidator, find_shortest_path
+
+CELL_KINDS = ["open_area"] * 4 + ["tower_area", "wall", "void"]
+
+
+def _random_grid(rnd):
+    rows, cols = rnd.randint(3, 12), rnd.randint(3, 12)
+    grid = [[rnd.choice(CELL_KINDS) for _ in range(cols)] for _ in range(rows)]
+    base = (rnd.randrange(rows), rnd.randrange(cols))
+    portal = base
+    while portal == base:
+        portal = (rnd.randrange(rows), rnd.randrange(cols))
+    grid[base[0]][base[1]] = "base"
+    grid[portal[0]][portal[1]] = "portal"
+    blocked = {(rnd.randrange(rows), rnd.randrange(cols))
+               for _ in range(rnd.randint(0, 10))} - {base, portal}
+    return grid, base, portal, blocked
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_validator_matches_bfs(seed):
+    grid, base, portal, blocked = _random_grid(random.Random(seed))
+    validator = PlacementValidator(grid, base, portal, blocked)
+    cells = [(r, c) for r in range(len(grid)) for c in range(len(grid[0]))]
+    batch = validator.blocking_cells(cells)
+    for cell in cells:
+        if cell in blocked or grid[cell[0]][cell[1]] not in ("open_area", "tower_area"):
+            continue
+        # pełny BFS z zablokowanym polem jako wzorzec
+        truth = not find_shortest_path(grid, portal, base, blocked | {cell})
+        assert validator.blocks(cell) == truth, cell
+        assert (cell in batch) == truth, cell
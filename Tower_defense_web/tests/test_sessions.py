@@ -0,0 +1,61 @@
+# tests/test_sessions.py
+import json
+import random
+import threading
+
+import pytest
+
+from sessions import GameSession
+
+GRIDS = ({}, {"sparse": True}, {"compact": True})
+
+
+def layout_json(layout):
+    layout = dict(layout)
+    layout.pop("time")
+    return json.dumps(layout, sort_keys=True)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("grid", GRIDS, ids=("dense", "sparse", "compact"))
+def test_published_snapshot_matches_board(new_board, play, seed, grid):
+    # migawki budowane przyrostowo (współdzielone wiersze) == pełna kopia planszy
+    session = GameSession("g", new_board(seed, **grid))
+    rnd = random.Random(seed)
+    snapshots = []
+    for _ in range(60):
+        with session.mutation() as board:
+            play(board, rnd, 5)
+        snap = session.snapshot
+        assert layout_json(snap.layout) == layout_json(session.board.get_layout())
+        snapshots.append((snap, layout_json(snap.layout)))
+    # starsze migawki nie zmieniły się po kolejnych publikacjach
+    for snap, frozen in snapshots:
+        assert layout_json(snap.layout) == frozen
+
+
+def test_readers_do_not_take_the_game_lock(new_board):
+    session = GameSession("g", new_board(0))
+    published = session.snapshot.version
+    held = threading.Event()
+    release = threading.Event()
+
+    def writer():
+        with session.mutation() as board:
+            board.manual_expand_tile(2, 2)
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    held.wait(5)
+    try:
+        read = []
+        reader = threading.Thread(target=lambda: read.append(session.snapshot.version))
+        reader.start()
+        reader.join(1)
+        assert read == [published]
+    finally:
+        release.set()
+        thread.join()
+    assert session.snapshot.version == session.board.version
@@ -0,0 +1,61 @@
+# tests/test_simulation.py
+import random
+
+import pytest
+
+import balance_sim
+import enemy_logic
+from clock import SteppedClock
+from game_logic import Board
+from simulation import CohortSimulation, WaveSimulation
+
+# krok i odstęp spawnów dokładne w liczbach binarnych (odstęp = 12 kroków), żeby
+# porównanie nie zależało od zaokrągleń sumowanych czasów
+DT = 1 / 16
+SPAWN_INTERVAL_MS = 750
+WALL_TICK = 40
+
+
+def _game(seed, sim_class):
+    board = Board(num_tiles=5, clock=SteppedClock(), seed=seed)
+    return board, sim_class(board), random.Random(seed)
+
+
+def _enemies(sim):
+    return sorted((e["id"], e["row"], e["col"], e["hp"]) for e in sim.snapshot())
+
+
+def _wall_on_path(board, tick):
+    """Pole ścieżki, na którym mur nie odetnie drogi (albo None)."""
+    validator = board.get_placement_validator()
+    cells = [tuple(p) for p in board.get_path()[1:-1]]
+    cells = [p for p in cells if p not in board.structures and not validator.blocks(p)]
+    return random.Random(tick).choice(cells) if cells else None
+
+
+@pytest.mark.parametrize("policy", ["none", "towers", "balanced"])
+@pytest.mark.parametrize("seed", range(3))
+def test_cohorts_match_wave_simulation(monkeypatch, seed, policy):
+    monkeypatch.setattr(enemy_logic, "spawn_interval_ms", lambda: SPAWN_INTERVAL_MS)
+    games = [_game(seed, WaveSimulation), _game(seed, CohortSimulation)]
+    (wave_board, wave_sim, _), (cohort_board, cohort_sim, _) = games
+
+    for _ in range(8):
+        for board, _, rnd in games:
+            balance_sim.POLICIES[policy](board, rnd, board.wave + 1)
+            board.start_wave()
+        tick = 0
+        while wave_board.wave_active or cohort_board.wave_active:
+            wave_sim.step(DT)
+            cohort_sim.step(DT)
+            tick += 1
+            if tick == WALL_TICK:
+                # zmiana ścieżki w trakcie fali — przepięcie przeciwników
+                cell = _wall_on_path(wave_board, tick)
+                if cell is not None:
+                    for board, _, _ in games:
+                        board.gold += 5
+                        assert board.place_structure("wall", *cell)
+            assert _enemies(cohort_sim) == _enemies(wave_sim), (wave_board.wave, tick)
+            assert (cohort_board.hp, cohort_board.gold, cohort_board.wave_active) == \
+                (wave_board.hp, wave_board.gold, wave_board.wave_active), (wave_board.wave, tick)
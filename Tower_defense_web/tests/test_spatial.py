@@ -0,0 +1,78 @@
+# tests/test_spatial.py
+import copy
+import random
+from math import hypot
+
+import pytest
+
+import tower_logic
+from spatial import EnemyIndex
+
+
+class Enemy:
+    def __init__(self, row, col, hp=10):
+        self.row = row
+        self.col = col
+        self.hp = hp
+
+    def take_damage(self, dmg):
+        self.hp -= dmg
+
+
+def _random_enemies(rnd):
+    enemies = []
+    for _ in range(rnd.randint(0, 200)):
+        if rnd.random() < 0.5:
+            # pola całkowite — odległości równe promieniowi i remisy
+            enemies.append(Enemy(rnd.randrange(15), rnd.randrange(15)))
+        else:
+            enemies.append(Enemy(rnd.uniform(-1, 15), rnd.uniform(-1, 15)))
+    return enemies
+
+
+def _linear_scan(enemies, row, col, radius):
+    in_range = [e for e in enemies if hypot(e.col - col, e.row - row) <= radius]
+    return sorted(in_range, key=lambda e: hypot(e.col - col, e.row - row))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_query_matches_linear_scan(seed):
+    rnd = random.Random(seed)
+    enemies = _random_enemies(rnd)
+    index = EnemyIndex(enemies)
+    for e in enemies:
+        if rnd.random() < 0.3:
+            e.row += rnd.uniform(-2, 2)
+            e.col += rnd.uniform(-2, 2)
+            index.move(e)
+    gone = set(rnd.sample(range(len(enemies)), len(enemies) // 4))
+    for i in gone:
+        index.remove(enemies[i])
+    live = [e for i, e in enumerate(enemies) if i not in gone]
+    assert len(index) == len(live)
+
+    for _ in range(20):
+        row, col = rnd.randrange(15), rnd.randrange(15)
+        radius = rnd.choice([0, 1, 2, 3, 6, 7.5])
+        assert index.query(row, col, radius) == _linear_scan(live, row, col, radius)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_tower_attack_with_index_matches_scan(seed):
+    rnd = random.Random(seed)
+    levels = tower_logic.new_upgrade_levels()
+    levels.bump("tower1", "strategic")
+    towers = [tower_logic.Tower(rnd.choice(("tower1", "tower2", "tower4")),
+                                rnd.randrange(15), rnd.randrange(15), levels=levels)
+              for _ in range(rnd.randint(1, 20))]
+    enemies = _random_enemies(rnd)
+    scan_towers, scan_enemies = copy.deepcopy((towers, enemies))
+
+    index = EnemyIndex(enemies)
+    for tower in towers:
+        tower.attack(enemies, now=1.0, index=index)
+    for tower in scan_towers:
+        tower.attack(scan_enemies, now=1.0)
+
+    assert [e.hp for e in enemies] == [e.hp for e in scan_enemies]
+    assert [t._last_shot for t in towers] == [t._last_shot for t in scan_towers]
@@ -0,0 +1,72 @@
+# tests/test_tower_logic.py
+import copy
+import random
+
+import pytest
+
+import tower_logic
+from tower_logic import Tower
+
+TOWER_TYPES = ("tower1", "tower2", "tower3", "tower4", "tower5")
+NOW = 1.0
+
+
+class Enemy:
+    def __init__(self, row, col, hp):
+        self.row = row
+        self.col = col
+        self.hp = hp
+
+    def take_damage(self, dmg):
+        self.hp -= dmg
+
+
+class ArmoredEnemy(Enemy):
+    # własne take_damage — wersja wsadowa musi je wywołać
+    def take_damage(self, dmg):
+        self.hp -= dmg / 2
+
+
+class PlainEnemy:
+    # bez take_damage: obrażenia przez hp -= damage
+    def __init__(self, row, col, hp):
+        self.row = row
+        self.col = col
+        self.hp = hp
+
+
+def _scenario(seed):
+    rnd = random.Random(seed)
+    levels = tower_logic.new_upgrade_levels()
+    for typ in ("tower1", "tower2"):
+        if rnd.random() < 0.5:
+            levels.bump(typ, "strategic")
+    towers = []
+    for _ in range(rnd.randint(1, 30)):
+        tower = Tower(rnd.choice(TOWER_TYPES), rnd.randrange(12), rnd.randrange(12), levels=levels)
+        tower._last_shot = rnd.choice([None, None, NOW - 0.1, NOW - 5.0])
+        towers.append(tower)
+    enemies = []
+    for _ in range(rnd.randint(0, 80)):
+        if rnd.random() < 0.5:
+            # pola całkowite — odległości równe zasięgowi i remisy
+            row, col = rnd.randrange(12), rnd.randrange(12)
+        else:
+            row, col = rnd.uniform(0, 12), rnd.uniform(0, 12)
+        hp = rnd.choice([rnd.randint(1, 20), rnd.uniform(0.5, 20.0)])
+        enemies.append(rnd.choice([Enemy, ArmoredEnemy, PlainEnemy])(row, col, hp))
+    return towers, enemies
+
+
+@pytest.mark.skipif(tower_logic.np is None, reason="wymaga NumPy")
+@pytest.mark.parametrize("seed", range(300))
+def test_batched_matches_scalar_loop(seed):
+    towers, enemies = _scenario(seed)
+    scalar_towers, scalar_enemies = copy.deepcopy((towers, enemies))
+
+    fired = sum(t.attack(scalar_enemies, now=NOW) for t in scalar_towers)
+    assert tower_logic.process_towers_batched(towers, enemies, NOW) == fired
+
+    assert [(type(e.hp), e.hp) for e in enemies] == [(type(e.hp), e.hp) for e in scalar_enemies]
+    assert [t._last_shot for t in towers] == [t._last_shot for t in scalar_towers]
+
@@ -1,8 +1,16 @@
 # tower_logic.py
-import time
+import json
 from math import hypot
 from collections import namedtuple
 
+from clock import REAL_CLOCK
+from journal import journaled
+
+try:
+    import numpy as np
+except ImportError:  # NumPy jest opcjonalny — bez niego zostaje pętla skalarna
+    np = None
+
 # przełącznik debugowania (można ustawić z menu debugowania)
 debug_tower_buffs_enabled = False
 
@@ -96,11 +104,37 @@ UPGRADE_DEFS = {
     },
 }
 
-# poziomy zakupionych ulepszeń (indeksowane od zera)
-_upgrade_levels = {
-    typ: {cat: 0 for cat in UPGRADE_DEFS[typ]}
-    for typ in UPGRADE_DEFS
-}
+class UpgradeLevels(dict):
+    """
+    Poziomy ulepszeń jednej gry {typ: {kategoria: poziom}} z numerem wersji.
+    Zmiany tylko przez bump() — wersja unieważnia tabelę statystyk (spec_table).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+        self._cache = None  # (klucz, tabela statystyk, JSON) dla klucza (wersja, debug)
+
+    def bump(self, tower_type, category):
+        self[tower_type][category] += 1
+        self.version += 1
+
+
+def new_upgrade_levels():
+    """Świeże poziomy ulepszeń (wszystko na 0) — każda gra ma własne."""
+    return UpgradeLevels({
+        typ: {cat: 0 for cat in UPGRADE_DEFS[typ]}
+        for typ in UPGRADE_DEFS
+    })
+
+
+# poziomy zakupionych ulepszeń (indeksowane od zera) — domyślne, gdy plansza nie ma własnych
+_upgrade_levels = new_upgrade_levels()
+
+
+def _levels_of(board):
+    levels = getattr(board, "upgrade_levels", None)
+    return _upgrade_levels if levels is None else levels
 
 
 # -------------------------
@@ -133,70 +167,124 @@ def get_structure_cost(typ):
     return base.cost if base else None
 
 
+# -------------------------
+# TABELA STATYSTYK (cache per poziomy ulepszeń)
+# -------------------------
+def _compute_specs(typ, levels):
+    base = STRUCTURE_BASE[typ]
+    lvl = levels.get(typ, {k: 0 for k in ("range", "speed", "damage", "strategic")})
+
+    rng = base.base_range
+    if "range" in lvl:
+        rng += sum(eff for (_, eff) in UPGRADE_DEFS.get(typ, {}).get("range", [])[: lvl.get("range", 0)])
+
+    spd = base.base_speed + sum(eff for (_, eff) in UPGRADE_DEFS.get(typ, {}).get("speed", [])[: lvl.get("speed", 0)])
+    dmg = base.base_damage + sum(eff for (_, eff) in UPGRADE_DEFS.get(typ, {}).get("damage", [])[: lvl.get("damage", 0)])
+    strat = lvl.get("strategic", 0) > 0
+
+    specs = {"range": rng, "speed": spd, "damage": dmg, "strategic": strat}
+
+    if debug_tower_buffs_enabled:
+        specs["range"] += 5
+        specs["damage"] += 10
+        specs["speed"] += 5
+
+    return specs
+
+
+def _cached(levels):
+    """(tabela, JSON) dla poziomów ulepszeń; liczone ponownie po bump() lub zmianie buffów debug."""
+    key = (getattr(levels, "version", None), debug_tower_buffs_enabled)
+    cache = getattr(levels, "_cache", None)
+    if cache is not None and cache[0] == key:
+        return cache[1], cache[2]
+    table = {typ: _compute_specs(typ, levels) for typ in STRUCTURE_BASE}
+    # JSON dla /api/tower_specs (mur bez ulepszeń i buffów)
+    out = {}
+    for typ, base in STRUCTURE_BASE.items():
+        if typ in UPGRADE_DEFS:
+            out[typ] = table[typ]
+        else:
+            out[typ] = {"range": base.base_range, "speed": base.base_speed,
+                        "damage": base.base_damage, "strategic": False}
+    encoded = json.dumps(out)
+    if key[0] is not None:
+        levels._cache = (key, table, encoded)  # jedno przypisanie — bezpieczne dla wątków
+    return table, encoded
+
+
+def spec_table(levels=None):
+    """Statystyki wszystkich typów {typ: specs} dla danych poziomów ulepszeń."""
+    return _cached(_upgrade_levels if levels is None else levels)[0]
+
+
+def tower_specs_json(levels=None):
+    """Zserializowany wynik get_all_tower_specs (cache jak spec_table)."""
+    return _cached(_upgrade_levels if levels is None else levels)[1]
+
+
+def set_debug_tower_buffs(enabled):
+    """Włącza/wyłącza buffy debug (klucz cache tabel zawiera stan przełącznika)."""
+    global debug_tower_buffs_enabled
+    debug_tower_buffs_enabled = bool(enabled)
+
+
 # -------------------------
 # KLASA TOWER
 # -------------------------
 class Tower:
-    def __init__(self, typ, row, col):
+    def __init__(self, typ, row, col, levels=None, clock=None):
         self.typ = typ
         self.row = row
         self.col = col
-        self._last_shot = 0.0
+        self.levels = _upgrade_levels if levels is None else levels
+        self.clock = clock if clock is not None else REAL_CLOCK
+        self._last_shot = None  # None = jeszcze nie strzelała
 
     def specs(self):
         """
         Zwraca bieżące statystyki wieży uwzględniające ulepszenia.
+        Słownik jest współdzielony przez wszystkie wieże typu — nie modyfikować.
         """
-        base = STRUCTURE_BASE[self.typ]
-        lvl = _upgrade_levels.get(self.typ, {k: 0 for k in ("range", "speed", "damage", "strategic")})
-
-        rng = base.base_range
-        if "range" in lvl:
-            rng += sum(eff for (_, eff) in UPGRADE_DEFS.get(self.typ, {}).get("range", [])[: lvl.get("range", 0)])
-
-        spd = base.base_speed + sum(eff for (_, eff) in UPGRADE_DEFS.get(self.typ, {}).get("speed", [])[: lvl.get("speed", 0)])
-        dmg = base.base_damage + sum(eff for (_, eff) in UPGRADE_DEFS.get(self.typ, {}).get("damage", [])[: lvl.get("damage", 0)])
-        strat = lvl.get("strategic", 0) > 0
-
-        specs = {"range": rng, "speed": spd, "damage": dmg, "strategic": strat}
-
-        if debug_tower_buffs_enabled:
-            specs["range"] += 5
-            specs["damage"] += 10
-            specs["speed"] += 5
-
-        return specs
+        return spec_table(self.levels)[self.typ]
 
     def can_attack(self, now=None):
         spec = self.specs()
         if spec["speed"] <= 0:
             return False
-        now = now or time.time()
+        if self._last_shot is None:
+            return True
+        if now is None:
+            now = self.clock.now()
         return (now - self._last_shot) >= 1.0 / spec["speed"]
 
-    def attack(self, enemies, now=None, board=None):
+    def attack(self, enemies, now=None, board=None, index=None):
         """
         Atakuje wrogów w zasięgu.
         Tymczasowo: każde ulepszenie strategiczne = podwójny strzał.
+        Z `index` (spatial.EnemyIndex) sprawdzani są tylko wrogowie z pól w zasięgu.
         """
-        now = now or time.time()
+        if now is None:
+            now = self.clock.now()
         spec = self.specs()
         if not self.can_attack(now):
             return False
 
-        in_range = [
-            e for e in enemies
-            if hasattr(e, "row") and hasattr(e, "col")
-            and hypot(e.col - self.col, e.row - self.row) <= spec["range"]
-        ]
-        if not in_range:
+        if index is not None:
+            in_range_sorted = index.query(self.row, self.col, spec["range"])
+        else:
+            in_range = [
+                e for e in enemies
+                if hasattr(e, "row") and hasattr(e, "col")
+                and hypot(e.col - self.col, e.row - self.row) <= spec["range"]
+            ]
+            in_range_sorted = sorted(in_range, key=lambda e: hypot(e.col - self.col, e.row - self.row))
+        if not in_range_sorted:
             return False
 
         # podwójny strzał jeśli ulepszenie strategiczne jest aktywne
         count = 2 if spec.get("strategic", False) else 1
 
-        in_range_sorted = sorted(in_range, key=lambda e: hypot(e.col - self.col, e.row - self.row))
-
         for e in in_range_sorted[:count]:
             try:
                 if hasattr(e, "take_damage"):
@@ -215,7 +303,7 @@ class Tower:
 # -------------------------
 def can_upgrade(board, tower_type, category):
     defs = UPGRADE_DEFS.get(tower_type, {})
-    lvl = _upgrade_levels.get(tower_type, {}).get(category, 0)
+    lvl = _levels_of(board).get(tower_type, {}).get(category, 0)
     if category not in defs:
         return False
     if lvl >= len(defs[category]):
@@ -224,8 +312,10 @@ def can_upgrade(board, tower_type, category):
     return _has_resources(board, cost)
 
 
+@journaled("do_upgrade")
 def do_upgrade(board, tower_type, category, upgrade_index):
-    lvl = _upgrade_levels.get(tower_type, {}).get(category, 0)
+    levels = _levels_of(board)
+    lvl = levels.get(tower_type, {}).get(category, 0)
     if upgrade_index != lvl + 1:
         return False
     defs = UPGRADE_DEFS.get(tower_type, {})
@@ -235,12 +325,16 @@ def do_upgrade(board, tower_type, category, upgrade_index):
     if not _has_resources(board, cost):
         return False
     _spend_resources(board, cost)
-    _upgrade_levels[tower_type][category] += 1
+    if isinstance(levels, UpgradeLevels):
+        levels.bump(tower_type, category)
+    else:
+        levels[tower_type][category] += 1
     return True
 
 
-def get_upgrade_level(tower_type, category):
-    return _upgrade_levels.get(tower_type, {}).get(category, 0)
+def get_upgrade_level(tower_type, category, levels=None):
+    levels = _upgrade_levels if levels is None else levels
+    return levels.get(tower_type, {}).get(category, 0)
 
 
 def can_build_structure(board, typ):
@@ -261,36 +355,107 @@ def build_structure(board, typ, r, c):
     board.gold -= cost
     if typ.startswith("tower"):
         board.towers = getattr(board, "towers", [])
-        board.towers.append(Tower(typ, r, c))
+        board.towers.append(Tower(typ, r, c, levels=_levels_of(board), clock=getattr(board, "clock", None)))
     return True
 
 
-def process_towers(board, enemies):
+# od ilu par wieża–przeciwnik opłaca się wersja wektorowa
+BATCH_MIN_PAIRS = 256
+
+
+def process_towers(board, enemies, now=None, index=None):
     """
     Każda wieża na planszy wykonuje atak.
+    - index: opcjonalny spatial.EnemyIndex z tymi samymi wrogami co `enemies`;
+      wtedy wieża sprawdza tylko pola w swoim zasięgu
+    - bez indeksu, przy dużej liczbie par wieża–przeciwnik (i dostępnym NumPy)
+      liczone wsadowo
+    Symulacja fal podaje indeks celowo: przy zasięgach wież 1–2 pól zapytanie
+    o kubełki jest kilka razy szybsze niż macierz odległości wszystkich par
+    (benchmark.py, process_towers), więc wersja wsadowa zostaje dla wywołań bez indeksu.
+    """
+    if now is None:
+        now = getattr(board, "clock", REAL_CLOCK).now()
+    towers = getattr(board, "towers", [])
+    if index is None and np is not None and len(towers) * len(enemies) >= BATCH_MIN_PAIRS:
+        process_towers_batched(towers, enemies, now)
+        return
+    for tower in towers:
+        tower.attack(enemies, now=now, board=board, index=index)
+
+
+def process_towers_batched(towers, enemies, now):
+    """
+    Wektorowa wersja Tower.attack dla wszystkich wież naraz: odległości wszystkich
+    par wieża–przeciwnik w jednej operacji i 1–2 najbliższe cele na wieżę. Cele są
+    te same co w pętli skalarnej — zasięg i odległość nie zależą od HP, a remis
+    rozstrzyga kolejność na liście.
+    Obrażenia sumowane są na przeciwnika (np.bincount z wagami po indeksach celów) i zadawane
+    raz: take_damage(suma) albo hp -= suma. Wynik jest taki jak przy osobnych
+    trafieniach, o ile take_damage jest addytywne (SimEnemy: hp -= dmg); liczby
+    zmiennoprzecinkowe mogą różnić się zaokrągleniem. Przeciwnicy, dla których
+    liczy się każde trafienie z osobna, muszą iść przez Tower.attack.
+    Zwraca liczbę wież, które strzeliły.
     """
-    now = time.time()
-    for tower in getattr(board, "towers", []):
-        tower.attack(enemies, now=now, board=board)
+    targets = [e for e in enemies if hasattr(e, "row") and hasattr(e, "col")]
+    ready = [(t, t.specs()) for t in towers if t.can_attack(now)]
+    if not targets or not ready:
+        return 0
+
+    pos = np.array([(e.row, e.col) for e in targets], dtype=float)
+    tpos = np.array([(t.row, t.col) for t, _ in ready], dtype=float)
+    rng = np.array([spec["range"] for _, spec in ready], dtype=float)
+    strat = np.array([bool(spec.get("strategic", False)) for _, spec in ready])
+
+    # macierz odległości wieże x przeciwnicy; poza zasięgiem = inf
+    dist = np.hypot(pos[None, :, 1] - tpos[:, None, 1], pos[None, :, 0] - tpos[:, None, 0])
+    dist[dist > rng[:, None]] = np.inf
+
+    # argmin zwraca pierwszy z równych — jak stabilne sortowanie w Tower.attack
+    rows = np.arange(len(ready))
+    first = dist.argmin(axis=1)
+    hit1 = np.isfinite(dist[rows, first])
+    dist[rows, first] = np.inf
+    second = dist.argmin(axis=1)
+    hit2 = strat & np.isfinite(dist[rows, second])
+
+    # suma obrażeń na przeciwnika: pierwsze cele wszystkich wież i drugie wież strategicznych
+    damage = np.array([spec["damage"] for _, spec in ready])
+    idx = np.concatenate((first[hit1], second[hit2]))
+    hits = np.bincount(idx, minlength=len(targets))
+    total = np.bincount(idx, weights=np.concatenate((damage[hit1], damage[hit2])),
+                        minlength=len(targets)).astype(damage.dtype)
+    for i in np.flatnonzero(hits).tolist():
+        e = targets[i]
+        amount = total[i].item()
+        try:
+            if hasattr(e, "take_damage"):
+                e.take_damage(amount)
+            elif hasattr(e, "hp"):
+                e.hp -= amount
+        except Exception:
+            pass
+    for k in np.flatnonzero(hit1).tolist():
+        ready[k][0]._last_shot = now
+    return int(hit1.sum())
 
 
 # -------------------------
 # HELPERY DLA FRONTENDU
 # -------------------------
-def get_specs_for_type(tower_type):
+def get_specs_for_type(tower_type, levels=None):
     base = STRUCTURE_BASE.get(tower_type)
     if base is None:
         return None
     if tower_type not in UPGRADE_DEFS:
         return {"range": base.base_range, "speed": base.base_speed, "damage": base.base_damage, "strategic": False}
-    t = Tower(tower_type, 0, 0)
-    return t.specs()
+    return dict(spec_table(levels)[tower_type])
 
 
-def get_all_tower_specs():
+def get_all_tower_specs(levels=None):
     out = {}
     for typ in STRUCTURE_BASE.keys():
-        spec = get_specs_for_type(typ)
+        spec = get_specs_for_type(typ, levels)
         if spec is not None:
             out[typ] = spec
     return out